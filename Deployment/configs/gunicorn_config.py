@@ -11,7 +11,18 @@ bind = "127.0.0.1:8000"
 workers = multiprocessing.cpu_count() * 2 + 1
 
 # Worker 類型
-worker_class = "sync"
+# 使用 gthread：房間事件串流（SSE）會長時間佔用連線，每個 worker 以多個執行緒處理，
+# 避免少數串流佔滿所有 worker
+#
+# 生產環境的事件串流（/api/rooms/{id}/events/）由 nginx 轉發到 ASGI 服務（climbing_system_asgi.service），
+# 不佔用這裡的執行緒，觀眾人數沒有上限。
+#
+# 沒有 ASGI 服務時串流改由 Gunicorn 提供（後備），執行緒預算（每個 worker）：
+#   threads = SCORING_EVENTS_MAX_STREAMS（串流，預設 2）+ 一般請求（裁判寫入、API 讀取，至少保留 2）
+# 每個串流在結束前（SCORING_EVENTS_STREAM_DURATION，預設 25 秒）佔用一個執行緒與一個資料庫連線；
+# 全部程序最多 workers × SCORING_EVENTS_MAX_STREAMS 個串流，超過的觀眾收到 503 並改為每 5 秒輪詢。
+worker_class = "gthread"
+threads = 4
 
 # 每個 worker 的最大請求數，超過後重啟 worker（防止內存洩漏）
 max_requests = 1000
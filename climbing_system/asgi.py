@@ -1,5 +1,9 @@
 """
 ASGI config for climbing_system project.
+
+除了 Django 的 HTTP 請求之外，/ws/rooms/{id}/ 的 WebSocket 連線與
+GET /api/rooms/{id}/events/ 的事件串流（SSE）由 scoring.websocket 處理。
+啟動方式：uvicorn climbing_system.asgi:application --port 8001
 """
 
 import os
@@ -8,13 +12,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'climbing_system.settings')
 
-application = get_asgi_application()
-
-
-
-
-
-
-
-
-
+django_application = get_asgi_application()
+
+# 必須在 Django 初始化之後才能導入使用模型的模組
+from scoring.websocket import EVENTS_PATH, room_event_stream, room_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await room_websocket(scope, receive, send)
+    elif scope['type'] == 'http' and scope['method'] == 'GET' and EVENTS_PATH.match(scope['path']):
+        await room_event_stream(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    else:
+        await django_application(scope, receive, send)
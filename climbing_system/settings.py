@@ -162,7 +162,7 @@ if not CORS_ALLOW_ALL_ORIGINS:
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'scoring.renderers.FastJSONRenderer',  # 安裝 orjson 時以 orjson 編碼，輸出與 JSONRenderer 相同
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -182,6 +182,52 @@ REST_FRAMEWORK = {
     ),
 }
 
+# 計分重算模式
+# - sync（預設）：每次編輯立即重算
+# - coalesce：標記房間待重算，SCORING_RECOMPUTE_WINDOW 秒內的多次編輯合併為一次重算（由背景執行緒執行），
+#   讀取分數時若仍有待重算的標記會先完成重算
+# - lazy：寫入只遞增房間的資料版本，讀取時若計分版本落後才重算
+SCORING_RECOMPUTE_MODE = os.environ.get('SCORING_RECOMPUTE_MODE', 'sync')
+SCORING_RECOMPUTE_WINDOW = float(os.environ.get('SCORING_RECOMPUTE_WINDOW', '0.5'))
+
+# 排行榜歷史：每累積多少筆差異記錄寫入一次完整檢查點（查詢任一時間點最多套用這麼多筆差異）
+SCORING_HISTORY_CHECKPOINT_INTERVAL = int(os.environ.get('SCORING_HISTORY_CHECKPOINT_INTERVAL', '20'))
+
+# 增量同步的變動記錄保留的版本數；更早的 ?since= 返回完整房間資料
+SCORING_CHANGE_LOG_RETENTION = int(os.environ.get('SCORING_CHANGE_LOG_RETENTION', '500'))
+
+# 快取（不需要外部服務）：預設為程序內的 locmem；
+# 設定 DJANGO_CACHE_DIR 時改用檔案快取，讓多個 worker 程序共用排行榜快取與失效世代
+if os.environ.get('DJANGO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['DJANGO_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'climbing-score-counter',
+        }
+    }
+
+# 排行榜快取的存活時間（秒）；資料變動時快取鍵會改變，此值只限制舊資料佔用的記憶體
+SCORING_LEADERBOARD_CACHE_TIMEOUT = int(os.environ.get('SCORING_LEADERBOARD_CACHE_TIMEOUT', '300'))
+
+# 房間詳情與排行榜的回應位元組快取（每個程序各自保存 JSON 與 gzip/br 版本）的大小上限（位元組），0 代表停用
+SCORING_PAYLOAD_CACHE_MAX_BYTES = int(os.environ.get('SCORING_PAYLOAD_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# 房間事件串流（SSE，/api/rooms/{id}/events/）：每個串流輪詢資料庫的間隔（秒），
+# 以及單一連線的最長秒數（需低於 gunicorn 的 timeout，結束後瀏覽器會自動重新連線）
+SCORING_EVENTS_POLL_INTERVAL = float(os.environ.get('SCORING_EVENTS_POLL_INTERVAL', '1.0'))
+SCORING_EVENTS_STREAM_DURATION = float(os.environ.get('SCORING_EVENTS_STREAM_DURATION', '25'))
+# 串流由 ASGI 服務（nginx 轉發，見 scoring/websocket.py）提供時沒有上限；以下只限制 WSGI 後備：
+# 每個程序同時開啟的串流上限，每個串流佔用一個 gunicorn 執行緒與一個資料庫連線，
+# 需低於 gunicorn 的 threads（見 Deployment/configs/gunicorn_config.py），超過時返回 503，頁面改為輪詢
+SCORING_EVENTS_MAX_STREAMS = int(os.environ.get('SCORING_EVENTS_MAX_STREAMS', '2'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -1,24 +1,70 @@
 from django.contrib import admin
-from .models import Room, Member, Route, Score
+from .models import Room, Member, Route, Score, LeaderboardSnapshot, annotate_completed_routes
+from .recompute import request_recompute
+
+
+class RecomputeOnChangeMixin:
+    """
+    Admin 中的儲存與刪除經由 request_recompute 觸發重算
+
+    與 API 的寫入相同地遞增房間的 data_version（ETag、增量同步與 lazy 模式都以此判斷內容是否改變）
+    """
+
+    # 物件所屬房間的欄位
+    room_field = 'room_id'
+
+    def get_room_ids(self, objects):
+        return {
+            room_id for room_id in self.model.objects.filter(
+                pk__in=[obj.pk for obj in objects]
+            ).values_list(self.room_field, flat=True) if room_id is not None
+        }
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        for room_id in self.get_room_ids([obj]):
+            request_recompute(room_id)
+
+    def delete_model(self, request, obj):
+        room_ids = self.get_room_ids([obj])
+        super().delete_model(request, obj)
+        self._recompute_remaining(room_ids)
+
+    def delete_queryset(self, request, queryset):
+        room_ids = self.get_room_ids(queryset)
+        super().delete_queryset(request, queryset)
+        self._recompute_remaining(room_ids)
+
+    def _recompute_remaining(self, room_ids):
+        # 刪除房間本身時不需重算
+        for room_id in Room.objects.filter(id__in=room_ids).values_list('id', flat=True):
+            request_recompute(room_id)
 
 
 @admin.register(Room)
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(RecomputeOnChangeMixin, admin.ModelAdmin):
+    room_field = 'id'
     list_display = ['name', 'standard_line_score', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name']
 
 
 @admin.register(Member)
-class MemberAdmin(admin.ModelAdmin):
-    list_display = ['name', 'room', 'is_custom_calc', 'total_score', 'completed_routes_count']
+class MemberAdmin(RecomputeOnChangeMixin, admin.ModelAdmin):
+    list_display = ['name', 'room', 'is_custom_calc', 'total_score', 'rank', 'completed_routes_count']
+    # 名次由計分引擎維護
+    readonly_fields = ['rank', 'dense_rank']
     list_filter = ['is_custom_calc', 'room']
     search_fields = ['name']
     raw_id_fields = ['room']
 
+    def get_queryset(self, request):
+        # 列表中的完成路線數以一次聚合取得
+        return annotate_completed_routes(super().get_queryset(request))
+
 
 @admin.register(Route)
-class RouteAdmin(admin.ModelAdmin):
+class RouteAdmin(RecomputeOnChangeMixin, admin.ModelAdmin):
     list_display = ['name', 'grade', 'room', 'created_at']
     list_filter = ['room', 'created_at']
     search_fields = ['name', 'grade']
@@ -26,7 +72,8 @@ class RouteAdmin(admin.ModelAdmin):
 
 
 @admin.register(Score)
-class ScoreAdmin(admin.ModelAdmin):
+class ScoreAdmin(RecomputeOnChangeMixin, admin.ModelAdmin):
+    room_field = 'route__room_id'
     list_display = ['member', 'route', 'is_completed', 'score_attained']
     list_filter = ['is_completed', 'route__room']
     search_fields = ['member__name', 'route__name']
@@ -40,3 +87,10 @@ class ScoreAdmin(admin.ModelAdmin):
 
 
 
+
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['room', 'scores_version', 'is_checkpoint', 'created_at']
+    list_filter = ['is_checkpoint', 'room']
+    raw_id_fields = ['room']
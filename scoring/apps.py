@@ -6,11 +6,6 @@ class ScoringConfig(AppConfig):
     name = 'scoring'
     verbose_name = '計分系統'
 
-
-
-
-
-
-
-
-
+    def ready(self):
+        # 連接快取失效訊號
+        from . import signals  # noqa: F401
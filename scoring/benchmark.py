@@ -0,0 +1,367 @@
+"""
+計分效能基準
+
+建立合成房間（可設定一般組/客製化組人數、路線數、完成密度），量測：
+- update_scores（所有分數都需要重寫的冷重算，以及沒有變動的重算）
+- 排行榜 API、房間詳情 API、PDF 導出
+- 房間詳情與排行榜的序列化：DRF 序列化器（serialize_*）與 .values() 快速路徑（serialize_*_fast）
+- 房間詳情與排行榜回應的 JSON 渲染：DRF 的 JSONRenderer 與 FastJSONRenderer（orjson）
+
+每個項目記錄耗時（最短/中位數）、CPU 時間（中位數）、SQL 查詢數與峰值記憶體，輸出為可在不同提交之間比較的 JSON。
+所有合成資料都在交易中建立，量測結束後回滾，不會留在資料庫中。
+
+使用方式：python manage.py benchmark_scoring（參見該命令的說明）
+"""
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import namedtuple
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .models import Room, Member, Route, Score, update_scores
+
+logger = logging.getLogger(__name__)
+
+
+Scenario = namedtuple('Scenario', ['name', 'normal_members', 'custom_members', 'routes', 'density', 'seed'])
+
+# 預設情境：涵蓋 7 → 8 人的 L 門檻（420 → 1000）與不同規模的房間
+DEFAULT_SCENARIOS = [
+    Scenario('small', 5, 1, 20, 0.5, 1),
+    Scenario('boundary_7', 7, 1, 40, 0.5, 2),
+    Scenario('boundary_8', 8, 1, 40, 0.5, 3),
+    Scenario('medium', 20, 4, 100, 0.4, 4),
+    Scenario('large', 60, 10, 300, 0.5, 5),
+]
+
+# 快速模式只跑小型情境（用於測試與 CI）
+QUICK_SCENARIOS = [
+    Scenario('quick_7', 7, 1, 8, 0.5, 1),
+    Scenario('quick_8', 8, 1, 8, 0.5, 2),
+]
+
+TARGETS = (
+    'update_scores', 'update_scores_noop', 'leaderboard', 'room_detail',
+    'serialize_room', 'serialize_room_fast', 'serialize_leaderboard', 'serialize_leaderboard_fast', 'export_pdf',
+)
+
+# 快速序列化與 DRF 序列化器的對照（用於計算每個請求節省的 CPU 時間）
+SERIALIZER_PAIRS = (
+    ('room_detail', 'serialize_room', 'serialize_room_fast'),
+    ('leaderboard', 'serialize_leaderboard', 'serialize_leaderboard_fast'),
+)
+
+
+def build_synthetic_room(scenario):
+    """依情境建立合成房間（成員、路線、成績都以 bulk_create 建立），並完成一次計分"""
+    rng = random.Random(scenario.seed)
+    room = Room.objects.create(name=f'基準-{scenario.name}')
+    Member.objects.bulk_create(
+        [Member(room=room, name=f'一般{i}', is_custom_calc=False) for i in range(scenario.normal_members)]
+        + [Member(room=room, name=f'客製{i}', is_custom_calc=True) for i in range(scenario.custom_members)]
+    )
+    Route.objects.bulk_create([
+        Route(room=room, name=f'R{i}', grade=f'V{i % 8}') for i in range(scenario.routes)
+    ])
+    members = list(Member.objects.filter(room=room).values_list('id', flat=True))
+    routes = list(Route.objects.filter(room=room).values_list('id', flat=True))
+    Score.objects.bulk_create([
+        Score(member_id=member_id, route_id=route_id, is_completed=rng.random() < scenario.density)
+        for route_id in routes for member_id in members
+    ], batch_size=2000)
+    update_scores(room.id)
+    return room
+
+
+def _reset_scores(room):
+    """把房間的分數清為 0，讓下一次 update_scores 必須重寫所有資料列"""
+    Score.objects.filter(route__room=room).update(score_attained=Decimal('0.00'))
+    Member.objects.filter(room=room).update(total_score=Decimal('0.00'))
+
+
+def measure(func, repeat=3, setup=None):
+    """
+    量測函數的耗時、SQL 查詢數與峰值記憶體
+
+    耗時以 repeat 次執行（不啟用 tracemalloc）取最短與中位數，同時記錄本程序的 CPU 時間；
+    查詢數與峰值記憶體另外執行一次量測，避免 tracemalloc 影響計時
+
+    返回:
+        dict: wall_ms_min、wall_ms_median、cpu_ms_median、queries、peak_memory_kb
+    """
+    timings = []
+    cpu_timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        func()
+        cpu_timings.append((time.process_time() - cpu_started) * 1000)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_ms_min': round(min(timings), 3),
+        'wall_ms_median': round(statistics.median(timings), 3),
+        'cpu_ms_median': round(statistics.median(cpu_timings), 3),
+        'queries': len(queries.captured_queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def _http_target(client, url):
+    def request():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} 返回 {response.status_code}')
+        # 確保串流或延遲產生的內容也被計入
+        return response.content
+    return request
+
+
+def _serialize_room(room_id):
+    """以 DRF 序列化器產生房間詳情（與快速路徑改寫前的 retrieve 相同的預取）"""
+    from django.db.models import Prefetch
+    from .models import annotate_completed_routes
+    from .serializers import RoomSerializer
+
+    room = Room.objects.prefetch_related(
+        'routes__scores__member',
+        Prefetch('members', queryset=annotate_completed_routes(Member.objects.order_by(*Member._meta.ordering))),
+    ).get(id=room_id)
+    return RoomSerializer(room).data
+
+
+def _serialize_leaderboard(room_id):
+    """以 DRF 序列化器產生完整排行榜"""
+    from .models import annotate_completed_routes, order_by_rank
+    from .serializers import LeaderboardSerializer
+
+    members = order_by_rank(annotate_completed_routes(Member.objects.filter(room_id=room_id)))
+    return LeaderboardSerializer({'room_info': {}, 'leaderboard': members}).data
+
+
+def _room_versions(room_id):
+    return Room.objects.values('id', 'name', 'standard_line_score', 'created_at', 'scores_version').get(id=room_id)
+
+
+def serializer_savings(results):
+    """
+    計算快速序列化每個請求節省的 CPU 時間
+
+    返回:
+        dict: {端點: {'serializer_cpu_ms', 'fast_cpu_ms', 'saved_cpu_ms', 'speedup'}}，缺少量測值的端點略過
+    """
+    savings = {}
+    for endpoint, slow_target, fast_target in SERIALIZER_PAIRS:
+        slow, fast = results.get(slow_target), results.get(fast_target)
+        if not slow or not fast or 'skipped' in slow or 'skipped' in fast:
+            continue
+        savings[endpoint] = {
+            'serializer_cpu_ms': slow['cpu_ms_median'],
+            'fast_cpu_ms': fast['cpu_ms_median'],
+            'saved_cpu_ms': round(slow['cpu_ms_median'] - fast['cpu_ms_median'], 3),
+            'speedup': round(slow['cpu_ms_median'] / fast['cpu_ms_median'], 2) if fast['cpu_ms_median'] else None,
+        }
+    return savings
+
+
+def renderer_comparison(payloads, repeat=3):
+    """
+    比較 JSONRenderer 與 FastJSONRenderer 渲染同一份回應資料的 CPU 時間
+
+    Args:
+        payloads: {端點: 回應資料}
+
+    返回:
+        dict: {端點: {'bytes', 'json_cpu_ms', 'fast_cpu_ms', 'speedup', 'identical'}}；
+              未安裝 orjson 時為 {'skipped': ...}
+    """
+    from rest_framework.renderers import JSONRenderer
+    from .renderers import ORJSON_AVAILABLE, FastJSONRenderer
+
+    if not ORJSON_AVAILABLE:
+        return {'skipped': 'orjson 未安裝'}
+
+    stock, fast = JSONRenderer(), FastJSONRenderer()
+    comparison = {}
+    for endpoint, data in payloads.items():
+        expected = stock.render(data)
+        json_cpu_ms = measure(lambda: stock.render(data), repeat)['cpu_ms_median']
+        fast_cpu_ms = measure(lambda: fast.render(data), repeat)['cpu_ms_median']
+        comparison[endpoint] = {
+            'bytes': len(expected),
+            'json_cpu_ms': json_cpu_ms,
+            'fast_cpu_ms': fast_cpu_ms,
+            'speedup': round(json_cpu_ms / fast_cpu_ms, 2) if fast_cpu_ms else None,
+            'identical': fast.render(data) == expected,
+        }
+    return comparison
+
+
+def run_scenario(scenario, repeat=3, targets=TARGETS):
+    """在交易中建立一個合成房間並量測所有項目，結束後回滾"""
+    from .fast_serializers import leaderboard_data, room_detail_data
+    from .views import REPORTLAB_AVAILABLE
+
+    results = {}
+    with transaction.atomic():
+        room = build_synthetic_room(scenario)
+        client = Client()
+        score_count = Score.objects.filter(route__room=room).count()
+
+        for target in targets:
+            if target == 'update_scores':
+                results[target] = measure(lambda: update_scores(room.id), repeat, setup=lambda: _reset_scores(room))
+            elif target == 'update_scores_noop':
+                results[target] = measure(lambda: update_scores(room.id), repeat)
+            elif target == 'leaderboard':
+                results[target] = measure(_http_target(client, f'/api/rooms/{room.id}/leaderboard/'), repeat)
+            elif target == 'room_detail':
+                results[target] = measure(_http_target(client, f'/api/rooms/{room.id}/'), repeat)
+            elif target == 'serialize_room':
+                results[target] = measure(lambda: _serialize_room(room.id), repeat)
+            elif target == 'serialize_room_fast':
+                results[target] = measure(lambda: room_detail_data(_room_versions(room.id)), repeat)
+            elif target == 'serialize_leaderboard':
+                results[target] = measure(lambda: _serialize_leaderboard(room.id), repeat)
+            elif target == 'serialize_leaderboard_fast':
+                results[target] = measure(lambda: leaderboard_data({}, room.id), repeat)
+            elif target == 'export_pdf':
+                if not REPORTLAB_AVAILABLE:
+                    results[target] = {'skipped': 'reportlab 未安裝'}
+                    continue
+                results[target] = measure(_http_target(client, f'/api/rooms/{room.id}/export-pdf/'), repeat)
+            else:
+                raise ValueError(f'未知的量測項目: {target}')
+
+        renderers = renderer_comparison({
+            'room_detail': room_detail_data(_room_versions(room.id)),
+            'leaderboard': leaderboard_data({}, room.id),
+        }, repeat)
+        transaction.set_rollback(True)
+
+    return {
+        'scenario': scenario._asdict(),
+        'scores': score_count,
+        'results': results,
+        'serializer_savings': serializer_savings(results),
+        'renderers': renderers,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(scenarios=None, repeat=3, targets=TARGETS, progress=None):
+    """
+    執行所有情境的基準
+
+    Args:
+        scenarios: Scenario 列表，預設為 DEFAULT_SCENARIOS
+        repeat: 每個項目計時的次數
+        targets: 要量測的項目
+        progress: 可選的回呼函數，每完成一個情境呼叫一次 progress(情境結果)
+
+    返回:
+        dict: meta（時間、提交、環境）與每個情境的結果
+    """
+    from .renderers import ORJSON_AVAILABLE
+
+    scenarios = DEFAULT_SCENARIOS if scenarios is None else scenarios
+    report = {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'orjson': ORJSON_AVAILABLE,
+        },
+        'scenarios': [],
+    }
+
+    # 量測期間關閉 PDF 導出等的 INFO 日誌，避免輸出影響耗時；
+    # 測試用戶端以 testserver 作為主機名稱
+    previous_disable = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS]):
+            for scenario in scenarios:
+                result = run_scenario(scenario, repeat=repeat, targets=targets)
+                report['scenarios'].append(result)
+                if progress:
+                    progress(result)
+    finally:
+        logging.disable(previous_disable)
+    return report
+
+
+def compare_reports(baseline, current, threshold=0.2):
+    """
+    比較兩份基準結果
+
+    耗時（wall_ms_median）增加超過 threshold 比例、或查詢數增加時視為退步
+
+    返回:
+        list: 每個退步項目一個 dict（scenario、target、metric、baseline、current）
+    """
+    baseline_results = {item['scenario']['name']: item['results'] for item in baseline.get('scenarios', [])}
+    regressions = []
+    for item in current.get('scenarios', []):
+        name = item['scenario']['name']
+        for target, metrics in item['results'].items():
+            before = baseline_results.get(name, {}).get(target)
+            if not before or 'skipped' in before or 'skipped' in metrics:
+                continue
+            if metrics['queries'] > before['queries']:
+                regressions.append({
+                    'scenario': name, 'target': target, 'metric': 'queries',
+                    'baseline': before['queries'], 'current': metrics['queries'],
+                })
+            if metrics['wall_ms_median'] > before['wall_ms_median'] * (1 + threshold):
+                regressions.append({
+                    'scenario': name, 'target': target, 'metric': 'wall_ms_median',
+                    'baseline': before['wall_ms_median'], 'current': metrics['wall_ms_median'],
+                })
+    return regressions
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
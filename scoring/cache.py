@@ -0,0 +1,147 @@
+"""
+排行榜快取
+
+以 Django 快取框架（預設 locmem，可設定為檔案快取，不需要外部服務）保存排行榜 API 的回應資料。
+快取鍵由房間 ID、房間建立時間、房間的 data_version 與房間的快取世代（generation）組成：
+- 透過 API 的寫入都會遞增 data_version（touch_room），資料庫中的版本在多程序之間共用
+- Member / Route / Score / Room 的 post_save 等訊號（scoring.signals），以及計分引擎寫回新的總分時，
+  都會遞增快取世代，涵蓋 Django Admin 或命令列等不經過 request_recompute 的修改
+- 房間建立時間避免刪除房間後重複使用相同 ID 的新房間讀到舊的快取
+只有在計分版本已追上資料版本（scores_version == data_version）時才寫入快取，避免快取重算前的舊總分。
+
+同一個快取鍵同時未命中時，只有取得重建鎖（cache.add）的請求會重建，
+其他請求短暫等待重建結果，等待逾時才自行計算（不寫入快取）。
+
+資料庫中的版本也用來產生 HTTP ETag（room_etag），讓房間詳情與排行榜 API 支援條件式 GET；
+ETag 不包含快取世代，多個 worker 程序對同一內容返回相同的 ETag。
+Django Admin 的修改經由 request_recompute 遞增 data_version（scoring.admin），
+直接修改資料後呼叫 update_scores 而分數改變時，update_scores 也會遞增 data_version。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_LEADERBOARD_CACHE_TIMEOUT = 300
+
+# 重建鎖的存活時間（秒），重建的請求異常中斷時鎖會自動過期
+REBUILD_LOCK_TIMEOUT = 10
+# 其他請求等待重建結果的最長時間與輪詢間隔（秒）
+REBUILD_WAIT = 2.0
+REBUILD_POLL_INTERVAL = 0.01
+
+
+def get_leaderboard_cache_timeout():
+    """讀取排行榜快取的存活時間（動態讀取設置，支持 @override_settings）"""
+    return getattr(settings, 'SCORING_LEADERBOARD_CACHE_TIMEOUT', DEFAULT_LEADERBOARD_CACHE_TIMEOUT)
+
+
+def _generation_key(room_id):
+    return f'scoring:room-generation:{room_id}'
+
+
+def get_room_generation(room_id):
+    """房間目前的快取世代"""
+    return cache.get(_generation_key(room_id), 0)
+
+
+def invalidate_room(room_id):
+    """遞增房間的快取世代，使該房間所有已快取的資料失效（同時清除本程序內預先渲染的回應）"""
+    from .payload_cache import payload_cache
+
+    payload_cache.discard_room(room_id)
+    key = _generation_key(room_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 世代尚未建立（或已被淘汰）；add 失敗代表其他請求剛建立，再遞增一次
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def invalidate_room_on_commit(room_id):
+    """
+    立即使房間的快取失效，並在交易提交後再失效一次
+    （清除其他請求在提交前以舊資料重建的快取）
+    """
+    invalidate_room(room_id)
+    transaction.on_commit(lambda: invalidate_room(room_id))
+
+
+def leaderboard_cache_key(room_id, created_at, data_version, generation):
+    return f'scoring:leaderboard:{room_id}:{created_at.timestamp()}:{data_version}:{generation}'
+
+
+def get_or_build(key, builder, timeout):
+    """
+    讀取快取，未命中時只讓一個請求執行 builder 重建
+
+    返回:
+        builder() 的結果（或其他請求剛重建的快取）
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=REBUILD_LOCK_TIMEOUT):
+        try:
+            value = builder()
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # 其他請求正在重建，等待結果
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.get(lock_key) is None:
+            # 重建的請求失敗或結果已被淘汰，不再等待
+            break
+    return builder()
+
+
+def get_cached_leaderboard(room, builder):
+    """
+    讀取房間的排行榜快取
+
+    Args:
+        room: 包含 id、created_at、data_version、scores_version 的 dict
+        builder: 無參數的函數，返回排行榜回應資料
+
+    返回:
+        排行榜回應資料
+    """
+    if room['scores_version'] != room['data_version']:
+        # 分數尚未重算到最新版本，不快取
+        return builder()
+    key = leaderboard_cache_key(
+        room['id'], room['created_at'], room['data_version'], get_room_generation(room['id'])
+    )
+    return get_or_build(key, builder, get_leaderboard_cache_timeout())
+
+
+def room_etag(room, kind, request):
+    """
+    由房間版本產生強 ETag
+
+    只使用資料庫中的狀態（房間 ID、建立時間、data_version、scores_version），所有 worker 程序對同一內容產生相同的 ETag；
+    不包含快取世代（保存在各程序的快取中，每個程序的值不同）。
+    房間詳情中的照片網址包含請求的主機名稱，因此 ETag 也包含主機名稱的摘要。
+    計分版本落後資料版本時返回 None（內容尚未穩定，不提供 ETag）
+
+    Args:
+        room: 包含 id、created_at、data_version、scores_version 的 dict
+        kind: 端點名稱（例如 'room'、'leaderboard'）
+    """
+    if room['scores_version'] != room['data_version']:
+        return None
+    origin = hashlib.sha1(request.build_absolute_uri('/').encode()).hexdigest()[:8]
+    created = int(room['created_at'].timestamp() * 1000000)
+    return f'"{kind}-{room["id"]}-{created}-{room["data_version"]}-{room["scores_version"]}-{origin}"'
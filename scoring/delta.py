@@ -0,0 +1,126 @@
+"""
+房間詳情的增量同步
+
+GET /api/rooms/{id}/ 的回應包含 version（房間完成計分的資料版本）。
+用戶端以 GET /api/rooms/{id}/?since=<version> 只取得該版本之後建立、修改或刪除的成員、路線與成績：
+- members / routes：有變動的成員與路線（格式與房間詳情相同，路線包含所有成績）
+- scores：有變動、且所屬路線不在 routes 中的成績（另含 route_id）
+- deleted_members / deleted_routes / deleted_scores：已刪除的 ID；
+  刪除成員或路線時其成績一併刪除，用戶端應自行移除（deleted_scores 不保證列出這些成績）
+
+變動來自 RoomChange（編輯時由訊號與批量寫入記錄，計分引擎記錄改寫的分數與總分）。
+同一物件可能因並行的寫入被重複返回，用戶端以 ID 覆蓋即可。
+
+變動記錄只保留最近 SCORING_CHANGE_LOG_RETENTION 個版本：計分引擎在記錄超過兩倍保留範圍時清除較舊的記錄，
+並把 Room.change_log_floor 推進到被清除的最新版本；since 早於此版本時房間詳情改為返回完整資料。
+"""
+from django.conf import settings
+
+from .fast_serializers import format_datetime
+from .models import Member, Room, Route, RoomChange, Score, annotate_completed_routes
+
+DEFAULT_CHANGE_LOG_RETENTION = 500
+
+
+def get_change_log_retention():
+    """讀取變動記錄保留的版本數（動態讀取設置，支持 @override_settings）"""
+    return max(1, int(getattr(settings, 'SCORING_CHANGE_LOG_RETENTION', DEFAULT_CHANGE_LOG_RETENTION)))
+
+
+def prune_changes(room_id, version, floor):
+    """
+    清除超過保留範圍的變動記錄（由計分引擎在記錄變動後呼叫）
+
+    只在記錄跨越兩倍保留範圍時才執行一次 DELETE，平常不增加查詢；
+    清除後保留最近 N 個版本，並把 change_log_floor 推進到被清除的最新版本
+
+    Args:
+        version: 這次計分對應的資料版本
+        floor: 房間目前的 change_log_floor
+    """
+    retention = get_change_log_retention()
+    if version - floor < 2 * retention:
+        return
+    new_floor = version - retention
+    Room.objects.filter(id=room_id, change_log_floor__lt=new_floor).update(change_log_floor=new_floor)
+    RoomChange.objects.filter(room_id=room_id, version__lte=new_floor).delete()
+
+
+def members_changed_since(room_id, version):
+    """
+    版本 version 之後總分、名次或資料有變動的成員（QuerySet，以子查詢篩選，不受 SQLite 參數數量限制）
+
+    之後的變動記錄已被清除時返回房間內所有成員
+    """
+    members = Member.objects.filter(room_id=room_id)
+    floor = Room.objects.filter(id=room_id).values_list('change_log_floor', flat=True).first()
+    if floor is not None and version < floor:
+        return members
+    return members.filter(id__in=RoomChange.objects.filter(
+        room_id=room_id, kind=RoomChange.KIND_MEMBER, version__gt=version
+    ).values('object_id'))
+
+
+def can_build_delta(room, since):
+    """since 之後的變動記錄是否完整（未被清除，且不比房間目前的版本新）"""
+    return room['change_log_floor'] <= since <= room['scores_version']
+
+
+def changed_ids(room_id, since):
+    """
+    讀取版本 since 之後的變動
+
+    返回:
+        dict: {類型: 物件 ID 集合}
+    """
+    changes = {RoomChange.KIND_MEMBER: set(), RoomChange.KIND_ROUTE: set(), RoomChange.KIND_SCORE: set()}
+    for kind, object_id in RoomChange.objects.filter(room_id=room_id, version__gt=since).values_list('kind', 'object_id'):
+        changes[kind].add(object_id)
+    return changes
+
+
+def build_room_delta(room, since, context):
+    """
+    組成增量同步的回應
+
+    Args:
+        room: 包含 id、name、standard_line_score、created_at、scores_version 的 dict
+        since: 用戶端已有的版本
+        context: 序列化器的 context（照片網址需要 request）
+    """
+    from .serializers import MemberSerializer, RouteSerializer, ScoreSerializer
+
+    changes = changed_ids(room['id'], since)
+
+    members = list(annotate_completed_routes(
+        Member.objects.filter(room_id=room['id'], id__in=changes[RoomChange.KIND_MEMBER])
+    )) if changes[RoomChange.KIND_MEMBER] else []
+    routes = list(Route.objects.filter(
+        room_id=room['id'], id__in=changes[RoomChange.KIND_ROUTE]
+    ).prefetch_related('scores__member')) if changes[RoomChange.KIND_ROUTE] else []
+
+    # 所屬路線已整條返回的成績不再單獨列出
+    route_ids = {route.id for route in routes}
+    score_ids = changes[RoomChange.KIND_SCORE]
+    scores = list(Score.objects.filter(
+        id__in=score_ids, route__room_id=room['id']
+    ).exclude(route_id__in=route_ids).select_related('member')) if score_ids else []
+    existing_scores = {score.id for score in scores}
+    existing_scores.update(score.id for route in routes for score in route.scores.all())
+
+    return {
+        'id': room['id'],
+        'name': room['name'],
+        'standard_line_score': room['standard_line_score'],
+        'created_at': format_datetime(room['created_at']),
+        'version': room['scores_version'],
+        'since': since,
+        'members': MemberSerializer(members, many=True, context=context).data,
+        'routes': RouteSerializer(routes, many=True, context=context).data,
+        'scores': [
+            {**ScoreSerializer(score, context=context).data, 'route_id': score.route_id} for score in scores
+        ],
+        'deleted_members': sorted(changes[RoomChange.KIND_MEMBER] - {member.id for member in members}),
+        'deleted_routes': sorted(changes[RoomChange.KIND_ROUTE] - route_ids),
+        'deleted_scores': sorted(score_ids - existing_scores),
+    }
@@ -0,0 +1,299 @@
+"""
+房間事件串流（Server-Sent Events）
+
+GET /api/rooms/{id}/events/ 以 text/event-stream 推送房間的變動：
+- leaderboard：每筆新的排行榜歷史記錄（LeaderboardSnapshot）一個事件，內容為有變動成員的總分與名次
+- room：房間完成計分的版本改變（成員、路線、成績有變動且已重算）
+
+不使用外部訊息代理：每個串流定期輪詢資料庫中房間的 scores_version，版本改變時才讀取新的歷史記錄，
+因此任何 gunicorn worker 寫入的變動，所有 worker 上的串流都看得到。
+串流在 SCORING_EVENTS_STREAM_DURATION 秒後結束（低於 gunicorn 的 timeout），
+瀏覽器的 EventSource 會帶著 Last-Event-ID 自動重新連線，從上次的位置繼續推送。
+
+生產環境由 nginx 把這個路徑轉發到 ASGI 服務（scoring.websocket.room_event_stream）：
+每個程序每個房間只有一個 RoomEventCursor 輪詢，串流不佔用執行緒，觀眾人數沒有上限。
+以下的 WSGI 視圖是沒有 ASGI 服務時的後備：gthread worker 中每個串流在結束前佔用一個請求執行緒
+與一個資料庫連線，因此每個程序同時開啟的串流數以 SCORING_EVENTS_MAX_STREAMS 限制（stream_slots），
+名額已滿時返回 503 與 Retry-After，頁面改以 ETag 條件式請求輪詢，其餘執行緒保留給裁判的寫入。
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+
+from .models import LeaderboardSnapshot, Room
+from .recompute import ensure_scores_fresh
+from .scoring_kernel import cents_to_decimal
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_STREAM_DURATION = 25.0
+# 沒有事件時送出註解行的間隔（讓代理伺服器保持連線，並及早發現用戶端已斷線）
+KEEPALIVE_INTERVAL = 10.0
+# 串流結束後 EventSource 重新連線前等待的毫秒數
+RECONNECT_DELAY_MS = 1000
+DEFAULT_MAX_STREAMS = 2
+# 串流名額已滿時回應的 Retry-After 秒數
+BUSY_RETRY_AFTER = 30
+
+
+def get_poll_interval():
+    """讀取輪詢資料庫的間隔秒數（動態讀取設置，支持 @override_settings）"""
+    return float(getattr(settings, 'SCORING_EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+
+
+def get_stream_duration():
+    """讀取單一串流連線的最長秒數"""
+    return float(getattr(settings, 'SCORING_EVENTS_STREAM_DURATION', DEFAULT_STREAM_DURATION))
+
+
+def get_max_streams():
+    """讀取每個程序同時開啟的串流上限（0 代表不提供串流，全部改為輪詢）"""
+    return int(getattr(settings, 'SCORING_EVENTS_MAX_STREAMS', DEFAULT_MAX_STREAMS))
+
+
+class StreamSlots:
+    """本程序同時開啟的串流數（上限見 get_max_streams）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def acquire(self):
+        """取得一個名額，已滿時返回 False"""
+        with self._lock:
+            if self.active >= get_max_streams():
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active = max(self.active - 1, 0)
+
+
+stream_slots = StreamSlots()
+
+
+class SlotStream:
+    """
+    包裝串流產生器，串流結束、發生錯誤或連線關閉（close）時歸還名額
+
+    StreamingHttpResponse 在回應結束時呼叫 close()；尚未開始的產生器被關閉時不會執行 finally，
+    因此由這個包裝負責歸還（只歸還一次）
+    """
+
+    def __init__(self, stream, slots):
+        self._stream = stream
+        self._slots = slots
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._slots.release()
+        self._stream.close()
+
+
+def format_event(event, data, event_id=None, retry=None):
+    """
+    格式化一個 SSE 事件
+
+    Args:
+        event: 事件名稱
+        data: 可轉為 JSON 的內容
+        event_id: 事件 ID（瀏覽器重新連線時以 Last-Event-ID 送回）
+        retry: 重新連線前等待的毫秒數
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def format_event_id(scores_version, snapshot_id):
+    return f'{scores_version}:{snapshot_id}'
+
+
+def parse_event_id(value):
+    """
+    解析 Last-Event-ID
+
+    返回:
+        tuple: (已推送的計分版本, 已推送的最後一筆歷史記錄 ID)；格式不正確時返回 None
+    """
+    try:
+        scores_version, snapshot_id = (int(part) for part in str(value).split(':'))
+    except (TypeError, ValueError):
+        return None
+    if scores_version < 0 or snapshot_id < 0:
+        return None
+    return scores_version, snapshot_id
+
+
+def event_position(event_id):
+    """
+    事件 ID 在串流中的先後位置：(歷史記錄 ID, 計分版本)，依 tuple 比較
+
+    leaderboard 事件的計分版本是推送前的版本、room 事件是新的版本，
+    因此同一段變動的事件不論由哪個游標推送，位置都依推送順序遞增；
+    沒有 ID 的事件（deleted）返回 None
+    """
+    position = parse_event_id(event_id) if event_id is not None else None
+    if position is None:
+        return None
+    scores_version, snapshot_id = position
+    return snapshot_id, scores_version
+
+
+def _room_versions(room_id):
+    return Room.objects.filter(pk=room_id).values('data_version', 'scores_version').first()
+
+
+def _latest_snapshot_id(room_id):
+    return LeaderboardSnapshot.objects.filter(room_id=room_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _format_standings(entries):
+    """把歷史記錄中的 {成員ID: [總分（分）, 名次]} 轉為 API 使用的格式（移除的成員為 null）"""
+    return {
+        member_id: None if entry is None else {
+            'total_score': str(cents_to_decimal(entry[0])),
+            'rank': entry[1],
+        }
+        for member_id, entry in entries.items()
+    }
+
+
+class RoomEventCursor:
+    """
+    記錄已推送到的位置（計分版本與最後一筆歷史記錄 ID），poll() 返回之後的事件
+
+    SSE 串流每個連線一個；WebSocket（scoring.websocket）每個程序每個房間只有一個，
+    輪詢結果再分送給所有連線
+    """
+
+    def __init__(self, room_id, last_event_id=None):
+        self.room_id = room_id
+        self.last_event_id = last_event_id
+        self.scores_version = None
+        self.snapshot_id = None
+        self.closed = False
+
+    @property
+    def event_id(self):
+        return format_event_id(self.scores_version, self.snapshot_id)
+
+    def _deleted(self):
+        self.closed = True
+        return [('deleted', {'room_id': self.room_id}, None)]
+
+    def start(self):
+        """
+        建立連線時呼叫：沒有（或無法解析）Last-Event-ID 時從目前的狀態開始並返回 ready 事件
+
+        返回:
+            list: [(事件名稱, 內容, 事件 ID)]
+        """
+        versions = _room_versions(self.room_id)
+        if versions is None:
+            return self._deleted()
+
+        cursor = parse_event_id(self.last_event_id) if self.last_event_id else None
+        if cursor is not None:
+            self.scores_version, self.snapshot_id = cursor
+            return []
+        self.scores_version, self.snapshot_id = versions['scores_version'], _latest_snapshot_id(self.room_id)
+        return [('ready', {'room_id': self.room_id, **versions}, self.event_id)]
+
+    def poll(self):
+        """
+        查詢房間的計分版本，改變時返回新的 leaderboard 事件與一個 room 事件
+
+        返回:
+            list: [(事件名稱, 內容, 事件 ID)]；房間已刪除時返回 deleted 事件並設定 closed
+        """
+        versions = _room_versions(self.room_id)
+        if versions is None:
+            return self._deleted()
+        if versions['scores_version'] < versions['data_version']:
+            # lazy 模式下沒有人讀取就不會重算；串流代替讀取端觸發重算
+            ensure_scores_fresh(self.room_id)
+            versions = _room_versions(self.room_id)
+            if versions is None:
+                return self._deleted()
+        if versions['scores_version'] == self.scores_version:
+            return []
+
+        events = []
+        snapshots = LeaderboardSnapshot.objects.filter(
+            room_id=self.room_id, id__gt=self.snapshot_id
+        ).order_by('id').values('id', 'scores_version', 'is_checkpoint', 'standings', 'created_at')
+        for snapshot in snapshots:
+            self.snapshot_id = snapshot['id']
+            events.append(('leaderboard', {
+                'scores_version': snapshot['scores_version'],
+                'checkpoint': snapshot['is_checkpoint'],
+                'created_at': snapshot['created_at'].isoformat(),
+                'standings': _format_standings(snapshot['standings']),
+            }, self.event_id))
+        self.scores_version = versions['scores_version']
+        events.append(('room', {'room_id': self.room_id, **versions}, self.event_id))
+        return events
+
+
+def room_events(room_id, last_event_id=None, poll_interval=None, duration=None,
+                sleep=time.sleep, clock=time.monotonic):
+    """
+    房間事件串流的產生器（每次 yield 一段 SSE 文字）
+
+    Args:
+        room_id: 房間 ID
+        last_event_id: 用戶端重新連線時送回的 Last-Event-ID；提供時補送之後的歷史記錄
+        poll_interval: 輪詢間隔秒數，預設讀取設置
+        duration: 串流最長秒數，預設讀取設置
+        sleep, clock: 可替換的等待與計時函數（測試用）
+    """
+    poll_interval = get_poll_interval() if poll_interval is None else poll_interval
+    duration = get_stream_duration() if duration is None else duration
+    started = last_output = clock()
+
+    cursor = RoomEventCursor(room_id, last_event_id)
+    events = cursor.start()
+    if events:
+        event, data, event_id = events[0]
+        yield format_event(event, data, event_id=event_id, retry=RECONNECT_DELAY_MS)
+    else:
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+
+    while not cursor.closed:
+        events = cursor.poll()
+        for event, data, event_id in events:
+            yield format_event(event, data, event_id=event_id)
+        if events:
+            last_output = clock()
+        if cursor.closed:
+            return
+
+        now = clock()
+        if now - started >= duration:
+            return
+        if now - last_output >= KEEPALIVE_INTERVAL:
+            yield ': keepalive\n\n'
+            last_output = now
+
+        sleep(poll_interval)
@@ -0,0 +1,130 @@
+"""
+房間詳情與排行榜的唯讀快速序列化
+
+RoomSerializer / MemberSerializer 對每位成員、每條路線、每筆成績各建立一次欄位物件的序列化流程，
+大房間的 CPU 時間主要花在 DRF 的逐欄位處理與 ORM 建立模型實例上。
+這裡以 .values() 查詢直接組成 dict，輸出與序列化器逐位元組相同（欄位順序、小數與時間格式一致），
+只用於 GET 回應；寫入後的回應仍使用序列化器。
+
+小數與時間以 DRF 欄位的 to_representation 格式化（時區、'Z' 結尾與小數位數與序列化器一致），
+成績的分數只有少數幾種值，格式化結果以 lru_cache 快取。
+"""
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from .models import Member, Route, Score, annotate_completed_routes, order_by_rank
+
+_decimal_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+_datetime_field = serializers.DateTimeField()
+
+
+@lru_cache(maxsize=4096)
+def format_decimal(value):
+    """與 DecimalField(max_digits=10, decimal_places=2) 相同的字串格式（相等的值結果相同，可快取）"""
+    return _decimal_field.to_representation(value)
+
+
+def format_datetime(value):
+    """與 DateTimeField 相同的格式（轉換到目前時區的 ISO 8601）"""
+    return _datetime_field.to_representation(value)
+
+
+def _file_url(name, request):
+    """與 ImageField 序列化相同：有檔案時返回網址（有 request 時為絕對網址）"""
+    url = Route._meta.get_field('photo').storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+MEMBER_VALUE_FIELDS = ('id', 'room', 'name', 'is_custom_calc', 'total_score', 'rank', 'dense_rank')
+
+
+def _member_dict(member, completed_routes_count):
+    return {
+        'id': member['id'],
+        'room': member['room'],
+        'name': member['name'],
+        'is_custom_calc': member['is_custom_calc'],
+        'total_score': format_decimal(member['total_score']),
+        'rank': member['rank'],
+        'dense_rank': member['dense_rank'],
+        'completed_routes_count': completed_routes_count,
+    }
+
+
+def leaderboard_data(room_info, room_id):
+    """
+    組成與 LeaderboardSerializer 相同的完整排行榜（一次查詢）
+
+    Args:
+        room_info: 排行榜回應中的 room_info
+    """
+    members = order_by_rank(annotate_completed_routes(Member.objects.filter(room_id=room_id))).values(
+        *MEMBER_VALUE_FIELDS, 'completed_routes_count'
+    )
+    return {
+        'room_info': room_info,
+        'leaderboard': [_member_dict(member, member['completed_routes_count']) for member in members],
+    }
+
+
+def room_detail_data(room, request=None):
+    """
+    組成與 RoomSerializer 相同的房間詳情（成員、路線、成績各一次查詢）
+
+    成員的完成路線數由已讀取的成績計算，不另外聚合；成績的成員名稱取自成員查詢，不需 JOIN。
+
+    Args:
+        room: 包含 id、name、standard_line_score、created_at、scores_version 的 dict
+        request: 用於產生照片的絕對網址
+    """
+    room_id = room['id']
+    # 成員按 Member.Meta.ordering 排列（與 RoomViewSet 預取成員時明確指定的排序相同）
+    members = list(
+        Member.objects.filter(room_id=room_id).order_by(*Member._meta.ordering).values(*MEMBER_VALUE_FIELDS)
+    )
+    routes = list(Route.objects.filter(room_id=room_id).values(
+        'id', 'name', 'grade', 'photo', 'photo_url', 'created_at'
+    ))
+
+    # 與預取 routes__scores 相同的查詢條件與排序，每條路線內的成績順序與序列化器一致
+    route_scores = {route['id']: [] for route in routes}
+    completed_counts = {member['id']: 0 for member in members}
+    member_names = {member['id']: member['name'] for member in members}
+    if routes:
+        scores = Score.objects.filter(route_id__in=list(route_scores)).values_list(
+            'id', 'route_id', 'member_id', 'is_completed', 'score_attained'
+        )
+        for score_id, route_id, member_id, is_completed, score_attained in scores:
+            route_scores[route_id].append({
+                'id': score_id,
+                'member_id': member_id,
+                'member_name': member_names[member_id],
+                'is_completed': is_completed,
+                'score_attained': format_decimal(score_attained),
+            })
+            if is_completed:
+                completed_counts[member_id] += 1
+
+    route_data = []
+    for route in routes:
+        photo = _file_url(route['photo'], request) if route['photo'] else None
+        route_data.append({
+            'id': route['id'],
+            'name': route['name'],
+            'grade': route['grade'],
+            'photo': photo,
+            'photo_url': photo or route['photo_url'] or '',
+            'scores': route_scores[route['id']],
+            'created_at': format_datetime(route['created_at']),
+        })
+
+    return {
+        'id': room_id,
+        'name': room['name'],
+        'standard_line_score': room['standard_line_score'],
+        'members': [_member_dict(member, completed_counts[member['id']]) for member in members],
+        'routes': route_data,
+        'created_at': format_datetime(room['created_at']),
+        'version': room['scores_version'],
+    }
@@ -0,0 +1,166 @@
+"""
+排行榜歷史
+
+每次重算後由計分引擎呼叫，把總分或名次有變動的成員追加為一筆差異記錄（LeaderboardSnapshot）。
+每累積 SCORING_HISTORY_CHECKPOINT_INTERVAL 筆差異寫入一次完整檢查點，
+因此查詢任一時間點的排行榜只需讀取最近的檢查點與其後最多 N 筆差異，不需要重播整段歷史。
+
+名次採用與排行榜頁面相同的方式：同分同名次，下一個名次跳過並列人數。
+"""
+from django.conf import settings
+from django.db.models import Subquery
+
+from .models import LeaderboardSnapshot
+from .scoring_kernel import competition_ranks
+
+DEFAULT_CHECKPOINT_INTERVAL = 20
+
+
+def get_checkpoint_interval():
+    """讀取兩個檢查點之間最多的差異筆數（動態讀取設置，支持 @override_settings）"""
+    return max(1, int(getattr(settings, 'SCORING_HISTORY_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL)))
+
+
+def rank_standings(totals):
+    """
+    由成員總分計算排名
+
+    Args:
+        totals: {成員ID: 總分（分）}
+
+    返回:
+        dict: {成員ID: (總分, 名次)}
+    """
+    ordered = sorted(totals.items(), key=lambda item: -item[1])
+    ranks = competition_ranks([total for _, total in ordered])
+    return {member_id: (total, rank) for (member_id, total), rank in zip(ordered, ranks)}
+
+
+def _replay(rows):
+    """從檢查點開始依序套用差異記錄，返回 {成員ID: (總分, 名次)}"""
+    standings = {}
+    for is_checkpoint, entries in rows:
+        if is_checkpoint:
+            standings = {}
+        for member_id, entry in entries.items():
+            if entry is None:
+                standings.pop(int(member_id), None)
+            else:
+                standings[int(member_id)] = tuple(entry)
+    return standings
+
+
+def _rows_since_checkpoint(queryset):
+    """以單一查詢讀取 queryset 中最近的檢查點與其後的所有記錄"""
+    checkpoint = queryset.filter(is_checkpoint=True).order_by('-id').values('id')[:1]
+    return list(
+        queryset.filter(id__gte=Subquery(checkpoint)).order_by('id').values_list('is_checkpoint', 'standings')
+    )
+
+
+def load_latest_standings(room_id):
+    """
+    讀取房間目前記錄的排名
+
+    返回:
+        tuple: ({成員ID: (總分, 名次)}, 最近檢查點之後的差異筆數)；沒有任何檢查點時返回 (None, 0)
+    """
+    rows = _rows_since_checkpoint(LeaderboardSnapshot.objects.filter(room_id=room_id))
+    if not rows:
+        return None, 0
+    return _replay(rows), len(rows) - 1
+
+
+def record_standings(room_id, totals, version, latest=None):
+    """
+    記錄重算後的排名（只寫入有變動的成員）
+
+    Args:
+        totals: 房間所有成員的總分 {成員ID: 總分（分）}
+        version: 這次計分對應的資料版本
+        latest: 已讀取的 load_latest_standings() 結果，未提供時讀取
+
+    返回:
+        LeaderboardSnapshot: 寫入的記錄，排名沒有變動時返回 None
+    """
+    standings = rank_standings(totals)
+    previous, pending = latest if latest is not None else load_latest_standings(room_id)
+
+    if previous is None or pending >= get_checkpoint_interval():
+        if previous == standings:
+            return None
+        entries = {str(member_id): list(entry) for member_id, entry in standings.items()}
+        is_checkpoint = True
+    else:
+        entries = {
+            str(member_id): list(entry)
+            for member_id, entry in standings.items() if previous.get(member_id) != entry
+        }
+        entries.update({str(member_id): None for member_id in previous.keys() - standings.keys()})
+        if not entries:
+            return None
+        is_checkpoint = False
+
+    return LeaderboardSnapshot.objects.create(
+        room_id=room_id, scores_version=version, is_checkpoint=is_checkpoint, standings=entries
+    )
+
+
+def standings_as_of(room_id, timestamp):
+    """
+    重建指定時間點的排名（最近的檢查點加上其後的差異，以單一查詢讀取）
+
+    返回:
+        tuple: ({成員ID: (總分, 名次)}, 該時間點最後一筆記錄)；時間點早於第一個檢查點時返回 ({}, None)
+    """
+    queryset = LeaderboardSnapshot.objects.filter(room_id=room_id, created_at__lte=timestamp)
+    checkpoint = queryset.filter(is_checkpoint=True).order_by('-id').values('id')[:1]
+    rows = list(
+        queryset.filter(id__gte=Subquery(checkpoint)).order_by('id').values(
+            'is_checkpoint', 'standings', 'created_at', 'scores_version'
+        )
+    )
+    if not rows:
+        return {}, None
+    return _replay((row['is_checkpoint'], row['standings']) for row in rows), rows[-1]
+
+
+def member_rank_series(room_id, member_id, since=None, until=None):
+    """
+    成員的名次與總分隨時間的變化
+
+    只讀取提及該成員的記錄（檢查點與該成員有變動的差異）；
+    連續相同的值只保留第一筆，成員被刪除時名次與總分為 None
+
+    返回:
+        list: [{'timestamp', 'rank', 'total'}]，total 為以分為單位的整數
+    """
+    queryset = LeaderboardSnapshot.objects.filter(room_id=room_id, standings__has_key=str(member_id))
+    if until is not None:
+        queryset = queryset.filter(created_at__lte=until)
+
+    def point(timestamp, value):
+        return {
+            'timestamp': timestamp,
+            'total': value[0] if value else None,
+            'rank': value[1] if value else None,
+        }
+
+    series = []
+    latest = None
+    for created_at, entries in queryset.order_by('id').values_list('created_at', 'standings'):
+        entry = entries.get(str(member_id))
+        value = tuple(entry) if entry is not None else None
+        if since is not None and created_at < since:
+            # since 之前的記錄只用來決定 since 當下的值
+            latest = value
+            continue
+        if not series and since is not None and latest is not None:
+            series.append(point(since, latest))
+        if series and value == latest:
+            continue
+        series.append(point(created_at, value))
+        latest = value
+    if not series and since is not None and latest is not None:
+        series.append(point(since, latest))
+    return series
@@ -0,0 +1,92 @@
+"""
+排行榜分頁
+
+GET /api/rooms/{id}/leaderboard/ 的查詢參數：
+- limit=N：只返回前 N 名（例如大螢幕只顯示前 20 名）
+- around=<成員ID>：返回該成員附近的 limit 位成員（該成員置中，接近榜首或榜尾時往另一側補足）
+- cursor=<游標>：從上一頁回應的 next 繼續往下讀取 limit 位成員
+
+成員按計分引擎寫入的名次排序（同名次按名稱，名稱在房間內唯一），
+游標記錄上一頁最後一位成員的 (名次, 名稱)，以 (room, rank, name) 索引直接定位下一頁，
+不需要 OFFSET，也不需要載入或排序其他成員。
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+from .models import Member, annotate_completed_routes, order_by_rank
+
+DEFAULT_LEADERBOARD_LIMIT = 20
+MAX_LEADERBOARD_LIMIT = 500
+
+
+def encode_cursor(member):
+    """以成員的 (名次, 名稱) 產生游標"""
+    payload = json.dumps([member.rank, member.name], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """
+    解析游標
+
+    返回:
+        tuple: (名次, 名稱)；格式不正確時返回 None
+    """
+    try:
+        rank, name = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(rank, int) or isinstance(rank, bool) or rank < 1 or not isinstance(name, str):
+        return None
+    return rank, name
+
+
+def _ranked_members(room_id):
+    # 尚未計分（名次為 None）的成員不在分頁結果中；讀取排行榜前已確保計分為最新
+    return annotate_completed_routes(Member.objects.filter(room_id=room_id, rank__isnull=False))
+
+
+def _after(members, rank, name):
+    return members.filter(Q(rank__gt=rank) | Q(rank=rank, name__gt=name))
+
+
+def _before(members, rank, name):
+    return members.filter(Q(rank__lt=rank) | Q(rank=rank, name__lt=name))
+
+
+def leaderboard_page(room_id, limit, around=None, cursor=None):
+    """
+    讀取排行榜的一頁
+
+    Args:
+        room_id: 房間 ID
+        limit: 最多返回的成員數
+        around: 置中的成員（Member），與 cursor 不同時使用
+        cursor: decode_cursor() 的結果，從該位置之後開始
+
+    返回:
+        tuple: (成員列表, 下一頁的游標或 None)
+    """
+    members = _ranked_members(room_id)
+    if around is not None:
+        # 往前最多讀取 limit - 1 位、往後（包含該成員）最多讀取 limit 位，再取出以該成員為中心的 limit 位
+        before = list(order_by_rank(_before(members, around.rank, around.name)).reverse()[:limit - 1])
+        before.reverse()
+        after = list(order_by_rank(members.filter(
+            Q(rank__gt=around.rank) | Q(rank=around.rank, name__gte=around.name)
+        ))[:limit + 1])
+        has_next = len(after) > limit
+        window = before + after[:limit]
+        start = max(0, min(len(before) - (limit - 1) // 2, len(window) - limit))
+        page = window[start:start + limit]
+        has_next = has_next or start + limit < len(window)
+    else:
+        if cursor is not None:
+            members = _after(members, *cursor)
+        page = list(order_by_rank(members)[:limit + 1])
+        has_next = len(page) > limit
+        page = page[:limit]
+
+    return page, encode_cursor(page[-1]) if has_next and page else None
@@ -0,0 +1,239 @@
+"""
+即時推送負載測試：WebSocket 廣播與 HTTP 輪詢的比較
+
+在合成房間上量測（不經過網路，只計算應用程式本身的成本）：
+- HTTP 輪詢：排行榜 API 的 304（If-None-Match 相符）與 200（快取命中）耗時；
+  每位觀眾每個輪詢間隔發出一次請求，成績變動後需要一次 200
+- WebSocket：N 位觀眾連線到 scoring.websocket 的記憶體用量，以及裁判送出一筆成績後
+  所有觀眾收到 room 事件的時間（包含寫入、重算與廣播）
+
+由量測結果估算單一程序（一顆 CPU 完全用於推送）在指定的更新頻率下可支撐的觀眾數。
+合成資料在交易中建立，結束後回滾。
+
+使用方式：python manage.py loadtest_realtime（參見該命令的說明）
+"""
+import asyncio
+import logging
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .benchmark import Scenario, build_synthetic_room
+from .models import Route, Score
+from .websocket import RoomChannelLayer, room_websocket
+
+LOADTEST_SCENARIO = Scenario('realtime', 20, 4, 60, 0.4, 11)
+
+
+def measure_http_polling(room_id, repeat=50):
+    """
+    量測排行榜輪詢的單次請求成本
+
+    返回:
+        dict: not_modified_ms / full_ms（中位數）與每次請求的查詢數
+    """
+    client = Client()
+    url = f'/api/rooms/{room_id}/leaderboard/'
+    etag = client.get(url)['ETag']
+
+    def timed(**headers):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url, **headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), response.status_code
+
+    not_modified_ms, not_modified_status = timed(HTTP_IF_NONE_MATCH=etag)
+    full_ms, full_status = timed()
+    if (not_modified_status, full_status) != (304, 200):
+        raise RuntimeError(f'排行榜返回 {not_modified_status} / {full_status}')
+
+    with CaptureQueriesContext(connection) as not_modified_queries:
+        client.get(url, HTTP_IF_NONE_MATCH=etag)
+    with CaptureQueriesContext(connection) as full_queries:
+        client.get(url)
+    return {
+        'not_modified_ms': round(not_modified_ms, 3),
+        'full_ms': round(full_ms, 3),
+        'not_modified_queries': len(not_modified_queries.captured_queries),
+        'full_queries': len(full_queries.captured_queries),
+    }
+
+
+class _Tracker:
+    """統計所有記憶體用戶端收到的 ready 與 room 訊息數"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.counts = {}
+        self.done = asyncio.Event()
+
+    def record(self, message_type):
+        count = self.counts.get(message_type, 0) + 1
+        self.counts[message_type] = count
+        if count == self.expected:
+            self.done.set()
+
+    async def wait_for(self, message_type, expected, timeout):
+        self.counts[message_type] = 0
+        self.expected = expected
+        self.done.clear()
+        await asyncio.wait_for(self.done.wait(), timeout)
+
+
+class _MemorySocket:
+    """不經過網路的 WebSocket 用戶端：直接以 ASGI 訊息與應用程式互動"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.inbox = asyncio.Queue()
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send(self, message):
+        if message['type'] != 'websocket.send':
+            return
+        # 訊息以 {"type":"<事件名稱>" 開頭，不需完整解析 JSON
+        text = message['text']
+        self.tracker.record(text[9:text.index('"', 9)])
+
+
+async def _websocket_round(room_id, spectators, changes, poll_interval, timeout, count_queries):
+    tracker = _Tracker(spectators + 1)
+    layer = RoomChannelLayer(poll_interval=poll_interval)
+    scope = {'type': 'websocket', 'path': f'/ws/rooms/{room_id}/', 'headers': []}
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    sockets = [_MemorySocket(tracker) for _ in range(spectators + 1)]
+    tasks = []
+    for socket in sockets:
+        tasks.append(asyncio.ensure_future(room_websocket(scope, socket.receive, socket.send, layer=layer)))
+        socket.inbox.put_nowait({'type': 'websocket.connect'})
+    try:
+        await tracker.wait_for('ready', spectators + 1, timeout)
+        connect_ms = (time.perf_counter() - started) * 1000
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    judge = sockets[0]
+    fanout_ms = []
+    queries_before = await sync_to_async(count_queries)()
+    for member_id, route_id, is_completed in changes:
+        started = time.perf_counter()
+        judge.inbox.put_nowait({'type': 'websocket.receive', 'text': (
+            '{"type":"scores","changes":[{"member_id":%d,"route_id":%d,"is_completed":%s}]}'
+            % (member_id, route_id, 'true' if is_completed else 'false')
+        )})
+        await tracker.wait_for('room', spectators + 1, timeout)
+        fanout_ms.append((time.perf_counter() - started) * 1000)
+    queries = await sync_to_async(count_queries)() - queries_before
+
+    for socket in sockets:
+        socket.inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+    await asyncio.gather(*tasks)
+
+    return {
+        'connect_ms': round(connect_ms, 3),
+        'memory_kb_per_connection': round((after - before) / 1024 / (spectators + 1), 2),
+        'fanout_ms_median': round(statistics.median(fanout_ms), 3),
+        'fanout_ms_max': round(max(fanout_ms), 3),
+        'queries_per_update': round(queries / len(changes), 1),
+    }
+
+
+def measure_websocket(room_id, spectators, updates=10, poll_interval=1.0, timeout=60):
+    """
+    量測 N 位觀眾的 WebSocket 廣播（另有一個裁判連線送出成績）
+
+    返回:
+        dict: 連線耗時、每個連線的記憶體、每次更新送達所有觀眾的耗時（中位數與最大值）與每次更新的查詢數
+    """
+    # 輪流切換第一條路線上各成員的完成狀態，每次更新都會寫入並重算
+    route_id = Route.objects.filter(room_id=room_id).order_by('id').values_list('id', flat=True).first()
+    states = dict(Score.objects.filter(route_id=route_id).order_by('member_id').values_list('member_id', 'is_completed'))
+    members = list(states)
+    changes = []
+    for index in range(updates):
+        member_id = members[index % len(members)]
+        states[member_id] = not states[member_id]
+        changes.append((member_id, route_id, states[member_id]))
+
+    # 只計算更新期間的查詢（包含頻道層的輪詢），不包含每個連線建立時的查詢
+    with CaptureQueriesContext(connection) as queries:
+        return async_to_sync(_websocket_round)(
+            room_id, spectators, changes, poll_interval, timeout, lambda: len(queries)
+        )
+
+
+def estimate_capacity(http, websocket, spectators, poll_interval, update_rate):
+    """
+    估算單一程序可支撐的觀眾數
+
+    - 輪詢：每位觀眾每秒 1/poll_interval 次 304，加上每次更新一次 200
+    - WebSocket：每次更新的耗時按觀眾人數平均（包含寫入與重算，因此是上限；閒置時沒有每位觀眾的成本）
+    """
+    polling_seconds = (
+        (1 / poll_interval) * http['not_modified_ms'] + update_rate * (http['full_ms'] - http['not_modified_ms'])
+    ) / 1000
+    websocket_seconds = update_rate * websocket['fanout_ms_median'] / 1000 / spectators
+    return {
+        'polling': int(1 / polling_seconds) if polling_seconds > 0 else None,
+        'websocket': int(1 / websocket_seconds) if websocket_seconds > 0 else None,
+    }
+
+
+def run_loadtest(spectator_counts, updates=10, poll_interval=2.0, update_rate=0.2,
+                 scenario=LOADTEST_SCENARIO, progress=None):
+    """
+    執行負載測試
+
+    Args:
+        spectator_counts: 要量測的觀眾人數列表
+        updates: 每種人數送出的成績更新次數
+        poll_interval: HTTP 輪詢的間隔秒數（也作為 WebSocket 頻道層的資料庫輪詢間隔）
+        update_rate: 估算容量時假設的每秒成績更新次數
+        progress: 可選的回呼函數，每完成一種人數呼叫一次 progress(結果)
+
+    返回:
+        dict: 設定、HTTP 輪詢的單次成本與每種人數的 WebSocket 結果及容量估算
+    """
+    report = {
+        'settings': {
+            'scenario': scenario._asdict(),
+            'updates': updates,
+            'poll_interval': poll_interval,
+            'update_rate': update_rate,
+            'database': connection.vendor,
+        },
+        'http_polling': None,
+        'websocket': [],
+    }
+
+    previous_disable = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        with override_settings(ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS]), transaction.atomic():
+            room = build_synthetic_room(scenario)
+            report['http_polling'] = http = measure_http_polling(room.id)
+            for spectators in spectator_counts:
+                websocket = measure_websocket(room.id, spectators, updates=updates, poll_interval=poll_interval)
+                websocket['spectators'] = spectators
+                websocket['capacity'] = estimate_capacity(http, websocket, spectators, poll_interval, update_rate)
+                report['websocket'].append(websocket)
+                if progress:
+                    progress(websocket)
+            transaction.set_rollback(True)
+    finally:
+        logging.disable(previous_disable)
+    return report
@@ -0,0 +1,136 @@
+"""
+Django 管理命令：執行計分效能基準
+
+以合成房間量測 update_scores、排行榜、房間詳情與 PDF 導出的耗時、
+CPU 時間、SQL 查詢數與峰值記憶體（含 DRF 序列化器與快速序列化、JSONRenderer 與 orjson 渲染的對照），並可將結果寫入 JSON 檔案或與先前的結果比較。
+合成資料在交易中建立，執行結束後回滾。
+
+使用方法：
+    python manage.py benchmark_scoring --output benchmark.json
+
+可選參數：
+    --output: 將結果寫入 JSON 檔案
+    --compare: 與先前的 JSON 結果比較，出現退步時以非零狀態結束
+    --threshold: 耗時退步門檻比例（預設 0.2，即慢 20% 以上視為退步）
+    --repeat: 每個項目計時的次數（預設 3）
+    --scenario: 只執行指定名稱的情境（可重複）
+    --quick: 只執行小型情境（適合 CI）
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scoring.benchmark import (
+    DEFAULT_SCENARIOS, QUICK_SCENARIOS, compare_reports, load_report, run_benchmarks, write_report,
+)
+
+logger = logging.getLogger('scoring')
+
+
+class Command(BaseCommand):
+    help = '以合成房間執行計分效能基準，輸出可在不同提交之間比較的 JSON 結果'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='將結果寫入 JSON 檔案',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            default=None,
+            help='與先前的 JSON 結果比較',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='耗時退步門檻比例',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='每個項目計時的次數',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='只執行指定名稱的情境（可重複指定）',
+        )
+        parser.add_argument(
+            '--quick',
+            action='store_true',
+            help='只執行小型情境',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat 必須大於或等於 1')
+
+        scenarios = QUICK_SCENARIOS if options['quick'] else DEFAULT_SCENARIOS
+        if options['scenarios']:
+            available = {scenario.name: scenario for scenario in DEFAULT_SCENARIOS + QUICK_SCENARIOS}
+            unknown = [name for name in options['scenarios'] if name not in available]
+            if unknown:
+                raise CommandError(f"未知的情境: {', '.join(unknown)}（可用: {', '.join(available)}）")
+            scenarios = [available[name] for name in options['scenarios']]
+
+        baseline = load_report(options['compare']) if options['compare'] else None
+
+        self.stdout.write(self.style.SUCCESS(f'開始執行 {len(scenarios)} 個情境（每個項目 {options["repeat"]} 次）...'))
+        report = run_benchmarks(scenarios, repeat=options['repeat'], progress=self._report)
+
+        if options['output']:
+            write_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"結果已寫入 {options['output']}"))
+
+        if baseline is not None:
+            regressions = compare_reports(baseline, report, threshold=options['threshold'])
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('與基準相比沒有退步'))
+                return
+            for item in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"  {item['scenario']} / {item['target']} {item['metric']}: "
+                    f"{item['baseline']} → {item['current']}"
+                ))
+            raise CommandError(f'{len(regressions)} 個項目比基準退步')
+
+    def _report(self, result):
+        """輸出一個情境的結果表格"""
+        scenario = result['scenario']
+        self.stdout.write(
+            f"\n{scenario['name']}: 一般組 {scenario['normal_members']} 人、客製化組 {scenario['custom_members']} 人、"
+            f"{scenario['routes']} 條路線、完成密度 {scenario['density']}（{result['scores']} 筆成績）"
+        )
+        self.stdout.write(
+            f"  {'項目':<28}{'最短(ms)':>12}{'中位數(ms)':>12}{'CPU(ms)':>12}{'查詢數':>8}{'峰值記憶體(KB)':>16}"
+        )
+        for target, metrics in result['results'].items():
+            if 'skipped' in metrics:
+                self.stdout.write(f"  {target:<28}略過（{metrics['skipped']}）")
+                continue
+            self.stdout.write(
+                f"  {target:<28}{metrics['wall_ms_min']:>12.2f}{metrics['wall_ms_median']:>12.2f}"
+                f"{metrics['cpu_ms_median']:>12.2f}{metrics['queries']:>8}{metrics['peak_memory_kb']:>16.1f}"
+            )
+        for endpoint, saving in result.get('serializer_savings', {}).items():
+            self.stdout.write(
+                f"  {endpoint} 快速序列化：每個請求節省 {saving['saved_cpu_ms']:.2f} ms CPU"
+                f"（{saving['serializer_cpu_ms']:.2f} → {saving['fast_cpu_ms']:.2f} ms，{saving['speedup']}x）"
+            )
+        renderers = result.get('renderers', {})
+        if 'skipped' in renderers:
+            self.stdout.write(f"  JSON 渲染對照略過（{renderers['skipped']}）")
+            return
+        for endpoint, comparison in renderers.items():
+            self.stdout.write(
+                f"  {endpoint} JSON 渲染（{comparison['bytes']} 位元組）：JSONRenderer {comparison['json_cpu_ms']:.2f} ms"
+                f" → orjson {comparison['fast_cpu_ms']:.2f} ms（{comparison['speedup']}x）"
+                f"{'' if comparison['identical'] else '，輸出不同！'}"
+            )
@@ -0,0 +1,106 @@
+"""
+Django 管理命令：即時推送負載測試
+
+在合成房間上比較 WebSocket 廣播（scoring.websocket）與 HTTP 輪詢排行榜的成本，
+並估算單一程序在指定的更新頻率下可支撐的觀眾數。
+觀眾以記憶體中的 ASGI 用戶端模擬（不經過網路），合成資料在執行結束後回滾。
+
+使用方法：
+    python manage.py loadtest_realtime --spectators 100 1000 5000
+
+可選參數：
+    --spectators: 要量測的觀眾人數（可指定多個，預設 100 1000）
+    --updates: 每種人數送出的成績更新次數（預設 10）
+    --poll-interval: HTTP 輪詢間隔秒數（預設 2）
+    --update-rate: 估算容量時假設的每秒成績更新次數（預設 0.2）
+    --output: 將結果寫入 JSON 檔案
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scoring.benchmark import write_report
+from scoring.loadtest import run_loadtest
+
+logger = logging.getLogger('scoring')
+
+
+class Command(BaseCommand):
+    help = '比較 WebSocket 廣播與 HTTP 輪詢的成本，估算單一程序可支撐的觀眾數'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--spectators',
+            type=int,
+            nargs='+',
+            default=[100, 1000],
+            help='要量測的觀眾人數',
+        )
+        parser.add_argument(
+            '--updates',
+            type=int,
+            default=10,
+            help='每種人數送出的成績更新次數',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='HTTP 輪詢間隔秒數',
+        )
+        parser.add_argument(
+            '--update-rate',
+            type=float,
+            default=0.2,
+            help='估算容量時假設的每秒成績更新次數',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='將結果寫入 JSON 檔案',
+        )
+
+    def handle(self, *args, **options):
+        if options['updates'] < 1 or min(options['spectators']) < 1:
+            raise CommandError('--updates 與 --spectators 必須大於或等於 1')
+        if options['poll_interval'] <= 0 or options['update_rate'] <= 0:
+            raise CommandError('--poll-interval 與 --update-rate 必須大於 0')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"開始負載測試：觀眾 {', '.join(str(count) for count in options['spectators'])} 人，"
+            f"每種人數 {options['updates']} 次更新"
+        ))
+        self.stdout.write(
+            f"  {'觀眾':>8}{'連線(ms)':>12}{'記憶體/連線(KB)':>18}{'送達中位數(ms)':>16}"
+            f"{'送達最大(ms)':>14}{'查詢/更新':>10}{'輪詢容量':>10}{'WebSocket 容量':>16}"
+        )
+        report = run_loadtest(
+            options['spectators'],
+            updates=options['updates'],
+            poll_interval=options['poll_interval'],
+            update_rate=options['update_rate'],
+            progress=self._report,
+        )
+
+        http = report['http_polling']
+        self.stdout.write(
+            f"\nHTTP 輪詢（每 {options['poll_interval']} 秒一次）：304 {http['not_modified_ms']:.2f} ms"
+            f"（{http['not_modified_queries']} 次查詢）、200 {http['full_ms']:.2f} ms（{http['full_queries']} 次查詢）"
+        )
+        self.stdout.write(
+            f"容量為單一程序在每秒 {options['update_rate']} 次更新下可支撐的觀眾數估計"
+        )
+
+        if options['output']:
+            write_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"結果已寫入 {options['output']}"))
+
+    def _report(self, result):
+        capacity = result['capacity']
+        self.stdout.write(
+            f"  {result['spectators']:>8}{result['connect_ms']:>12.1f}{result['memory_kb_per_connection']:>18.2f}"
+            f"{result['fanout_ms_median']:>16.2f}{result['fanout_ms_max']:>14.2f}{result['queries_per_update']:>10}"
+            f"{capacity['polling'] or '-':>10}{capacity['websocket'] or '-':>16}"
+        )
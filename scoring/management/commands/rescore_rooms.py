@@ -0,0 +1,201 @@
+"""
+Django 管理命令：重新計算所有（或指定）房間的分數
+
+計分規則變更或資料修復後，用此命令批量重算歷史房間。
+房間 ID 會被切分為多個分片，交給程序池中的 worker 平行處理，
+每個 worker 使用自己的資料庫連線。
+
+使用方法：
+    python manage.py rescore_rooms
+
+可選參數：
+    --room: 只重算指定房間（可重複）
+    --stale-only: 只重算計分版本落後資料版本的房間
+    --workers: worker 程序數（預設為 CPU 核心數，1 表示在目前程序中依序執行）
+    --shard-size: 每個分片的房間數（預設依房間數與 worker 數自動決定）
+    --verbose: 顯示每個房間的重算耗時
+"""
+
+import logging
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+
+logger = logging.getLogger('scoring')
+
+# 資料庫被鎖定時的重試次數與初始等待秒數（指數退避）
+LOCK_RETRIES = 8
+LOCK_RETRY_DELAY = 0.02
+
+
+def _init_worker():
+    """worker 程序初始化：確保 Django 已載入，且不沿用父程序的資料庫連線"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def rescore_shard(room_ids):
+    """
+    重算一個分片內的房間（在 worker 程序中執行）
+
+    返回:
+        list: 每個房間一個 dict（room_id、seconds、計分統計或 error）
+    """
+    from scoring.models import update_scores
+
+    results = []
+    for room_id in room_ids:
+        started = time.perf_counter()
+        stats = {}
+        error = None
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                stats = update_scores(room_id) or {}
+                error = None
+                break
+            except OperationalError as e:
+                # SQLite 同一時間只允許一個寫入者，交易升級為寫鎖時可能立即失敗，稍後重試
+                error = str(e)
+                if 'locked' not in error or attempt == LOCK_RETRIES:
+                    logger.exception(f"[rescore_rooms] 重算房間 {room_id} 時發生錯誤")
+                    break
+                time.sleep(LOCK_RETRY_DELAY * (2 ** attempt) * (1 + random.random()))
+            except Exception as e:
+                logger.exception(f"[rescore_rooms] 重算房間 {room_id} 時發生錯誤")
+                error = str(e)
+                break
+        results.append({
+            'room_id': room_id,
+            'seconds': time.perf_counter() - started,
+            'scores': stats.get('scores', 0),
+            'scores_updated': stats.get('scores_updated', 0),
+            'members_updated': stats.get('members_updated', 0),
+            'error': error,
+        })
+    connections.close_all()
+    return results
+
+
+class Command(BaseCommand):
+    help = '以程序池平行重新計算所有（或指定）房間的分數'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room',
+            type=int,
+            action='append',
+            dest='rooms',
+            help='只重算指定房間 ID（可重複指定）',
+        )
+        parser.add_argument(
+            '--stale-only',
+            action='store_true',
+            help='只重算計分版本落後資料版本的房間',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='worker 程序數（1 表示在目前程序中依序執行）',
+        )
+        parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=None,
+            help='每個分片的房間數',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='顯示每個房間的重算耗時',
+        )
+
+    def handle(self, *args, **options):
+        from scoring.models import Room
+
+        if options['workers'] < 1:
+            raise CommandError('--workers 必須大於或等於 1')
+
+        rooms = Room.objects.all()
+        if options['rooms']:
+            rooms = rooms.filter(id__in=options['rooms'])
+        if options['stale_only']:
+            rooms = rooms.filter(scores_version__lt=F('data_version'))
+        room_ids = list(rooms.order_by('id').values_list('id', flat=True))
+
+        if not room_ids:
+            self.stdout.write(self.style.WARNING('沒有需要重算的房間'))
+            return
+
+        workers = min(options['workers'], len(room_ids))
+        if workers > 1 and connection.vendor == 'sqlite' and \
+                connection.creation.is_in_memory_db(connection.settings_dict['NAME']):
+            # 記憶體資料庫無法被其他程序共用
+            self.stdout.write(self.style.WARNING('記憶體 SQLite 資料庫無法跨程序共用，改為單一程序執行'))
+            workers = 1
+
+        # 分片數為 worker 數的數倍，讓較慢的房間不會拖住整個 worker
+        shard_size = options['shard_size'] or max(1, math.ceil(len(room_ids) / (workers * 4)))
+        shards = [room_ids[start:start + shard_size] for start in range(0, len(room_ids), shard_size)]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'開始重算 {len(room_ids)} 個房間（{workers} 個 worker，{len(shards)} 個分片）...'
+        ))
+
+        started = time.perf_counter()
+        results = []
+        if workers == 1:
+            for shard in shards:
+                self._report(results, rescore_shard(shard), len(room_ids), options['verbose'])
+        else:
+            # fork 前關閉目前的連線，避免子程序共用同一個連線
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                futures = [executor.submit(rescore_shard, shard) for shard in shards]
+                for future in as_completed(futures):
+                    self._report(results, future.result(), len(room_ids), options['verbose'])
+        elapsed = time.perf_counter() - started
+
+        self._summary(results, elapsed)
+
+    def _report(self, results, shard_results, total, verbose):
+        """輸出一個分片完成後的進度"""
+        results.extend(shard_results)
+        for result in shard_results:
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"  房間 {result['room_id']} 重算失敗: {result['error']}"))
+            elif verbose:
+                self.stdout.write(
+                    f"  房間 {result['room_id']}: {result['seconds'] * 1000:.1f}ms，"
+                    f"{result['scores']} 筆成績，更新 {result['scores_updated']} 筆成績、"
+                    f"{result['members_updated']} 位成員"
+                )
+        self.stdout.write(f'進度: {len(results)}/{total}')
+
+    def _summary(self, results, elapsed):
+        """輸出吞吐量與最慢的房間"""
+        failed = [result for result in results if result['error']]
+        total_scores = sum(result['scores'] for result in results)
+        elapsed = max(elapsed, 1e-9)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'完成：{len(results) - len(failed)} 個房間成功，{len(failed)} 個失敗，耗時 {elapsed:.2f}s'
+        ))
+        self.stdout.write(
+            f'吞吐量：{len(results) / elapsed:.1f} 房間/s，{total_scores / elapsed:.0f} 成績/s'
+        )
+
+        slowest = sorted(results, key=lambda result: result['seconds'], reverse=True)[:5]
+        self.stdout.write('最慢的房間：')
+        for result in slowest:
+            self.stdout.write(f"  房間 {result['room_id']}: {result['seconds'] * 1000:.1f}ms（{result['scores']} 筆成績）")
+
+        if failed:
+            raise CommandError(f'{len(failed)} 個房間重算失敗')
@@ -0,0 +1,82 @@
+"""
+Django 管理命令：檢查路線完成人數計數
+
+路線的 normal_completers、custom_completers、score_count 由計分引擎在重算時維護。
+此命令以資料庫聚合重新計算這些計數，找出與維護值不一致（漂移）的路線。
+
+使用方法：
+    python manage.py verify_route_counters
+
+可選參數：
+    --room: 只檢查指定房間（可重複）
+    --fix: 修復不一致的計數
+    --verbose: 顯示每條不一致路線的詳細信息
+"""
+
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from scoring.models import Route, ROUTE_COUNTER_FIELDS, annotate_route_counters
+
+logger = logging.getLogger('scoring')
+
+
+class Command(BaseCommand):
+    help = '檢查路線的完成人數計數是否與成績記錄一致，可選擇修復'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--room',
+            type=int,
+            action='append',
+            dest='rooms',
+            help='只檢查指定房間 ID（可重複指定）',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='修復不一致的計數',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='顯示詳細信息',
+        )
+
+    def handle(self, *args, **options):
+        fix = options['fix']
+        verbose = options['verbose']
+
+        routes = Route.objects.all()
+        if options['rooms']:
+            routes = routes.filter(room_id__in=options['rooms'])
+
+        checked = 0
+        drifted = []
+        for route in annotate_route_counters(routes).order_by('id').iterator():
+            checked += 1
+            expected = {field: getattr(route, f'expected_{field}') for field in ROUTE_COUNTER_FIELDS}
+            actual = {field: getattr(route, field) for field in ROUTE_COUNTER_FIELDS}
+            if expected != actual:
+                drifted.append((route, expected))
+                if verbose:
+                    differences = ', '.join(
+                        f'{field}: {actual[field]} → {expected[field]}'
+                        for field in ROUTE_COUNTER_FIELDS if actual[field] != expected[field]
+                    )
+                    self.stdout.write(f'  路線 {route.id}（房間 {route.room_id}）: {differences}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'已檢查 {checked} 條路線，所有計數一致'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'已檢查 {checked} 條路線，{len(drifted)} 條路線的計數不一致'))
+        if not fix:
+            self.stdout.write('使用 --fix 修復不一致的計數')
+            return
+
+        with transaction.atomic():
+            for route, expected in drifted:
+                Route.objects.filter(id=route.id).update(**expected)
+        logger.info(f"[verify_route_counters] 已修復 {len(drifted)} 條路線的計數")
+        self.stdout.write(self.style.SUCCESS(f'已修復 {len(drifted)} 條路線的計數'))
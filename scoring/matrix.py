@@ -0,0 +1,71 @@
+"""
+房間的精簡完成矩陣（GET /api/rooms/{id}/matrix/）
+
+房間詳情在每條路線內嵌所有成績（成員 ID、名稱、完成狀態），資料量隨成員數 × 路線數成長，
+成員名稱也在每條路線重複一次。精簡表示只列出成員與路線各一次，完成狀態打包成位元集合：
+
+- members：按名次排列（id、name、is_custom_calc、total_score、rank、dense_rank）
+- routes：按建立時間排列（id、name、grade、photo_url、created_at、score）；
+  score 為一般組完成該路線得到的分數 S_r，客製化組完成任一路線得到 L（standard_line_score）
+- completions：{'encoding': 'bitset', 'row_bytes': n, 'data': base64}
+
+解碼方式：data 以 base64 解碼後，成員 i（members 中的索引）佔第 i * row_bytes 起的 row_bytes 個位元組，
+成員 i 完成路線 j（routes 中的索引）當且僅當 bytes[i * row_bytes + (j >> 3)] & (1 << (j & 7)) 不為 0。
+"""
+import base64
+
+from .fast_serializers import format_datetime, format_decimal
+from .models import Member, Route, Score, order_by_rank
+from .scoring_kernel import CompletionMatrix, cents_to_decimal, route_value_cents
+
+
+def build_room_matrix(room, context):
+    """
+    組成精簡完成矩陣的回應（查詢數固定：成員、路線、已完成的成績各一次）
+
+    Args:
+        room: 包含 id、name、standard_line_score、created_at、scores_version 的 dict
+        context: 序列化器的 context（照片網址需要 request）
+    """
+    from .serializers import RouteHeaderSerializer
+
+    members = list(order_by_rank(Member.objects.filter(room_id=room['id'])).values(
+        'id', 'name', 'is_custom_calc', 'total_score', 'rank', 'dense_rank'
+    ))
+    routes = list(Route.objects.filter(room_id=room['id']).only(
+        'id', 'name', 'grade', 'photo', 'photo_url', 'created_at'
+    ))
+
+    member_index = {member['id']: index for index, member in enumerate(members)}
+    route_index = {route.id: index for index, route in enumerate(routes)}
+    completed = Score.objects.filter(route__room_id=room['id'], is_completed=True).values_list('member_id', 'route_id')
+    matrix = CompletionMatrix.from_cells(
+        [member['is_custom_calc'] for member in members],
+        len(routes),
+        (
+            (member_index[member_id], route_index[route_id])
+            for member_id, route_id in completed if member_id in member_index and route_id in route_index
+        ),
+    )
+
+    line_score = room['standard_line_score']
+    route_data = RouteHeaderSerializer(routes, many=True, context=context).data
+    for route, completers in zip(route_data, matrix.route_completion_counts()):
+        route['score'] = format_decimal(cents_to_decimal(route_value_cents(line_score, completers)))
+    for member in members:
+        member['total_score'] = format_decimal(member['total_score'])
+
+    return {
+        'id': room['id'],
+        'name': room['name'],
+        'standard_line_score': line_score,
+        'created_at': format_datetime(room['created_at']),
+        'version': room['scores_version'],
+        'members': members,
+        'routes': route_data,
+        'completions': {
+            'encoding': 'bitset',
+            'row_bytes': matrix.row_bytes,
+            'data': base64.b64encode(matrix.to_bytes()).decode('ascii'),
+        },
+    }
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoring", "0003_alter_route_photo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="room",
+            name="data_version",
+            field=models.PositiveBigIntegerField(default=0, verbose_name="資料版本"),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="scores_version",
+            field=models.PositiveBigIntegerField(default=0, verbose_name="已計分版本"),
+        ),
+    ]
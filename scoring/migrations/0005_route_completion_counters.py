@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:58
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_route_counters(apps, schema_editor):
+    """以現有成績記錄初始化路線的完成人數計數"""
+    Route = apps.get_model("scoring", "Route")
+    routes = Route.objects.annotate(
+        expected_normal=Count("scores", filter=Q(scores__is_completed=True, scores__member__is_custom_calc=False)),
+        expected_custom=Count("scores", filter=Q(scores__is_completed=True, scores__member__is_custom_calc=True)),
+        expected_scores=Count("scores"),
+    )
+    for route in routes.iterator():
+        Route.objects.filter(id=route.id).update(
+            normal_completers=route.expected_normal,
+            custom_completers=route.expected_custom,
+            score_count=route.expected_scores,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scoring", "0004_room_data_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="custom_completers",
+            field=models.PositiveIntegerField(default=0, verbose_name="客製化組完成人數"),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="normal_completers",
+            field=models.PositiveIntegerField(default=0, verbose_name="一般組完成人數"),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="score_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="成績記錄數"),
+        ),
+        migrations.RunPython(populate_route_counters, migrations.RunPython.noop),
+    ]
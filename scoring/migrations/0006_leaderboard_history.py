@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0005_route_completion_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scores_version', models.PositiveBigIntegerField(default=0, verbose_name='計分版本')),
+                ('is_checkpoint', models.BooleanField(default=False, verbose_name='是否為完整檢查點')),
+                ('standings', models.JSONField(default=dict, verbose_name='排名資料')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='記錄時間')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_history', to='scoring.room', verbose_name='房間')),
+            ],
+            options={
+                'verbose_name': '排行榜歷史',
+                'verbose_name_plural': '排行榜歷史',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['room', 'created_at'], name='scoring_history_room_time'), models.Index(fields=['room', 'is_checkpoint'], name='scoring_history_checkpoint')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:59
+
+from django.db import migrations, models
+
+
+def populate_member_ranks(apps, schema_editor):
+    """以現有的成員總分初始化名次（同分同名次）"""
+    Member = apps.get_model('scoring', 'Member')
+    changed = []
+    room_id = previous = None
+    for member in Member.objects.order_by('room_id', '-total_score').only('id', 'room_id', 'total_score').iterator():
+        if member.room_id != room_id:
+            room_id, index, dense_rank, previous = member.room_id, 0, 0, None
+        index += 1
+        if member.total_score != previous:
+            rank, dense_rank = index, dense_rank + 1
+        previous = member.total_score
+        member.rank, member.dense_rank = rank, dense_rank
+        changed.append(member)
+    Member.objects.bulk_update(changed, ['rank', 'dense_rank'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0006_leaderboard_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='dense_rank',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='密集名次'),
+        ),
+        migrations.AddField(
+            model_name='member',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='名次'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['room', 'rank'], name='scoring_member_room_rank'),
+        ),
+        migrations.RunPython(populate_member_ranks, migrations.RunPython.noop),
+    ]
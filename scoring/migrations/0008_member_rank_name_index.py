@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0007_member_rank'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='member',
+            name='scoring_member_room_rank',
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['room', 'rank', 'name'], name='scoring_member_room_rank_name'),
+        ),
+    ]
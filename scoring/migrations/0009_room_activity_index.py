@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0008_member_rank_name_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['-updated_at', '-id'], name='scoring_room_activity'),
+        ),
+    ]
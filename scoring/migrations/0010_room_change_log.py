@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0009_room_activity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='資料版本')),
+                ('kind', models.CharField(choices=[('member', '成員'), ('route', '路線'), ('score', '成績')], max_length=10, verbose_name='類型')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='物件 ID')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='scoring.room', verbose_name='房間')),
+            ],
+            options={
+                'verbose_name': '房間變動記錄',
+                'verbose_name_plural': '房間變動記錄',
+                'indexes': [models.Index(fields=['room', 'version'], name='scoring_change_room_version')],
+            },
+        ),
+    ]
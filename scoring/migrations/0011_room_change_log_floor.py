@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0010_room_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='change_log_floor',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='變動記錄起始版本'),
+        ),
+    ]
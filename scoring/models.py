@@ -1,36 +1,38 @@
-from django.db import models
-from django.db.models import Count, Q, Sum
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from decimal import Decimal
-import math
 
+from .scoring_kernel import (
+    CENTS_PER_POINT, CompletionMatrix, cents_to_decimal, competition_ranks, dense_ranks, lcm, lcm_of_list,
+    route_value_cents, score_matrix, standard_line_score_for,
+)
 
-def lcm(a, b):
-    """計算兩個數的最小公倍數"""
-    return abs(a * b) // math.gcd(a, b) if a and b else 0
 
-
-def lcm_of_list(numbers):
-    """計算列表中所有數的最小公倍數"""
-    if not numbers:
-        return 1
-    if len(numbers) == 1:
-        return numbers[0]
-    result = numbers[0]
-    for i in range(1, len(numbers)):
-        result = lcm(result, numbers[i])
-    return result
+# 批量寫回時每條 UPDATE 的最大 ID 數量（低於 SQLite 的 999 個參數上限）
+UPDATE_BATCH_SIZE = 500
 
 
 class Room(models.Model):
     """房間/比賽資訊"""
     name = models.CharField(max_length=200, verbose_name='房間名稱')
     standard_line_score = models.IntegerField(default=1, verbose_name='每一條路線總分 (L)')
+    # 每次成員/路線/成績變動都會遞增 data_version；scores_version 記錄最近一次完成計分時的 data_version
+    data_version = models.PositiveBigIntegerField(default=0, verbose_name='資料版本')
+    scores_version = models.PositiveBigIntegerField(default=0, verbose_name='已計分版本')
+    # 版本小於或等於此值的變動記錄（RoomChange）已被清除，更早的 ?since= 改為返回完整資料（見 scoring.delta）
+    change_log_floor = models.PositiveBigIntegerField(default=0, verbose_name='變動記錄起始版本')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = '房間'
         verbose_name_plural = '房間'
+        indexes = [
+            # 房間列表按最近活動（touch_room 更新 updated_at）排序分頁
+            models.Index(fields=['-updated_at', '-id'], name='scoring_room_activity'),
+        ]
 
     def __str__(self):
         return self.name
@@ -42,23 +44,14 @@ class Room(models.Model):
         - 如果一般組成員數高於或等於8人：固定為1000分
         如果沒有一般組成員，返回預設值1
         """
-        normal_members = self.members.filter(is_custom_calc=False)
-        if not normal_members.exists():
-            return 1
-        
-        # 獲取所有一般組成員的數量
-        member_count = normal_members.count()
-        if member_count == 0:
-            return 1
-        
-        # 如果成員數高於或等於8人，固定為1000分
-        if member_count >= 8:
-            return 1000
-        
-        # 如果成員數低於8人，計算1到member_count的最小公倍數
-        # 這是因為每條路線完成的人數可能是1到N（N為一般組成員數）
-        numbers = list(range(1, member_count + 1))
-        return lcm_of_list(numbers)
+        # 獲取所有一般組成員的數量（L 由預先計算的表查得）
+        member_count = self.members.filter(is_custom_calc=False).count()
+        return standard_line_score_for(member_count)
+
+    @property
+    def scores_are_stale(self):
+        """最近一次計分之後是否還有資料變動"""
+        return self.scores_version < self.data_version
 
     def update_standard_line_score(self):
         """更新standard_line_score為計算出的值"""
@@ -74,6 +67,10 @@ class Member(models.Model):
     name = models.CharField(max_length=100, verbose_name='成員名稱')
     is_custom_calc = models.BooleanField(default=False, verbose_name='是否為客製化組')
     total_score = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='總分')
+    # 由計分引擎在每次重算時與總分一起寫入（同分同名次）：
+    # rank 為競賽名次（1, 2, 2, 4），dense_rank 為密集名次（1, 2, 2, 3）；尚未計分時為 None
+    rank = models.PositiveIntegerField(null=True, blank=True, verbose_name='名次')
+    dense_rank = models.PositiveIntegerField(null=True, blank=True, verbose_name='密集名次')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -81,15 +78,55 @@ class Member(models.Model):
         verbose_name = '成員'
         verbose_name_plural = '成員'
         ordering = ['-total_score', 'name']
+        indexes = [
+            # 排行榜、前 N 名與游標分頁（scoring.leaderboard）直接按 (名次, 名稱) 讀取
+            models.Index(fields=['room', 'rank', 'name'], name='scoring_member_room_rank_name'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.room.name})"
 
     @property
     def completed_routes_count(self):
-        """完成的路線數量"""
+        """
+        完成的路線數量
+        查詢時已以 annotate_completed_routes 註解則直接使用註解值，否則單獨查詢一次
+        """
+        annotated = self.__dict__.get('_completed_routes_count')
+        if annotated is not None:
+            return annotated
         return self.scores.filter(is_completed=True).count()
 
+    @completed_routes_count.setter
+    def completed_routes_count(self, value):
+        # QuerySet.annotate() 以 setattr 寫入註解值
+        self._completed_routes_count = value
+
+
+# 計分引擎寫回成員的欄位
+MEMBER_STANDING_FIELDS = ('total_score', 'rank', 'dense_rank', 'updated_at')
+
+
+def annotate_completed_routes(members):
+    """
+    在成員查詢中以一次聚合計算完成的路線數量
+
+    返回的 QuerySet 每位成員帶有 completed_routes_count 註解，
+    序列化排行榜、房間詳情時不需要每位成員各查詢一次
+    """
+    return members.annotate(
+        completed_routes_count=Count('scores', filter=Q(scores__is_completed=True))
+    )
+
+
+def order_by_rank(members):
+    """
+    按計分引擎寫入的名次排序（同名次按名稱，尚未計分的成員排在最後）
+
+    與按總分降序排序的結果相同，但可使用 (room, rank) 索引，不需排序 Decimal 總分
+    """
+    return members.order_by(F('rank').asc(nulls_last=True), 'name')
+
 
 def route_photo_upload_path(instance, filename):
     """
@@ -158,6 +195,11 @@ class Route(models.Model):
     grade = models.CharField(max_length=50, blank=True, verbose_name='難度等級')
     photo = models.ImageField(upload_to=route_photo_upload_path, blank=True, null=True, verbose_name='照片')
     photo_url = models.URLField(blank=True, verbose_name='照片網址（舊版，已棄用）')
+    # 完成人數計數，由計分引擎在重算時與成績分數於同一個交易中寫入
+    # （可用 manage.py verify_route_counters 檢查與修復）
+    normal_completers = models.PositiveIntegerField(default=0, verbose_name='一般組完成人數')
+    custom_completers = models.PositiveIntegerField(default=0, verbose_name='客製化組完成人數')
+    score_count = models.PositiveIntegerField(default=0, verbose_name='成績記錄數')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -169,6 +211,48 @@ class Route(models.Model):
     def __str__(self):
         return f"{self.name} ({self.room.name})"
 
+    @property
+    def completed_count(self):
+        """完成人數（一般組 + 客製化組）"""
+        return self.normal_completers + self.custom_completers
+
+
+ROUTE_COUNTER_FIELDS = ('normal_completers', 'custom_completers', 'score_count')
+
+
+def annotate_route_counters(routes):
+    """
+    以資料庫聚合計算路線的完成人數（不使用維護中的計數，用於驗證與修復）
+
+    返回的 QuerySet 每條路線帶有 expected_normal_completers、
+    expected_custom_completers、expected_score_count 三個註解欄位
+    """
+    return routes.annotate(
+        expected_normal_completers=Count(
+            'scores', filter=Q(scores__is_completed=True, scores__member__is_custom_calc=False)
+        ),
+        expected_custom_completers=Count(
+            'scores', filter=Q(scores__is_completed=True, scores__member__is_custom_calc=True)
+        ),
+        expected_score_count=Count('scores'),
+    )
+
+
+def _count_by_room(model):
+    return Coalesce(Subquery(
+        model.objects.filter(room_id=OuterRef('pk')).order_by().values('room_id').annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def annotate_room_summary(rooms):
+    """
+    在房間查詢中以子查詢計算成員數與路線數
+
+    返回的 QuerySet 每個房間帶有 member_count、route_count 註解，
+    房間列表只需一個查詢，不需要載入成員、路線與成績
+    """
+    return rooms.annotate(member_count=_count_by_room(Member), route_count=_count_by_room(Route))
+
 
 class Score(models.Model):
     """成績記錄 (核心)"""
@@ -190,88 +274,457 @@ class Score(models.Model):
         return f"{self.member.name} - {self.route.name} ({status})"
 
 
+class LeaderboardSnapshot(models.Model):
+    """
+    排行榜歷史（只追加）
+
+    每次重算後，只記錄總分或名次有變動的成員（差異記錄）；
+    每隔固定筆數寫入一次完整的檢查點，查詢任一時間點只需從最近的檢查點開始套用差異。
+    standings 格式為 {成員ID: [總分（分）, 名次]}，成員被刪除時值為 null
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='leaderboard_history', verbose_name='房間')
+    scores_version = models.PositiveBigIntegerField(default=0, verbose_name='計分版本')
+    is_checkpoint = models.BooleanField(default=False, verbose_name='是否為完整檢查點')
+    standings = models.JSONField(default=dict, verbose_name='排名資料')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='記錄時間')
+
+    class Meta:
+        verbose_name = '排行榜歷史'
+        verbose_name_plural = '排行榜歷史'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['room', 'created_at'], name='scoring_history_room_time'),
+            models.Index(fields=['room', 'is_checkpoint'], name='scoring_history_checkpoint'),
+        ]
+
+    def __str__(self):
+        kind = '檢查點' if self.is_checkpoint else '差異'
+        return f"{self.room.name} - {kind} ({self.created_at})"
+
+
+class RoomChange(models.Model):
+    """
+    房間變動記錄（增量同步，見 scoring.delta）
+
+    每筆記錄代表一個成員、路線或成績在 version 時被建立、修改或刪除（讀取時已不存在即為刪除）。
+    編輯時寫入的記錄 version 為 None，由 touch_room 遞增資料版本時補上；
+    計分引擎改寫的成績分數與成員總分、名次直接以計分的資料版本記錄
+    """
+    KIND_MEMBER = 'member'
+    KIND_ROUTE = 'route'
+    KIND_SCORE = 'score'
+    KIND_CHOICES = [
+        (KIND_MEMBER, '成員'),
+        (KIND_ROUTE, '路線'),
+        (KIND_SCORE, '成績'),
+    ]
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='changes', verbose_name='房間')
+    version = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='資料版本')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='類型')
+    object_id = models.PositiveBigIntegerField(verbose_name='物件 ID')
+
+    class Meta:
+        verbose_name = '房間變動記錄'
+        verbose_name_plural = '房間變動記錄'
+        indexes = [
+            models.Index(fields=['room', 'version'], name='scoring_change_room_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} - {self.kind} {self.object_id} (v{self.version})"
+
+
+def record_changes(room_id, changes, version=None):
+    """
+    寫入房間變動記錄（單一 INSERT）
+
+    Args:
+        changes: {類型: 物件 ID 列表}
+        version: 變動對應的資料版本；None 表示編輯後尚未遞增版本（由 touch_room 補上）
+    """
+    entries = [
+        RoomChange(room_id=room_id, version=version, kind=kind, object_id=object_id)
+        for kind, object_ids in changes.items() for object_id in set(object_ids)
+    ]
+    if entries:
+        RoomChange.objects.bulk_create(entries)
+
+
+def record_score_writes(room_id, new_scores, updated_ids):
+    """
+    記錄批量寫入的成績（bulk_create 與 UPDATE 不會觸發訊號）
+
+    資料庫沒有返回 bulk_create 的 ID 時改為記錄其路線，同步時返回整條路線
+    """
+    record_changes(room_id, {
+        RoomChange.KIND_SCORE: [score.pk for score in new_scores if score.pk is not None] + list(updated_ids),
+        RoomChange.KIND_ROUTE: [score.route_id for score in new_scores if score.pk is None],
+    })
+
+
+def rank_members(totals):
+    """
+    由成員總分計算名次（同分同名次）
+
+    Args:
+        totals: {成員ID: 總分}
+
+    返回:
+        dict: {成員ID: (名次, 密集名次)}
+    """
+    ordered = sorted(totals.items(), key=lambda item: -item[1])
+    sorted_totals = [total for _, total in ordered]
+    return {
+        member_id: ranks
+        for (member_id, _), ranks in zip(ordered, zip(competition_ranks(sorted_totals), dense_ranks(sorted_totals)))
+    }
+
+
+def update_in_batches(model, ids, **values):
+    """以 UPDATE ... WHERE id IN (...) 批量寫入相同的值，按 UPDATE_BATCH_SIZE 分批"""
+    for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+        model.objects.filter(id__in=ids[start:start + UPDATE_BATCH_SIZE]).update(**values)
+
+
+def values_in_batches(queryset, field, ids, *fields):
+    """以 field IN (...) 查詢並逐筆產生 values_list(*fields)，按 UPDATE_BATCH_SIZE 分批（SQLite 的參數上限為 999）"""
+    ids = sorted(ids)
+    for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+        yield from queryset.filter(**{f'{field}__in': ids[start:start + UPDATE_BATCH_SIZE]}).values_list(*fields)
+
+
+def touch_room(room_id):
+    """
+    房間資料變動時遞增 data_version（以單條 UPDATE 原子遞增，不需先讀取），
+    同時更新 updated_at 作為 API 回應的 Last-Modified，並為尚未標記版本的變動記錄補上新版本
+    """
+    Room.objects.filter(id=room_id).update(data_version=F('data_version') + 1, updated_at=timezone.now())
+    # 編輯時寫入的變動記錄屬於這個新版本
+    RoomChange.objects.filter(room_id=room_id, version__isnull=True).update(
+        version=Subquery(Room.objects.filter(id=room_id).values('data_version')[:1])
+    )
+
+
+def stamp_scores_version(room_id, version):
+    """記錄計分結果對應的資料版本（只會往前推進）"""
+    Room.objects.filter(id=room_id, scores_version__lt=version).update(scores_version=version)
+
+
 def update_scores(room_id):
     """
     核心計分邏輯函數
     當 Score 或 Member 狀態變動時觸發
+
+    以集合方式重算整個房間：
+    1. 以固定次數的查詢載入房間內所有成員與成績記錄
+    2. 建立完成矩陣，由計分核心（scoring_kernel）計算每條路線的分數 S_r 與每位成員的總分
+    3. 只將有變動的資料列寫回（成績分數、成員總分與名次、路線完成人數計數）
+    4. 追加排行榜歷史的差異記錄（scoring.history）
+    5. 記錄分數改變的成績與成員（RoomChange，供增量同步使用），並清除超過保留範圍的舊記錄
+
+    返回:
+        dict: 重算統計（成績數、成員數、實際寫回的成績與成員數），房間不存在時返回 None
     """
+    from .cache import invalidate_room_on_commit
+    from .delta import prune_changes
+    from .history import record_standings
+
     try:
         room = Room.objects.get(id=room_id)
     except Room.DoesNotExist:
-        return
-
-    # 自動更新standard_line_score為一般組成員數的最小公倍數
-    room.update_standard_line_score()
-    L = room.standard_line_score
-
-    # 獲取所有常態組成員和客製化組成員
-    normal_members = room.members.filter(is_custom_calc=False)
-    custom_members = room.members.filter(is_custom_calc=True)
-
-    # 1. 常態組計算
-    # 獲取所有路線及其完成狀態
-    routes = room.routes.all()
-
-    for route in routes:
-        # 計算完成該路線的常態組人數 P_r
-        normal_completers = Score.objects.filter(
-            route=route,
-            is_completed=True,
-            member__is_custom_calc=False
-        ).count()
-
-        # 計算路線分數 S_r = L / P_r (如果 P_r > 0)
-        if normal_completers > 0:
-            route_score = Decimal(str(L)) / Decimal(str(normal_completers))
-        else:
-            route_score = Decimal('0.00')
+        return None
+
+    with transaction.atomic():
+        # 一次載入房間內所有成員：(id, 是否客製化組, 目前總分, 名次, 密集名次)
+        members = list(
+            Member.objects.filter(room_id=room_id).values_list(
+                'id', 'is_custom_calc', 'total_score', 'rank', 'dense_rank'
+            )
+        )
 
-        # 更新所有完成該路線的常態組成員的分數
-        normal_scores = Score.objects.filter(
-            route=route,
-            is_completed=True,
-            member__is_custom_calc=False
+        # 自動更新standard_line_score（一般組人數直接取自上面載入的成員，不需額外查詢）
+        L = standard_line_score_for(sum(1 for _, is_custom, *_ in members if not is_custom))
+        line_score_changed = room.standard_line_score != L
+        if line_score_changed:
+            room.standard_line_score = L
+            Room.objects.filter(id=room_id).update(standard_line_score=L)
+
+        # 一次載入房間內所有成績記錄
+        scores = list(
+            Score.objects.filter(route__room_id=room_id).values_list(
+                'id', 'member_id', 'route_id', 'is_completed', 'score_attained'
+            )
         )
-        for score in normal_scores:
-            score.score_attained = route_score
-            score.save()
-
-        # 將未完成的常態組成員的分數設為 0
-        normal_scores_incomplete = Score.objects.filter(
-            route=route,
-            is_completed=False,
-            member__is_custom_calc=False
+
+        # 一次載入房間內所有路線目前的完成人數計數
+        routes = list(
+            Route.objects.filter(room_id=room_id).values_list('id', *ROUTE_COUNTER_FIELDS)
         )
-        for score in normal_scores_incomplete:
-            score.score_attained = Decimal('0.00')
-            score.save()
-
-    # 計算每個常態組成員的總分
-    for member in normal_members:
-        total = Score.objects.filter(
-            member=member,
-            is_completed=True
-        ).aggregate(
-            total=Sum('score_attained')
-        )['total'] or Decimal('0.00')
-        member.total_score = total
-        member.save()
-
-    # 2. 客製化組計算
-    # 統計客製化成員完成的路線數 N_custom，總分 S_total = N_custom × L
-    for member in custom_members:
-        completed_count = Score.objects.filter(
-            member=member,
-            is_completed=True
-        ).count()
-        member.total_score = Decimal(str(completed_count)) * Decimal(str(L))
-        member.save()
-
-        # 同時更新客製化組成員的單線分數記錄
-        for score in member.scores.all():
-            if score.is_completed:
-                score.score_attained = Decimal(str(L))
+
+        # 1. 建立成員 × 路線完成矩陣，交給計分核心計算
+        member_index = {member_id: index for index, (member_id, *_) in enumerate(members)}
+        custom_mask = [is_custom for _, is_custom, *_ in members]
+        route_index = {route[0]: index for index, route in enumerate(routes)}
+        custom_completers = [0] * len(routes)
+        score_counts = [0] * len(routes)
+        completed_cells = []
+        for _, member_id, route_id, is_completed, _ in scores:
+            column = route_index.setdefault(route_id, len(route_index))
+            if column == len(score_counts):
+                custom_completers.append(0)
+                score_counts.append(0)
+            score_counts[column] += 1
+            if is_completed:
+                if member_id not in member_index:
+                    # 不屬於本房間的成員仍計入完成人數，但不計算其總分
+                    member_index[member_id] = len(custom_mask)
+                    custom_mask.append(False)
+                if custom_mask[member_index[member_id]]:
+                    custom_completers[column] += 1
+                completed_cells.append((member_index[member_id], column))
+        matrix = CompletionMatrix.from_cells(custom_mask, len(route_index), completed_cells)
+        result = score_matrix(matrix, line_score=L)
+
+        # 2. 計算每筆成績應得的分數
+        # 常態組：完成得 S_r，未完成得 0
+        # 客製化組：完成得 L，未完成得 0
+        decimals = {}
+
+        def to_decimal(cents):
+            value = decimals.get(cents)
+            if value is None:
+                value = decimals[cents] = cents_to_decimal(cents)
+            return value
+
+        custom_cents = L * CENTS_PER_POINT
+        now = timezone.now()
+        # 按新分數分組需要寫回的成績 ID（同一房間內不同的分數值很少）
+        changed_scores = {}
+        changed_score_count = 0
+        for score_id, member_id, route_id, is_completed, score_attained in scores:
+            if not is_completed:
+                new_cents = 0
+            elif custom_mask[member_index[member_id]]:
+                new_cents = custom_cents
             else:
-                score.score_attained = Decimal('0.00')
-            score.save()
+                new_cents = result.route_cents[route_index[route_id]]
+
+            new_score = to_decimal(new_cents)
+            if score_attained != new_score:
+                changed_scores.setdefault(new_score, []).append(score_id)
+                changed_score_count += 1
+
+        # 成員總分為所有完成路線的分數總和（客製化組為完成路線數 × L），名次由總分決定
+        totals = {member_id: result.member_cents[index] for index, (member_id, *_) in enumerate(members)}
+        ranks = rank_members(totals)
+        changed_members = []
+        for index, (member_id, _, total_score, rank, dense_rank) in enumerate(members):
+            new_total = cents_to_decimal(result.member_cents[index])
+            new_rank, new_dense_rank = ranks[member_id]
+            if (total_score, rank, dense_rank) != (new_total, new_rank, new_dense_rank):
+                changed_members.append(Member(
+                    id=member_id, total_score=new_total, rank=new_rank, dense_rank=new_dense_rank, updated_at=now
+                ))
+
+        changed_routes = []
+        for route_id, *counters in routes:
+            column = route_index[route_id]
+            new_counters = [result.route_completers[column], custom_completers[column], score_counts[column]]
+            if counters != new_counters:
+                changed_routes.append(Route(id=route_id, **dict(zip(ROUTE_COUNTER_FIELDS, new_counters))))
+
+        # 3. 只寫回有變動的資料列
+        # 成績按分數值分組，每組一條 UPDATE ... WHERE id IN (...)，
+        # 比 bulk_update 逐列組 CASE WHEN 快得多
+        for new_score, score_ids in changed_scores.items():
+            update_in_batches(Score, score_ids, score_attained=new_score, updated_at=now)
+        if changed_members:
+            Member.objects.bulk_update(changed_members, MEMBER_STANDING_FIELDS)
+        if changed_routes:
+            Route.objects.bulk_update(changed_routes, ROUTE_COUNTER_FIELDS)
+
+        # 計分前讀到的 data_version 即為這次結果對應的版本；
+        # 計分期間若有新的變動，data_version 會大於此版本，下次讀取時仍會重算
+        version = room.data_version
+        content_changed = changed_score_count or changed_members or line_score_changed
+        if content_changed:
+            # 排行榜內容改變時使快取失效（直接呼叫 update_scores 時不會經過 touch_room）
+            invalidate_room_on_commit(room_id)
+            if room.scores_version == room.data_version:
+                # 資料版本沒有改變、分數卻不同（直接修改資料後重算、計分規則變更後的 rescore_rooms）：
+                # 遞增資料版本，ETag 與增量同步的用戶端才會看到新的內容
+                touch_room(room_id)
+                version += 1
+
+        # 記錄分數改變的成績與成員，供增量同步使用
+        record_changes(room_id, {
+            RoomChange.KIND_SCORE: [score_id for score_ids in changed_scores.values() for score_id in score_ids],
+            RoomChange.KIND_MEMBER: [member.id for member in changed_members],
+        }, version)
+        prune_changes(room_id, version, room.change_log_floor)
+
+        # 4. 追加排行榜歷史（只記錄總分或名次有變動的成員）
+        record_standings(room_id, totals, version)
+
+        if room.scores_version != version:
+            stamp_scores_version(room_id, version)
+
+    return {
+        'scores': len(scores),
+        'members': len(members),
+        'scores_updated': changed_score_count,
+        'members_updated': len(changed_members),
+    }
+
+
+def update_route_scores(route_id):
+    """
+    增量計分：只重算單一路線的分數
+    當某條路線的成績狀態變動時（例如勾選/取消一格完成狀態）觸發
+
+    一格完成狀態的變動只會改變該路線的 S_r = L / P_r，以及完成該路線的成員總分，
+    因此只需載入這條路線的成績記錄，並以差額更新受影響成員的總分，再以總分重新計算房間內的名次。
+
+    以下情況退回完整重算 update_scores：
+    - 房間的計分版本落後資料版本超過一個版本
+    - L 需要改變（一般組成員數跨過 LCM / 1000 的門檻）
+    - 房間內其他路線有尚未計分的成績記錄（分數與完成狀態不一致）
 
+    返回:
+        dict: 與 update_scores 相同格式的重算統計，路線不存在時返回 None
+    """
+    from .cache import invalidate_room_on_commit
+    from .delta import prune_changes
+    from .history import record_standings
+
+    # 一般組人數以子查詢與路線資訊一起取得，不需額外的 COUNT 查詢
+    normal_member_count = Member.objects.filter(
+        room_id=OuterRef('room_id'), is_custom_calc=False
+    ).order_by().values('room_id').annotate(count=Count('id')).values('count')
+    route = Route.objects.filter(id=route_id).annotate(
+        normal_member_count=Coalesce(Subquery(normal_member_count), 0)
+    ).values(
+        'room_id', 'room__standard_line_score', 'room__data_version', 'room__scores_version',
+        'room__change_log_floor', 'normal_member_count', *ROUTE_COUNTER_FIELDS
+    ).first()
+    if route is None:
+        return None
+    room_id = route['room_id']
+    data_version = route['room__data_version']
+
+    # 增量計分只能補上「本次」這一個變動；落後超過一個版本（例如 lazy 模式累積的變動）時完整重算
+    if data_version - route['room__scores_version'] > 1:
+        return update_scores(room_id)
+
+    # L 改變時所有路線的分數都會改變，必須完整重算
+    L = standard_line_score_for(route['normal_member_count'])
+    if L != route['room__standard_line_score']:
+        return update_scores(room_id)
+
+    with transaction.atomic():
+
+        # 差額計算的前提是其他路線的分數都已正確寫入
+        # （完成的成績分數必定大於 0，未完成的成績分數必定為 0）
+        zero = Decimal('0.00')
+        has_stale_scores = Score.objects.filter(route__room_id=room_id).exclude(route_id=route_id).filter(
+            Q(is_completed=True, score_attained=zero) | (Q(is_completed=False) & ~Q(score_attained=zero))
+        ).exists()
+        if has_stale_scores:
+            return update_scores(room_id)
+
+        scores = list(
+            Score.objects.filter(route_id=route_id).values_list(
+                'id', 'member_id', 'is_completed', 'score_attained', 'member__is_custom_calc'
+            )
+        )
+
+        # 計算該路線新的 S_r = L / P_r
+        normal_completers = sum(
+            1 for _, _, is_completed, _, is_custom in scores if is_completed and not is_custom
+        )
+        custom_completers = sum(1 for _, _, is_completed, _, is_custom in scores if is_completed and is_custom)
+        route_score = cents_to_decimal(route_value_cents(L, normal_completers))
+        L = cents_to_decimal(L * CENTS_PER_POINT)
+
+        # 成員總分 = 其所有成績分數的總和，因此每筆成績的分數差額就是該成員總分的差額
+        changed_scores = {}
+        member_deltas = {}
+        for score_id, member_id, is_completed, score_attained, is_custom in scores:
+            if not is_completed:
+                new_score = zero
+            elif is_custom:
+                new_score = L
+            else:
+                new_score = route_score
+
+            if score_attained != new_score:
+                changed_scores.setdefault(new_score, []).append(score_id)
+                member_deltas[member_id] = new_score - score_attained
+
+        # 不同分數值的成績以一次 bulk_update（CASE WHEN）寫回，不必每個分數值各一次 UPDATE
+        now = timezone.now()
+        if changed_scores:
+            Score.objects.bulk_update([
+                Score(id=score_id, score_attained=new_score, updated_at=now)
+                for new_score, score_ids in changed_scores.items() for score_id in score_ids
+            ], ['score_attained', 'updated_at'])
+
+        # 總分以 F() 原子地加上差額（不先讀取再寫回，兩位裁判同時修改不同路線時不會蓋掉彼此的差額），
+        # 差額相同的成員合併為一條 UPDATE（通常只有同一路線的完成者共用一個差額）
+        totals = None
+        changed_member_ids = []
+        if member_deltas:
+            members_by_delta = {}
+            for member_id, delta in member_deltas.items():
+                members_by_delta.setdefault(delta, []).append(member_id)
+            for delta, member_ids in members_by_delta.items():
+                update_in_batches(Member, member_ids, total_score=F('total_score') + delta, updated_at=now)
+
+            # 總分改變時房間內其他成員的名次也可能改變：在同一交易中重新讀取寫入後的總分，
+            # 重新排名後只寫回名次有變動的成員（不寫回總分）
+            members = list(
+                Member.objects.filter(room_id=room_id).values_list('id', 'total_score', 'rank', 'dense_rank')
+            )
+            totals = {member_id: total for member_id, total, _, _ in members}
+            ranks = rank_members(totals)
+            reranked_members = [
+                Member(id=member_id, rank=ranks[member_id][0], dense_rank=ranks[member_id][1])
+                for member_id, _, rank, dense_rank in members
+                if ranks[member_id] != (rank, dense_rank)
+            ]
+            if reranked_members:
+                Member.objects.bulk_update(reranked_members, ['rank', 'dense_rank'])
+            changed_member_ids = set(member_deltas) | {member.id for member in reranked_members}
+
+        counters = {
+            'normal_completers': normal_completers,
+            'custom_completers': custom_completers,
+            'score_count': len(scores),
+        }
+        if any(route[field] != value for field, value in counters.items()):
+            Route.objects.filter(id=route_id).update(**counters)
+
+        if changed_scores or member_deltas:
+            invalidate_room_on_commit(room_id)
+
+        record_changes(room_id, {
+            RoomChange.KIND_SCORE: [score_id for score_ids in changed_scores.values() for score_id in score_ids],
+            RoomChange.KIND_MEMBER: changed_member_ids,
+        }, data_version)
+        prune_changes(room_id, data_version, route['room__change_log_floor'])
+
+        if totals is not None:
+            record_standings(
+                room_id, {member_id: int(total * CENTS_PER_POINT) for member_id, total in totals.items()}, data_version
+            )
+
+        if route['room__scores_version'] != data_version:
+            stamp_scores_version(room_id, data_version)
+
+    return {
+        'scores': len(scores),
+        'members': len(member_deltas),
+        'scores_updated': sum(len(score_ids) for score_ids in changed_scores.values()),
+        'members_updated': len(member_deltas),
+    }
@@ -0,0 +1,26 @@
+"""
+API 分頁
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class RoomListPagination(CursorPagination):
+    """
+    房間列表的游標分頁（按最近活動排序，最近有變動的房間在前）
+
+    回應本體仍為房間陣列（與分頁前的格式相容），
+    下一頁與上一頁的網址放在 Link 標頭（rel="next" / rel="prev"），不需要計算總數的 COUNT 查詢
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-updated_at', '-id')
+
+    def get_paginated_response(self, data):
+        links = [
+            f'<{url}>; rel="{rel}"'
+            for rel, url in (('next', self.get_next_link()), ('prev', self.get_previous_link()))
+            if url
+        ]
+        return Response(data, headers={'Link': ', '.join(links)} if links else None)
@@ -0,0 +1,244 @@
+"""
+熱門讀取端點的預先渲染回應快取
+
+比賽當天觀眾不斷輪詢房間詳情與排行榜，同一個版本的房間會被讀取數千次。
+此快取在每個程序內保存最終的回應位元組（JSON 以及 gzip / br 壓縮版本），
+命中時不需查詢、序列化與壓縮，直接以正確的 Content-Encoding 與 Vary 返回。
+
+- 快取鍵為回應的 ETag（房間 ID、建立時間、data_version、scores_version、主機名稱摘要，見 scoring.cache.room_etag）
+  加上協商的媒體類型；計分版本落後資料版本（ETag 為 None）時不快取
+- 每個房間的每個端點只保留最新版本的項目，版本改變後舊的項目立即移除；
+  訊號使房間的快取失效時（scoring.cache.invalidate_room）同時移除該房間的項目
+- 總大小以 SCORING_PAYLOAD_CACHE_MAX_BYTES 限制（0 代表停用），超過時淘汰最久未使用的項目（LRU）
+- 壓縮版本在第一次有用戶端要求該編碼時產生；br 需要安裝 Brotli（可選依賴）
+- 命中、未命中與淘汰次數可由 payload_cache.stats() 讀取，回應另帶 X-Payload-Cache: HIT / MISS 標頭
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework.response import Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+DEFAULT_PAYLOAD_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# 小於此大小的回應不壓縮（與 GZipMiddleware 相同的門檻）
+MIN_COMPRESS_LENGTH = 200
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+_accepts_br = re.compile(r'\bbr\b')
+
+IDENTITY = 'identity'
+
+
+def get_payload_cache_max_bytes():
+    """讀取快取的大小上限（動態讀取設置，支持 @override_settings）"""
+    return getattr(settings, 'SCORING_PAYLOAD_CACHE_MAX_BYTES', DEFAULT_PAYLOAD_CACHE_MAX_BYTES)
+
+
+def choose_encoding(request, length):
+    """依 Accept-Encoding 選擇回應的編碼（br 優先於 gzip）"""
+    if length < MIN_COMPRESS_LENGTH:
+        return IDENTITY
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if BROTLI_AVAILABLE and _accepts_br.search(accept):
+        return 'br'
+    if _accepts_gzip.search(accept):
+        return 'gzip'
+    return IDENTITY
+
+
+def compress(content, encoding):
+    if encoding == 'gzip':
+        return compress_string(content)
+    if encoding == 'br':
+        return brotli.compress(content)
+    return content
+
+
+class PayloadCache:
+    """
+    以總位元組數限制大小的 LRU 快取，項目為 {編碼: 位元組}
+
+    group 代表「某個房間的某個端點」，同一 group 只保留最新的鍵
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._group_keys = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, request):
+        """
+        讀取符合請求 Accept-Encoding 的內容
+
+        返回:
+            tuple: (編碼, 內容, 未壓縮的內容)；沒有該編碼的版本時內容為 None，
+                   沒有任何版本時三者皆為 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None, None
+            identity = entry['variants'][IDENTITY]
+            encoding = choose_encoding(request, len(identity))
+            content = entry['variants'].get(encoding)
+            if content is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return encoding, content, identity
+
+    def put(self, group, key, encoding, content, identity):
+        """加入一個編碼版本，超過大小上限時淘汰最久未使用的項目"""
+        max_bytes = get_payload_cache_max_bytes()
+        with self._lock:
+            previous = self._group_keys.get(group)
+            if previous is not None and previous != key:
+                self._remove(previous)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {'group': group, 'variants': {IDENTITY: identity}}
+                added = len(identity)
+            else:
+                added = 0
+            if encoding not in entry['variants']:
+                entry['variants'][encoding] = content
+                added += len(content)
+            entry_size = sum(len(value) for value in entry['variants'].values())
+            if entry_size > max_bytes:
+                # 單一回應就超過上限，不快取
+                if key in self._entries:
+                    self._remove(key)
+                return
+
+            if key not in self._entries:
+                self._entries[key] = entry
+                self._group_keys[group] = key
+            self._entries.move_to_end(key)
+            self._size += added
+            while self._size > max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= sum(len(value) for value in entry['variants'].values())
+        if self._group_keys.get(entry['group']) == key:
+            del self._group_keys[entry['group']]
+
+    def discard_room(self, room_id):
+        """移除房間所有端點的項目（訊號偵測到不經過 API 的修改時呼叫，ETag 不一定改變）"""
+        with self._lock:
+            for group, key in list(self._group_keys.items()):
+                if group[1] == room_id:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._group_keys.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': get_payload_cache_max_bytes(),
+            }
+
+
+payload_cache = PayloadCache()
+
+
+class PrerenderedResponse(Response):
+    """
+    內容已渲染（可能已壓縮）的 DRF 回應
+
+    渲染時直接使用快取的位元組；data 只在被讀取時（例如測試）才由未壓縮的 JSON 還原
+    """
+
+    def __init__(self, content, identity, **kwargs):
+        self._prerendered = content
+        self._identity = identity
+        super().__init__(**kwargs)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self._identity)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = self.content_type
+        return self._prerendered
+
+
+def prerendered_response(request, group, etag, build, renderer_context=None):
+    """
+    返回預先渲染（並壓縮）的 JSON 回應
+
+    Args:
+        request: DRF Request（使用協商後的 renderer 渲染，與一般的 Response 輸出相同）
+        group: (端點名稱, 房間 ID)
+        etag: 回應的 ETag；為 None 時不快取
+        build: 無參數的函數，返回回應資料
+    """
+    renderer = request.accepted_renderer
+    media_type = request.accepted_media_type
+    cacheable = etag is not None and get_payload_cache_max_bytes() > 0
+    key = (etag, media_type)
+
+    encoding = content = identity = None
+    if cacheable:
+        encoding, content, identity = payload_cache.get(key, request)
+    hit = content is not None
+    if not hit:
+        # 只缺少壓縮版本時沿用已渲染的 JSON
+        if identity is None:
+            identity = renderer.render(build(), media_type, renderer_context or {})
+            encoding = choose_encoding(request, len(identity))
+        content = compress(identity, encoding)
+        if cacheable:
+            payload_cache.put(group, key, encoding, content, identity)
+
+    content_type = media_type
+    if renderer.charset and 'charset' not in content_type:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    response = PrerenderedResponse(content, identity, content_type=content_type)
+    if encoding != IDENTITY:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(content))
+    response['X-Payload-Cache'] = 'HIT' if hit else 'MISS'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
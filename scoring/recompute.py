@@ -0,0 +1,268 @@
+"""
+計分重算排程
+
+所有寫入路徑（房間、成員、路線、成績的新增/修改/刪除）都透過 request_recompute 觸發重算，
+讀取路徑在回傳分數前呼叫 ensure_scores_fresh，確保讀到的是最新的總分。
+
+重算模式由 settings.SCORING_RECOMPUTE_MODE 控制：
+- 'sync'（預設）：每次編輯立即在請求中重算（單一成績的變動使用增量計分）
+- 'coalesce'：只將房間標記為待重算，由背景執行緒在 SCORING_RECOMPUTE_WINDOW 秒後重算一次，
+  同一時間窗內對同一房間的多次編輯只會觸發一次完整重算。
+  讀取該房間時若仍有待重算的標記，會在讀取前立即重算（或等待背景執行緒完成）。
+  待重算標記保存在各個 worker 程序內，因此讀取時另外比較資料庫中的版本（與 lazy 模式相同）：
+  由其他程序寫入、或背景重算失敗（例如 SQLite 的 database is locked）而仍落後的房間會在讀取前重算。
+- 'lazy'：寫入只遞增房間的 data_version，不做任何計算；
+  讀取時若 scores_version 落後 data_version 才重算。版本保存在資料庫中，多程序部署也不會讀到舊的總分。
+
+每次寫入都會遞增 Room.data_version，每次計分完成都會將 Room.scores_version 推進到計分時的資料版本。
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+MODE_SYNC = 'sync'
+MODE_COALESCE = 'coalesce'
+MODE_LAZY = 'lazy'
+
+DEFAULT_RECOMPUTE_WINDOW = 0.5
+
+
+def get_recompute_mode():
+    """讀取目前的重算模式（動態讀取設置，支持 @override_settings）"""
+    return getattr(settings, 'SCORING_RECOMPUTE_MODE', MODE_SYNC)
+
+
+def get_recompute_window():
+    """讀取合併重算的時間窗（秒）"""
+    return float(getattr(settings, 'SCORING_RECOMPUTE_WINDOW', DEFAULT_RECOMPUTE_WINDOW))
+
+
+class RecomputeQueue:
+    """
+    合併重算佇列
+
+    每個房間在佇列中最多只有一個待重算標記（附帶到期時間），
+    背景執行緒在標記到期後呼叫 runner(room_id) 重算一次。
+    同一房間不會同時被兩個執行緒重算。
+    """
+
+    def __init__(self, runner, window=None, close_connections=True):
+        self._runner = runner
+        self._window = window
+        self._close_connections = close_connections
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._running = set()
+        self._thread = None
+
+    @property
+    def window(self):
+        return get_recompute_window() if self._window is None else self._window
+
+    def mark_dirty(self, room_id):
+        """標記房間待重算；已在佇列中的房間不會延後其到期時間"""
+        with self._condition:
+            if room_id not in self._pending:
+                self._pending[room_id] = time.monotonic() + self.window
+            self._start_worker()
+            self._condition.notify_all()
+
+    def is_pending(self, room_id):
+        with self._condition:
+            return room_id in self._pending or room_id in self._running
+
+    def pending_rooms(self):
+        with self._condition:
+            return sorted(set(self._pending) | self._running)
+
+    def flush(self, room_id):
+        """
+        立即重算指定房間的待重算標記（若背景執行緒正在重算則等待其完成）
+
+        返回:
+            bool: 是否由本次呼叫執行了重算
+        """
+        with self._condition:
+            while room_id in self._running:
+                self._condition.wait()
+            if self._pending.pop(room_id, None) is None:
+                return False
+            self._running.add(room_id)
+        self._run(room_id)
+        return True
+
+    def flush_all(self):
+        """立即重算所有待重算的房間，返回重算的房間數"""
+        with self._condition:
+            room_ids = list(self._pending)
+        return sum(1 for room_id in room_ids if self.flush(room_id))
+
+    def _run(self, room_id):
+        try:
+            self._runner(room_id)
+        except Exception:
+            logger.exception(f"[RecomputeQueue] 重算房間 {room_id} 時發生錯誤")
+        finally:
+            with self._condition:
+                self._running.discard(room_id)
+                self._condition.notify_all()
+
+    def _start_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._worker_loop, name='scoring-recompute', daemon=True
+            )
+            self._thread.start()
+
+    def _next_due_room(self):
+        """等待下一個到期的房間（需持有 _condition）"""
+        while True:
+            now = time.monotonic()
+            due = [
+                (deadline, room_id) for room_id, deadline in self._pending.items()
+                if room_id not in self._running
+            ]
+            if not due:
+                self._condition.wait()
+                continue
+            deadline, room_id = min(due)
+            if deadline > now:
+                self._condition.wait(timeout=deadline - now)
+                continue
+            del self._pending[room_id]
+            self._running.add(room_id)
+            return room_id
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                room_id = self._next_due_room()
+            self._run(room_id)
+            if self._close_connections:
+                # 背景執行緒有自己的資料庫連線，重算後關閉避免長時間佔用
+                connections.close_all()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_recompute_queue():
+    """取得本程序的合併重算佇列（第一次使用時建立）"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = RecomputeQueue(models.update_scores)
+            atexit.register(_queue.flush_all)
+        return _queue
+
+
+def request_recompute(room_id, route_id=None):
+    """
+    編輯後觸發重算
+
+    Args:
+        room_id: 房間 ID
+        route_id: 只有單一路線的成績變動時提供，sync 模式會使用增量計分
+
+    返回:
+        dict | None: sync 模式返回重算統計，coalesce 與 lazy 模式返回 None
+    """
+    models.touch_room(room_id)
+
+    mode = get_recompute_mode()
+    if mode == MODE_LAZY:
+        return None
+    if mode == MODE_COALESCE:
+        get_recompute_queue().mark_dirty(room_id)
+        return None
+
+    # 仍有待重算標記時（例如剛從 coalesce 模式切換），完整重算已包含本次編輯
+    if _queue is not None and _queue.flush(room_id):
+        return None
+    if route_id is not None:
+        return models.update_route_scores(route_id)
+    return models.update_scores(room_id)
+
+
+def recompute_after_batch(room_id, result):
+    """
+    批量寫入成績後觸發重算，並確保返回前總分為最新
+
+    Args:
+        result: ScoreBatchSerializer.save() 的返回值；只涉及一條路線時使用增量計分，否則完整重算一次
+
+    返回:
+        QuerySet: 寫入前的版本之後總分或名次有變動的成員（計分引擎記錄在 RoomChange 中），
+                  包含同一路線其他完成者等未出現在請求中的成員
+    """
+    from .delta import members_changed_since
+
+    if result['created'] or result['updated']:
+        route_ids = result['route_ids']
+        request_recompute(room_id, route_id=route_ids[0] if len(route_ids) == 1 else None)
+    # lazy / coalesce 模式下確保返回的總分為最新
+    ensure_scores_fresh(room_id)
+    return members_changed_since(room_id, result['version'])
+
+
+def ensure_scores_fresh(room_id=None):
+    """
+    讀取分數前確保總分為最新
+
+    Args:
+        room_id: 房間 ID；未提供（無法對應到單一房間）時不重算，
+                 避免一次讀取觸發資料庫中所有落後房間的重算
+    """
+    if room_id is None:
+        return
+    try:
+        room_id = int(room_id)
+    except (TypeError, ValueError):
+        return
+
+    if _queue is not None:
+        _queue.flush(room_id)
+
+    # coalesce 模式的待重算標記只在本程序內，其他程序的寫入或重算失敗只能由資料庫中的版本得知
+    if get_recompute_mode() in (MODE_LAZY, MODE_COALESCE):
+        refresh_stale_rooms(room_id)
+
+
+def ensure_all_scores_fresh():
+    """
+    讀取包含所有房間的資料（未指定房間的列表）前確保所有房間的總分為最新：
+    完成本程序所有待重算的標記，lazy / coalesce 模式下另外重算資料庫中計分版本落後的房間
+    """
+    if _queue is not None:
+        _queue.flush_all()
+    if get_recompute_mode() in (MODE_LAZY, MODE_COALESCE):
+        refresh_stale_rooms()
+
+
+def refresh_stale_rooms(room_id=None):
+    """
+    重算計分版本落後資料版本的房間
+
+    Args:
+        room_id: 只檢查指定房間；未提供時檢查所有房間
+
+    返回:
+        int: 重算的房間數
+    """
+    stale_rooms = models.Room.objects.filter(scores_version__lt=F('data_version'))
+    if room_id is not None:
+        stale_rooms = stale_rooms.filter(id=room_id)
+    room_ids = list(stale_rooms.values_list('id', flat=True))
+    for stale_room_id in room_ids:
+        models.update_scores(stale_room_id)
+    return len(room_ids)
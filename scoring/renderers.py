@@ -0,0 +1,68 @@
+"""
+自訂 DRF 渲染器
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from .events import format_event
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    text/event-stream 渲染器
+
+    讓瀏覽器 EventSource（Accept: text/event-stream）通過內容協商；
+    串流本身由視圖直接返回 StreamingHttpResponse，這裡只負責把錯誤回應（例如 404、403）
+    格式化為一個 error 事件
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return format_event('error', data).encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    以 orjson 編碼的 JSON 渲染器（orjson 為可選依賴，未安裝時與 JSONRenderer 完全相同）
+
+    輸出與 JSONRenderer 逐位元組相同：
+    - orjson 不支援的型別（Decimal、datetime / date / time、延遲翻譯字串等）交給 DRF 的
+      JSONEncoder.default 轉換，小數與時間格式（毫秒、'Z' 結尾）一致
+    - 與 JSONRenderer 相同地把 U+2028 / U+2029 轉義
+    - 要求縮排（?format=json; indent=4 或可瀏覽 API）、非緊湊或 ASCII 輸出、
+      orjson 無法編碼的值（超過 64 位元的整數、孤立的代理字元）時改用 JSONRenderer
+
+    唯一的差異在浮點數：指數表示法的寫法不同（1e16 / 1e+16，數值相同），
+    NaN 與 Infinity 輸出為 null（JSONRenderer 輸出的 NaN 不是合法的 JSON）；
+    API 回應中的分數都是字串，不受影響
+    """
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if ORJSON_AVAILABLE else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # 由 JSONRenderer 編碼（或拋出與 JSONRenderer 相同的錯誤）
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,307 @@
+"""
+計分核心（與 ORM 無關的純計算模組）
+
+以「成員 × 路線」完成矩陣為輸入，計算每條路線的分數與每位成員的總分：
+- 一般組：每條路線的分數 S_r = L / P_r（P_r 為完成該路線的一般組人數）
+- 客製化組：每完成一條路線得 L 分
+
+矩陣以 Python 整數作為位元集合儲存（每位成員一個整數，第 j 個位元代表是否完成第 j 條路線），
+以位元運算與 popcount 一次處理整列，避免逐格迴圈
+（Python 3.10+ 使用 int.bit_count()，3.8 / 3.9 退回 bin(x).count('1')）。
+所有分數以「分」（0.01）為單位的整數計算，除法採用與 DecimalField 寫入時相同的
+ROUND_HALF_EVEN 捨入，結果與資料庫中的 Decimal 值完全一致。
+"""
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+import math
+
+
+# 1 分 = 100 個最小單位（DecimalField decimal_places=2）
+CENTS_PER_POINT = 100
+
+
+def _popcount_fallback(value):
+    """非負整數中為 1 的位元數（Python 3.8 / 3.9 沒有 int.bit_count）"""
+    return bin(value).count('1')
+
+
+_popcount = getattr(int, 'bit_count', None) or _popcount_fallback
+
+
+def lcm(a, b):
+    """計算兩個數的最小公倍數"""
+    return abs(a * b) // math.gcd(a, b) if a and b else 0
+
+
+def lcm_of_list(numbers):
+    """計算列表中所有數的最小公倍數"""
+    if not numbers:
+        return 1
+    if len(numbers) == 1:
+        return numbers[0]
+    result = numbers[0]
+    for i in range(1, len(numbers)):
+        result = lcm(result, numbers[i])
+    return result
+
+
+# 成員數達到此人數（含）以上時 L 固定為 1000 分
+FIXED_LINE_SCORE_MEMBER_COUNT = 8
+FIXED_LINE_SCORE = 1000
+
+# 預先計算 1 到 7 人的 L（1 到 n 的最小公倍數），0 人時為預設值 1
+STANDARD_LINE_SCORES = tuple(
+    lcm_of_list(list(range(1, member_count + 1))) if member_count else 1
+    for member_count in range(FIXED_LINE_SCORE_MEMBER_COUNT)
+)
+
+
+def standard_line_score_for(member_count):
+    """
+    根據一般組成員數計算每一條線總分 (L)
+    - 沒有一般組成員：返回預設值1
+    - 成員數低於8人：1到成員數的最小公倍數（查表）
+    - 成員數高於或等於8人：固定為1000分
+    """
+    if member_count <= 0:
+        return 1
+
+    # 如果成員數高於或等於8人，固定為1000分
+    if member_count >= FIXED_LINE_SCORE_MEMBER_COUNT:
+        return FIXED_LINE_SCORE
+
+    # 如果成員數低於8人，使用1到member_count的最小公倍數
+    # 這是因為每條路線完成的人數可能是1到N（N為一般組成員數）
+    return STANDARD_LINE_SCORES[member_count]
+
+
+@lru_cache(maxsize=4096)
+def route_value_cents(line_score, completers):
+    """
+    計算一般組單條路線的分數 S_r = L / P_r（以分為單位的整數）
+    以整數除法加上 ROUND_HALF_EVEN 捨入，與 Decimal 量化到 2 位小數的結果相同；
+    沒有人完成時返回 0。L 只有少數幾種可能值，結果在程序內快取
+    """
+    if completers <= 0:
+        return 0
+    quotient, remainder = divmod(line_score * CENTS_PER_POINT, completers)
+    doubled = remainder * 2
+    if doubled > completers or (doubled == completers and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+@lru_cache(maxsize=64)
+def route_value_table(line_score, max_completers):
+    """
+    一般組路線分數表：table[P] = L / P（以分為單位），P = 0..max_completers
+    同一個房間的所有路線共用同一張表（L 與一般組人數相同即可共用）
+    """
+    return tuple(route_value_cents(line_score, completers) for completers in range(max_completers + 1))
+
+
+def cents_to_decimal(cents):
+    """將以分為單位的整數轉換為 2 位小數的 Decimal"""
+    return Decimal(cents).scaleb(-2)
+
+
+class CompletionMatrix:
+    """
+    成員 × 路線完成矩陣
+
+    屬性:
+        rows: 每位成員一個整數位元集合，第 j 個位元為 1 代表完成第 j 條路線
+        custom_mask: 每位成員是否為客製化組
+        route_count: 路線數量
+    """
+
+    def __init__(self, rows, custom_mask, route_count):
+        if len(rows) != len(custom_mask):
+            raise ValueError("rows 與 custom_mask 的長度必須相同")
+        self.rows = list(rows)
+        self.custom_mask = [bool(is_custom) for is_custom in custom_mask]
+        self.route_count = route_count
+
+    @classmethod
+    def from_cells(cls, custom_mask, route_count, completed_cells):
+        """
+        從完成的格子建立矩陣
+
+        Args:
+            custom_mask: 每位成員是否為客製化組（成員索引順序）
+            route_count: 路線數量
+            completed_cells: 可迭代的 (成員索引, 路線索引)，只需列出已完成的格子
+        """
+        rows = [0] * len(custom_mask)
+        for member_index, route_index in completed_cells:
+            rows[member_index] |= 1 << route_index
+        return cls(rows, custom_mask, route_count)
+
+    @classmethod
+    def from_lists(cls, completions, custom_mask):
+        """從二維布林列表建立矩陣（completions[i][j] 代表成員 i 是否完成路線 j）"""
+        route_count = len(completions[0]) if completions else 0
+        rows = []
+        for row in completions:
+            bits = 0
+            for route_index, completed in enumerate(row):
+                if completed:
+                    bits |= 1 << route_index
+            rows.append(bits)
+        return cls(rows, custom_mask, route_count)
+
+    @property
+    def member_count(self):
+        return len(self.rows)
+
+    @property
+    def normal_member_count(self):
+        return sum(1 for is_custom in self.custom_mask if not is_custom)
+
+    def is_completed(self, member_index, route_index):
+        return bool(self.rows[member_index] >> route_index & 1)
+
+    @property
+    def row_bytes(self):
+        """每位成員打包後的位元組數"""
+        return (self.route_count + 7) // 8
+
+    def to_bytes(self):
+        """
+        按成員順序打包成位元組：每位成員 row_bytes 個位元組（小端序），
+        路線 j 位於該成員第 j // 8 個位元組的第 j % 8 個位元
+        """
+        return b''.join(row.to_bytes(self.row_bytes, 'little') for row in self.rows)
+
+    @classmethod
+    def from_bytes(cls, data, custom_mask, route_count):
+        """由 to_bytes 的結果還原矩陣"""
+        row_bytes = (route_count + 7) // 8
+        if len(data) != row_bytes * len(custom_mask):
+            raise ValueError("位元組長度與成員數、路線數不符")
+        rows = [
+            int.from_bytes(data[index * row_bytes:(index + 1) * row_bytes], 'little')
+            for index in range(len(custom_mask))
+        ]
+        return cls(rows, custom_mask, route_count)
+
+    def route_completion_counts(self):
+        """
+        計算每條路線完成的一般組人數 P_r
+
+        使用位元切片計數器：counters[k] 的第 j 個位元是路線 j 完成人數的第 k 個二進位位，
+        每加入一位成員只需要少量的整數位元運算，與路線數無關
+        """
+        counters = []
+        for row, is_custom in zip(self.rows, self.custom_mask):
+            if is_custom:
+                continue
+            carry = row
+            level = 0
+            while carry:
+                if level == len(counters):
+                    counters.append(0)
+                counter = counters[level]
+                counters[level] = counter ^ carry
+                carry &= counter
+                level += 1
+
+        counts = [0] * self.route_count
+        for level, counter in enumerate(counters):
+            weight = 1 << level
+            # 轉為二進位字串一次取出所有位元（低位在前）
+            bits = bin(counter)[:1:-1]
+            for route_index, bit in enumerate(bits):
+                if bit == '1':
+                    counts[route_index] += weight
+        return counts
+
+
+ScoringResult = namedtuple('ScoringResult', [
+    'line_score',          # 每一條線總分 L
+    'route_completers',    # 每條路線完成的一般組人數 P_r
+    'route_cents',         # 一般組每條路線的分數 S_r（分）
+    'member_cents',        # 每位成員的總分（分）
+    'completed_counts',    # 每位成員完成的路線數
+])
+
+
+def score_matrix(matrix, line_score=None):
+    """
+    計算整個完成矩陣的分數
+
+    Args:
+        matrix: CompletionMatrix
+        line_score: 每一條線總分 L，未提供時依一般組成員數計算
+
+    Returns:
+        ScoringResult: 所有分數皆為以分為單位的整數
+    """
+    if line_score is None:
+        line_score = standard_line_score_for(matrix.normal_member_count)
+
+    route_completers = matrix.route_completion_counts()
+    table = route_value_table(line_score, matrix.normal_member_count)
+    route_cents = [table[count] for count in route_completers]
+
+    # 一般組總分 = Σ_j S_j × 完成(i, j)
+    # 按 S_j 的二進位位切片：masks[k] 為 S_j 第 k 位為 1 的路線集合，
+    # 總分 = Σ_k 2^k × popcount(成員列 & masks[k])，每位成員只需約 17 次位元運算
+    # 同一個 S_j 值的路線先合併成一個集合（不同的 S_j 值最多只有一般組人數種）
+    routes_by_value = {}
+    for route_index, cents in enumerate(route_cents):
+        if cents:
+            routes_by_value[cents] = routes_by_value.get(cents, 0) | (1 << route_index)
+    masks = []
+    for cents, routes in routes_by_value.items():
+        level = 0
+        while cents:
+            if cents & 1:
+                while len(masks) <= level:
+                    masks.append(0)
+                masks[level] |= routes
+            cents >>= 1
+            level += 1
+    weighted_masks = [(1 << level, mask) for level, mask in enumerate(masks) if mask]
+
+    custom_route_cents = line_score * CENTS_PER_POINT
+    member_cents = []
+    completed_counts = []
+    for row, is_custom in zip(matrix.rows, matrix.custom_mask):
+        completed = _popcount(row)
+        completed_counts.append(completed)
+        if is_custom:
+            member_cents.append(completed * custom_route_cents)
+        else:
+            member_cents.append(sum(weight * _popcount(row & mask) for weight, mask in weighted_masks))
+
+    return ScoringResult(line_score, route_completers, route_cents, member_cents, completed_counts)
+
+
+def competition_ranks(sorted_totals):
+    """
+    計算已按總分降序排列的名次（同分同名次，下一個名次跳過並列人數，例如 1, 2, 2, 4）
+    與排行榜頁面的排名方式相同
+    """
+    ranks = []
+    previous = None
+    for index, total in enumerate(sorted_totals):
+        if index == 0 or total != previous:
+            rank = index + 1
+        ranks.append(rank)
+        previous = total
+    return ranks
+
+
+def dense_ranks(sorted_totals):
+    """計算已按總分降序排列的密集名次（同分同名次，下一個名次不跳過，例如 1, 2, 2, 3）"""
+    ranks = []
+    rank = 0
+    previous = None
+    for index, total in enumerate(sorted_totals):
+        if index == 0 or total != previous:
+            rank += 1
+        ranks.append(rank)
+        previous = total
+    return ranks
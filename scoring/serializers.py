@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.utils.html import escape
 import logging
 from .models import Room, Member, Route, Score
+from .leaderboard import DEFAULT_LEADERBOARD_LIMIT, MAX_LEADERBOARD_LIMIT, decode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +153,18 @@ class RouteSerializer(serializers.ModelSerializer):
         return obj.photo_url if obj.photo_url else ''
 
 
+class RouteHeaderSerializer(RouteSerializer):
+    """路線的基本資料（不含成績，用於精簡完成矩陣，見 scoring.matrix）"""
+    scores = None
+
+    class Meta(RouteSerializer.Meta):
+        fields = ['id', 'name', 'grade', 'photo_url', 'created_at']
+
+    def to_representation(self, instance):
+        # 不經過 RouteSerializer.to_representation（會重新讀取每條路線的成績）
+        return serializers.ModelSerializer.to_representation(self, instance)
+
+
 class RouteCreateSerializer(serializers.ModelSerializer):
     """用於創建路線並批量創建成績記錄"""
     member_completions = serializers.CharField(
@@ -879,8 +892,8 @@ class RouteCreateSerializer(serializers.ModelSerializer):
             )
         
         # 觸發計分更新
-        from .models import update_scores
-        update_scores(room.id)
+        from .recompute import request_recompute
+        request_recompute(room.id)
         
         return route
 
@@ -1228,13 +1241,20 @@ class RouteUpdateSerializer(serializers.ModelSerializer):
             if not isinstance(member_completions, dict):
                 member_completions = {}
             
+            # 一次載入該路線現有的成績記錄，只寫入有變動的格子
+            from django.utils import timezone
+            from .models import record_score_writes, update_in_batches, values_in_batches
+            existing_scores = {
+                member_id: (score_id, completed)
+                for score_id, member_id, completed in Score.objects.filter(route=instance).values_list(
+                    'id', 'member_id', 'is_completed'
+                )
+            }
+            new_scores = []
+            changed_score_ids = {True: [], False: []}
+            
             # 更新所有成員的完成狀態
             for member in room.members.all():
-                score, created = Score.objects.get_or_create(
-                    member=member,
-                    route=instance,
-                    defaults={'is_completed': False}
-                )
                 # 嘗試多種 key 格式（字符串和整數）
                 member_id_str = str(member.id)
                 member_id_int = member.id
@@ -1249,12 +1269,28 @@ class RouteUpdateSerializer(serializers.ModelSerializer):
                 if isinstance(is_completed, str):
                     is_completed = is_completed.lower() in ('true', '1', 'yes')
                 
-                score.is_completed = bool(is_completed)
-                score.save()
+                is_completed = bool(is_completed)
+                if member.id not in existing_scores:
+                    new_scores.append(Score(member=member, route=instance, is_completed=is_completed))
+                else:
+                    score_id, was_completed = existing_scores[member.id]
+                    if was_completed != is_completed:
+                        changed_score_ids[is_completed].append(score_id)
+            
+            if new_scores:
+                Score.objects.bulk_create(new_scores)
+            for is_completed, score_ids in changed_score_ids.items():
+                update_in_batches(Score, score_ids, is_completed=is_completed, updated_at=timezone.now())
+            record_score_writes(room.id, new_scores, changed_score_ids[True] + changed_score_ids[False])
+            
+            # 完成狀態只影響這條路線，使用增量計分（L 改變時自動退回完整重算）
+            from .recompute import request_recompute
+            request_recompute(room.id, route_id=instance.id)
+            return instance
         
         # 觸發計分更新
-        from .models import update_scores
-        update_scores(room.id)
+        from .recompute import request_recompute
+        request_recompute(room.id)
         
         return instance
 
@@ -1264,8 +1300,8 @@ class MemberSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Member
-        fields = ['id', 'room', 'name', 'is_custom_calc', 'total_score', 'completed_routes_count']
-        read_only_fields = ['total_score', 'completed_routes_count']
+        fields = ['id', 'room', 'name', 'is_custom_calc', 'total_score', 'rank', 'dense_rank', 'completed_routes_count']
+        read_only_fields = ['total_score', 'rank', 'dense_rank', 'completed_routes_count']
 
     def validate_room(self, value):
         """驗證房間是否存在"""
@@ -1311,8 +1347,8 @@ class MemberSerializer(serializers.ModelSerializer):
             )
         
         # 觸發計分更新（會自動更新standard_line_score）
-        from .models import update_scores
-        update_scores(room.id)
+        from .recompute import request_recompute
+        request_recompute(room.id)
         
         return member
 
@@ -1324,19 +1360,21 @@ class MemberSerializer(serializers.ModelSerializer):
         instance.save()
         
         # 觸發計分更新（會自動更新standard_line_score）
-        from .models import update_scores
-        update_scores(instance.room.id)
+        from .recompute import request_recompute
+        request_recompute(instance.room_id)
         
         return instance
 
 
 class RoomSerializer(serializers.ModelSerializer):
     members = MemberSerializer(many=True, read_only=True)
-    routes = RouteSerializer(many=True, read_only=True)
+    routes = serializers.SerializerMethodField()
+    # 完成計分的資料版本，用戶端以 ?since=<version> 增量同步（見 scoring.delta）
+    version = serializers.IntegerField(source='scores_version', read_only=True)
 
     class Meta:
         model = Room
-        fields = ['id', 'name', 'standard_line_score', 'members', 'routes', 'created_at']
+        fields = ['id', 'name', 'standard_line_score', 'members', 'routes', 'created_at', 'version']
     
     def validate_name(self, value):
         """驗證並清理房間名稱，防止 XSS"""
@@ -1348,28 +1386,23 @@ class RoomSerializer(serializers.ModelSerializer):
             return cleaned_name
         return value
     
-    def to_representation(self, instance):
-        """確保嵌套的 RouteSerializer 能正確獲取 context"""
-        representation = super().to_representation(instance)
-        # 手動序列化 routes 以確保 context 正確傳遞
-        request = self.context.get('request')
-        
-        # 強制重新查詢 routes 並預取 scores 關係，避免緩存問題
-        # 使用 select_related 和 prefetch_related 確保數據完整
-        # 如果 instance 已經有 prefetch_related，這會使用它；否則重新查詢
+    def get_routes(self, instance):
+        """序列化路線（已預取時直接使用，否則一次預取路線的成績與成員）"""
         if hasattr(instance, '_prefetched_objects_cache') and 'routes' in instance._prefetched_objects_cache:
-            # 如果已經預取，使用預取的數據
             routes = instance._prefetched_objects_cache['routes']
         else:
-            # 否則重新查詢並預取
             routes = instance.routes.prefetch_related('scores__member').all()
-        
-        representation['routes'] = RouteSerializer(
-            routes, 
-            many=True, 
-            context={'request': request} if request else {}
-        ).data
-        return representation
+        return RouteSerializer(routes, many=True, context=self.context).data
+
+
+class RoomSummarySerializer(serializers.ModelSerializer):
+    """房間列表的摘要（不含成員與路線；計數由 annotate_room_summary 以子查詢取得）"""
+    member_count = serializers.IntegerField(read_only=True)
+    route_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Room
+        fields = ['id', 'name', 'standard_line_score', 'member_count', 'route_count', 'created_at', 'updated_at']
 
 
 class LeaderboardSerializer(serializers.Serializer):
@@ -1378,8 +1411,169 @@ class LeaderboardSerializer(serializers.Serializer):
     leaderboard = MemberSerializer(many=True)
 
 
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """
+    排行榜分頁的查詢參數（見 scoring.leaderboard，需在 context 中提供 room_id）
+    around 驗證後為該房間的成員，cursor 驗證後為 (名次, 名稱)
+    """
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=MAX_LEADERBOARD_LIMIT)
+    around = serializers.IntegerField(required=False)
+    cursor = serializers.CharField(required=False)
+
+    def validate_around(self, value):
+        member = Member.objects.filter(
+            room_id=self.context['room_id'], pk=value, rank__isnull=False
+        ).only('id', 'rank', 'name').first()
+        if member is None:
+            raise serializers.ValidationError(f"成員 {value} 不存在於此房間")
+        return member
+
+    def validate_cursor(self, value):
+        cursor = decode_cursor(value)
+        if cursor is None:
+            raise serializers.ValidationError("游標格式錯誤")
+        return cursor
+
+    def validate(self, data):
+        if 'around' in data and 'cursor' in data:
+            raise serializers.ValidationError("around 與 cursor 不能同時使用")
+        data.setdefault('limit', DEFAULT_LEADERBOARD_LIMIT)
+        return data
+
+
 class ScoreUpdateSerializer(serializers.ModelSerializer):
     """用於更新成績狀態"""
     class Meta:
         model = Score
         fields = ['is_completed']
+
+
+class ScoreChangeSerializer(serializers.Serializer):
+    """批量更新中的單格完成狀態"""
+    member_id = serializers.IntegerField()
+    route_id = serializers.IntegerField()
+    is_completed = serializers.BooleanField()
+
+
+class SimulationFlipSerializer(serializers.Serializer):
+    """假設模擬中的單格完成狀態（未提供 is_completed 時切換目前狀態）"""
+    member_id = serializers.IntegerField()
+    route_id = serializers.IntegerField()
+    is_completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
+class SimulationSerializer(serializers.Serializer):
+    """
+    假設模擬請求（需在 context 中提供房間快照 snapshot）
+    成員與路線直接以快照驗證，不需額外查詢
+    """
+    flips = SimulationFlipSerializer(many=True, required=False)
+
+    MAX_FLIPS = 5000
+
+    def validate_flips(self, flips):
+        if len(flips) > self.MAX_FLIPS:
+            raise serializers.ValidationError(f'單次最多模擬 {self.MAX_FLIPS} 筆變更')
+
+        snapshot = self.context['snapshot']
+        invalid_members = {flip['member_id'] for flip in flips} - {member[0] for member in snapshot.members}
+        invalid_routes = {flip['route_id'] for flip in flips} - set(snapshot.route_ids)
+        errors = []
+        if invalid_members:
+            errors.append(f'成員不屬於此房間: {sorted(invalid_members)}')
+        if invalid_routes:
+            errors.append(f'路線不屬於此房間: {sorted(invalid_routes)}')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return flips
+
+
+class ScoreBatchSerializer(serializers.Serializer):
+    """
+    批量更新成績狀態（需在 context 中提供 room）
+    同一格 (member_id, route_id) 重複出現時以最後一筆為準
+    """
+    changes = ScoreChangeSerializer(many=True, allow_empty=False)
+
+    MAX_CHANGES = 5000
+
+    def validate_changes(self, changes):
+        if len(changes) > self.MAX_CHANGES:
+            raise serializers.ValidationError(f'單次最多更新 {self.MAX_CHANGES} 筆成績')
+
+        from .models import values_in_batches
+
+        room = self.context['room']
+        member_ids = {change['member_id'] for change in changes}
+        route_ids = {change['route_id'] for change in changes}
+        invalid_members = member_ids - {
+            member_id for member_id, in values_in_batches(Member.objects.filter(room=room), 'id', member_ids, 'id')
+        }
+        invalid_routes = route_ids - {
+            route_id for route_id, in values_in_batches(Route.objects.filter(room=room), 'id', route_ids, 'id')
+        }
+        errors = []
+        if invalid_members:
+            errors.append(f'成員不屬於此房間: {sorted(invalid_members)}')
+        if invalid_routes:
+            errors.append(f'路線不屬於此房間: {sorted(invalid_routes)}')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return changes
+
+    def save(self):
+        """
+        在單一交易中寫入所有變動：不存在的成績以 bulk_create 建立，
+        既有成績按新的完成狀態分組，每組一條 UPDATE
+
+        返回:
+            dict: 建立、更新、未變動的筆數、涉及的成員與路線 ID，以及寫入前的資料版本
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        from .models import record_score_writes, update_in_batches, values_in_batches
+
+        desired = {}
+        for change in self.validated_data['changes']:
+            desired[(change['member_id'], change['route_id'])] = change['is_completed']
+        member_ids = {member_id for member_id, _ in desired}
+        route_ids = {route_id for _, route_id in desired}
+
+        with transaction.atomic():
+            # 只以成員 ID 分批篩選（路線已驗證屬於此房間，以房間篩選），每條查詢的參數數量固定在上限內
+            existing = {
+                (member_id, route_id): (score_id, completed)
+                for score_id, member_id, route_id, completed in values_in_batches(
+                    Score.objects.filter(route__room_id=self.context['room'].id), 'member_id', member_ids,
+                    'id', 'member_id', 'route_id', 'is_completed',
+                )
+                if (member_id, route_id) in desired
+            }
+
+            new_scores = []
+            changed_score_ids = {True: [], False: []}
+            for (member_id, route_id), is_completed in desired.items():
+                if (member_id, route_id) not in existing:
+                    new_scores.append(Score(member_id=member_id, route_id=route_id, is_completed=is_completed))
+                    continue
+                score_id, was_completed = existing[(member_id, route_id)]
+                if was_completed != is_completed:
+                    changed_score_ids[is_completed].append(score_id)
+
+            if new_scores:
+                Score.objects.bulk_create(new_scores)
+            for is_completed, score_ids in changed_score_ids.items():
+                update_in_batches(Score, score_ids, is_completed=is_completed, updated_at=timezone.now())
+            record_score_writes(
+                self.context['room'].id, new_scores, changed_score_ids[True] + changed_score_ids[False]
+            )
+
+        updated = sum(len(score_ids) for score_ids in changed_score_ids.values())
+        return {
+            'created': len(new_scores),
+            'updated': updated,
+            'unchanged': len(desired) - len(new_scores) - updated,
+            'member_ids': sorted(member_ids),
+            'route_ids': sorted(route_ids),
+            'version': self.context['room'].data_version,
+        }
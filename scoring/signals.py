@@ -0,0 +1,56 @@
+"""
+快取失效與變動記錄訊號
+
+房間內的 Room / Member / Route / Score 有任何修改時，遞增該房間的快取世代（scoring.cache）。
+世代在修改時與交易提交後各遞增一次，避免其他請求在提交前以舊資料重建的快取被繼續使用。
+Member / Route / Score 的修改同時寫入房間變動記錄（RoomChange，供增量同步使用）；
+刪除整個房間時不寫入（記錄會隨房間一起刪除）。
+
+Score 只連接 post_save：連接 post_delete 會讓刪除成員、路線或房間時無法以單一 DELETE 級聯刪除成績，
+必須逐筆載入。成績只會因刪除成員/路線/房間而被刪除（已由這些模型的訊號涵蓋），
+或由 ScoreViewSet 刪除（會觸發重算並遞增 data_version）。
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_room_on_commit
+from .models import Room, Member, Route, RoomChange, Score, record_changes
+
+CHANGE_KINDS = {Member: RoomChange.KIND_MEMBER, Route: RoomChange.KIND_ROUTE, Score: RoomChange.KIND_SCORE}
+
+
+def _invalidate_on_commit(room_id):
+    if room_id is not None:
+        invalidate_room_on_commit(room_id)
+
+
+def _record_change(room_id, instance, origin=None):
+    # 級聯刪除房間時，房間的變動記錄也會被刪除
+    if room_id is None or isinstance(origin, Room) or getattr(origin, 'model', None) is Room:
+        return
+    record_changes(room_id, {CHANGE_KINDS[type(instance)]: [instance.pk]})
+
+
+@receiver(post_save, sender=Room, dispatch_uid='scoring_room_saved')
+@receiver(post_delete, sender=Room, dispatch_uid='scoring_room_deleted')
+def room_changed(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Member, dispatch_uid='scoring_member_saved')
+@receiver(post_delete, sender=Member, dispatch_uid='scoring_member_deleted')
+@receiver(post_save, sender=Route, dispatch_uid='scoring_route_saved')
+@receiver(post_delete, sender=Route, dispatch_uid='scoring_route_deleted')
+def room_child_changed(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.room_id)
+    _record_change(instance.room_id, instance, kwargs.get('origin'))
+
+
+@receiver(post_save, sender=Score, dispatch_uid='scoring_score_saved')
+def score_changed(sender, instance, **kwargs):
+    if Score.route.is_cached(instance):
+        room_id = instance.route.room_id
+    else:
+        room_id = Route.objects.filter(id=instance.route_id).values_list('room_id', flat=True).first()
+    _invalidate_on_commit(room_id)
+    _record_change(room_id, instance)
@@ -0,0 +1,157 @@
+"""
+假設完成模擬（what-if）
+
+從房間的一次快照建立完成矩陣，套用假設的完成狀態變更後在記憶體中重新計分，
+返回模擬的排行榜與名次變化。整個過程只讀取資料庫，不寫入任何資料，也不呼叫 update_scores。
+"""
+from collections import namedtuple
+
+from .models import Room, Member, Route, Score
+from .scoring_kernel import (
+    CompletionMatrix, cents_to_decimal, competition_ranks, score_matrix, standard_line_score_for,
+)
+
+
+RoomSnapshot = namedtuple('RoomSnapshot', [
+    'room',          # {'id', 'name', 'standard_line_score'}
+    'members',       # [(id, name, is_custom_calc)]，與矩陣列的順序相同
+    'route_ids',     # 路線 ID，與矩陣欄的順序相同
+    'matrix',        # CompletionMatrix
+])
+
+
+def load_room_snapshot(room_id):
+    """
+    以固定次數的查詢載入房間快照（房間、成員、路線、已完成的成績）
+
+    返回:
+        RoomSnapshot，房間不存在時返回 None
+    """
+    room = Room.objects.filter(id=room_id).values('id', 'name', 'standard_line_score').first()
+    if room is None:
+        return None
+
+    members = list(
+        Member.objects.filter(room_id=room_id).order_by('id').values_list('id', 'name', 'is_custom_calc')
+    )
+    route_ids = list(Route.objects.filter(room_id=room_id).order_by('id').values_list('id', flat=True))
+
+    member_index = {member_id: index for index, (member_id, _, _) in enumerate(members)}
+    route_index = {route_id: index for index, route_id in enumerate(route_ids)}
+    completed = Score.objects.filter(route__room_id=room_id, is_completed=True).values_list('member_id', 'route_id')
+    matrix = CompletionMatrix.from_cells(
+        [is_custom for _, _, is_custom in members],
+        len(route_ids),
+        (
+            (member_index[member_id], route_index[route_id])
+            for member_id, route_id in completed if member_id in member_index
+        ),
+    )
+    # 與 update_scores 相同，L 依一般組人數計算（不沿用資料庫中可能尚未更新的值）
+    room['standard_line_score'] = standard_line_score_for(matrix.normal_member_count)
+    return RoomSnapshot(room, members, route_ids, matrix)
+
+
+def apply_flips(snapshot, flips):
+    """
+    在快照矩陣的複本上套用假設的完成狀態變更
+
+    Args:
+        flips: [{'member_id', 'route_id', 'is_completed'}]，is_completed 為 None 時切換目前狀態；
+               同一格重複出現時以最後一筆為準
+
+    返回:
+        tuple: (新的 CompletionMatrix, 實際套用的變更列表)
+    """
+    member_index = {member_id: index for index, (member_id, _, _) in enumerate(snapshot.members)}
+    route_index = {route_id: index for index, route_id in enumerate(snapshot.route_ids)}
+    matrix = snapshot.matrix
+
+    desired = {}
+    for flip in flips:
+        cell = (flip['member_id'], flip['route_id'])
+        is_completed = flip.get('is_completed')
+        if is_completed is None:
+            current = desired.get(cell)
+            if current is None:
+                current = matrix.is_completed(member_index[cell[0]], route_index[cell[1]])
+            is_completed = not current
+        desired[cell] = is_completed
+
+    rows = list(matrix.rows)
+    applied = []
+    for (member_id, route_id), is_completed in desired.items():
+        row, column = member_index[member_id], route_index[route_id]
+        bit = 1 << column
+        if is_completed:
+            rows[row] |= bit
+        else:
+            rows[row] &= ~bit
+        applied.append({'member_id': member_id, 'route_id': route_id, 'is_completed': is_completed})
+    return CompletionMatrix(rows, matrix.custom_mask, matrix.route_count), applied
+
+
+def _ranked(members, result):
+    """按總分降序、名稱升序排列（與排行榜 API 相同），返回 {成員 ID: (名次, 分, 完成條數)}"""
+    order = sorted(range(len(members)), key=lambda index: (-result.member_cents[index], members[index][1]))
+    ranks = competition_ranks([result.member_cents[index] for index in order])
+    return order, {
+        members[index][0]: (rank, result.member_cents[index], result.completed_counts[index])
+        for index, rank in zip(order, ranks)
+    }
+
+
+def simulate_completions(snapshot, flips):
+    """
+    計算套用假設變更前後的排行榜
+
+    前後兩次都由同一份快照計算（而不是讀取資料庫中的總分），
+    因此即使房間的分數尚未重算，名次變化也只反映這次假設的變更
+
+    返回:
+        dict: room_info、flips（實際套用的變更）、routes（分數有變化的路線）、leaderboard
+    """
+    L = snapshot.room['standard_line_score']
+    before = score_matrix(snapshot.matrix, line_score=L)
+    matrix, applied = apply_flips(snapshot, flips)
+    after = score_matrix(matrix, line_score=L)
+
+    _, before_ranks = _ranked(snapshot.members, before)
+    order, after_ranks = _ranked(snapshot.members, after)
+
+    leaderboard = []
+    for index in order:
+        member_id, name, is_custom = snapshot.members[index]
+        rank, cents, completed = after_ranks[member_id]
+        previous_rank, previous_cents, _ = before_ranks[member_id]
+        leaderboard.append({
+            'id': member_id,
+            'name': name,
+            'is_custom_calc': is_custom,
+            'rank': rank,
+            'previous_rank': previous_rank,
+            'rank_change': previous_rank - rank,
+            'total_score': str(cents_to_decimal(cents)),
+            'previous_total_score': str(cents_to_decimal(previous_cents)),
+            'score_change': str(cents_to_decimal(cents - previous_cents)),
+            'completed_routes_count': completed,
+        })
+
+    routes = [
+        {
+            'route_id': route_id,
+            'completers': after.route_completers[column],
+            'previous_completers': before.route_completers[column],
+            'score': str(cents_to_decimal(after.route_cents[column])),
+            'previous_score': str(cents_to_decimal(before.route_cents[column])),
+        }
+        for column, route_id in enumerate(snapshot.route_ids)
+        if after.route_completers[column] != before.route_completers[column]
+    ]
+
+    return {
+        'room_info': snapshot.room,
+        'flips': applied,
+        'routes': routes,
+        'leaderboard': leaderboard,
+    }
@@ -0,0 +1,208 @@
+"""
+集合式重算引擎測試
+
+測試項目：
+1. 新版 update_scores 與舊版逐筆計算的結果完全一致（隨機房間、含客製化組、7→8 人邊界）
+2. 重算的查詢次數與房間大小無關（固定次數的讀取查詢）
+3. 只寫回有變動的資料列
+4. 不同房間大小（至 40×80）下冷重算的讀取查詢次數固定、結果與舊版一致，且查詢次數少於舊版
+"""
+import random
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from scoring.models import Room, Member, Route, Score, update_scores
+from scoring.tests.test_helpers import TestDataFactory, cleanup_test_data
+
+
+def reference_update_scores(room_id):
+    """舊版逐筆計分邏輯（作為結果比對的基準）"""
+    room = Room.objects.get(id=room_id)
+    room.update_standard_line_score()
+    L = room.standard_line_score
+
+    normal_members = room.members.filter(is_custom_calc=False)
+    custom_members = room.members.filter(is_custom_calc=True)
+
+    for route in room.routes.all():
+        normal_completers = Score.objects.filter(
+            route=route, is_completed=True, member__is_custom_calc=False
+        ).count()
+        if normal_completers > 0:
+            route_score = Decimal(str(L)) / Decimal(str(normal_completers))
+        else:
+            route_score = Decimal('0.00')
+        for score in Score.objects.filter(route=route, is_completed=True, member__is_custom_calc=False):
+            score.score_attained = route_score
+            score.save()
+        for score in Score.objects.filter(route=route, is_completed=False, member__is_custom_calc=False):
+            score.score_attained = Decimal('0.00')
+            score.save()
+
+    for member in normal_members:
+        total = Score.objects.filter(member=member, is_completed=True).aggregate(
+            total=Sum('score_attained')
+        )['total'] or Decimal('0.00')
+        member.total_score = total
+        member.save()
+
+    for member in custom_members:
+        completed_count = Score.objects.filter(member=member, is_completed=True).count()
+        member.total_score = Decimal(str(completed_count)) * Decimal(str(L))
+        member.save()
+        for score in member.scores.all():
+            score.score_attained = Decimal(str(L)) if score.is_completed else Decimal('0.00')
+            score.save()
+
+
+def build_room(name, normal_count, custom_count, route_count, density, seed):
+    """建立指定大小的房間，成績記錄使用 bulk_create 以加快建立速度"""
+    rng = random.Random(seed)
+    room = TestDataFactory.create_room(name=name)
+    members = TestDataFactory.create_normal_members(
+        room, count=normal_count, names=[f"一般{i}" for i in range(normal_count)]
+    )
+    if custom_count:
+        members += TestDataFactory.create_custom_members(
+            room, count=custom_count, names=[f"客製{i}" for i in range(custom_count)]
+        )
+    routes = Route.objects.bulk_create([
+        Route(room=room, name=f"R{i}", grade=f"V{i % 8}") for i in range(route_count)
+    ])
+    routes = list(Route.objects.filter(room=room))
+    Score.objects.bulk_create([
+        Score(member=member, route=route, is_completed=rng.random() < density)
+        for route in routes for member in members
+    ])
+    return room
+
+
+def snapshot(room):
+    """房間的計分結果快照：L、成員總分、每筆成績的分數"""
+    room.refresh_from_db()
+    return (
+        room.standard_line_score,
+        dict(Member.objects.filter(room=room).values_list('id', 'total_score')),
+        dict(Score.objects.filter(route__room=room).values_list('id', 'score_attained')),
+    )
+
+
+class TestCaseBulkRecomputeEngine(TestCase):
+    """測試集合式重算引擎與舊版逐筆計算結果一致"""
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def assert_same_as_reference(self, room):
+        update_scores(room.id)
+        result = snapshot(room)
+        # 把分數打亂後用舊版邏輯重算，結果應與新版完全一致
+        Score.objects.filter(route__room=room).update(score_attained=Decimal('7.77'))
+        Member.objects.filter(room=room).update(total_score=Decimal('0.00'))
+        reference_update_scores(room.id)
+        self.assertEqual(result, snapshot(room))
+
+    def test_matches_reference_on_random_rooms(self):
+        """測試：隨機房間（含客製化組）的結果與舊版一致"""
+        configs = [
+            (3, 0, 6, 0.5),
+            (4, 2, 10, 0.4),
+            (7, 1, 12, 0.6),   # L = LCM(1..7) = 420
+            (8, 2, 12, 0.3),   # L = 1000（邊界）
+            (11, 3, 15, 0.7),  # 產生無限小數的路線分數
+        ]
+        for index, (normal, custom, routes, density) in enumerate(configs):
+            with self.subTest(normal=normal, custom=custom):
+                room = build_room(f"隨機房間{index}", normal, custom, routes, density, seed=index)
+                self.assert_same_as_reference(room)
+
+    def test_matches_reference_when_members_cross_boundary(self):
+        """測試：一般組成員從 7 人變為 8 人（L 從 420 變為 1000）時結果與舊版一致"""
+        room = build_room("邊界房間", 7, 1, 8, 0.5, seed=42)
+        update_scores(room.id)
+        room.refresh_from_db()
+        self.assertEqual(room.standard_line_score, 420)
+
+        new_member = TestDataFactory.create_normal_members(room, count=1, names=["第八人"])[0]
+        for route in Route.objects.filter(room=room):
+            Score.objects.create(member=new_member, route=route, is_completed=True)
+        self.assert_same_as_reference(room)
+        self.assertEqual(room.standard_line_score, 1000)
+
+    def test_matches_reference_after_group_change(self):
+        """測試：成員在一般組與客製化組之間切換後結果與舊版一致"""
+        room = build_room("組別切換房間", 5, 2, 10, 0.5, seed=7)
+        update_scores(room.id)
+        member = Member.objects.filter(room=room, is_custom_calc=False).first()
+        member.is_custom_calc = True
+        member.save()
+        self.assert_same_as_reference(room)
+
+    def test_missing_room_is_ignored(self):
+        """測試：房間不存在時不拋出錯誤"""
+        self.assertIsNone(update_scores(999999))
+
+    def test_only_changed_rows_are_written(self):
+        """測試：沒有變動時不寫回任何資料列"""
+        room = build_room("無變動房間", 4, 1, 5, 0.5, seed=3)
+        first = update_scores(room.id)
+        self.assertGreater(first['scores_updated'], 0)
+
+        second = update_scores(room.id)
+        self.assertEqual(second['scores_updated'], 0)
+        self.assertEqual(second['members_updated'], 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            update_scores(room.id)
+        self.assertFalse(
+            any(q['sql'].startswith('UPDATE') for q in queries.captured_queries),
+            "沒有變動時不應產生 UPDATE 查詢"
+        )
+
+    def test_query_count_is_independent_of_room_size(self):
+        """測試：重算的查詢次數與房間大小無關"""
+        counts = []
+        for index, (members, routes) in enumerate([(3, 5), (12, 20), (40, 80)]):
+            room = build_room(f"查詢次數房間{index}", members, 0, routes, 0.5, seed=index)
+            update_scores(room.id)
+            with CaptureQueriesContext(connection) as queries:
+                update_scores(room.id)
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(len(set(counts)), 1, f"查詢次數應固定，實際為 {counts}")
+
+
+class TestCaseBulkRecomputeBenchmark(TestCase):
+    """不同房間大小的查詢次數基準"""
+
+    SIZES = [(10, 20), (20, 40), (40, 80)]
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_benchmark_room_sizes(self):
+        """基準：冷重算的讀取查詢次數與房間大小無關，結果與舊版一致，且查詢次數少於舊版"""
+        read_counts = []
+        for index, (member_count, route_count) in enumerate(self.SIZES):
+            room = build_room(f"基準房間{index}", member_count, 2, route_count, 0.5, seed=index)
+            Score.objects.filter(route__room=room).update(score_attained=Decimal('0.00'))
+
+            with CaptureQueriesContext(connection) as queries:
+                update_scores(room.id)
+            engine_queries = len(queries.captured_queries)
+            # 寫入依分數值分組並按 UPDATE_BATCH_SIZE 分批，只有讀取查詢的次數固定
+            read_counts.append(sum(1 for q in queries.captured_queries if q['sql'].startswith('SELECT')))
+            result = snapshot(room)
+
+            Score.objects.filter(route__room=room).update(score_attained=Decimal('0.00'))
+            Member.objects.filter(room=room).update(total_score=Decimal('0.00'))
+            with CaptureQueriesContext(connection) as queries:
+                reference_update_scores(room.id)
+            self.assertEqual(result, snapshot(room), f"{member_count}×{route_count} 房間的結果應與舊版一致")
+            self.assertLess(engine_queries, len(queries.captured_queries))
+
+            cleanup_test_data(room=room)
+        self.assertEqual(len(set(read_counts)), 1, f"讀取查詢次數應固定，實際為 {read_counts}")
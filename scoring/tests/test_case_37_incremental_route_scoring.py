@@ -0,0 +1,189 @@
+"""
+增量計分測試（單一路線的差額更新）
+
+測試項目：
+1. 連續隨機切換完成狀態後，增量計分結果與完整重算完全一致
+2. 增量計分的查詢次數與房間路線數無關
+3. L 需要改變時退回完整重算
+4. 房間內有尚未計分的成績時退回完整重算
+5. PATCH /api/scores/{id}/ 與路線成員完成狀態編輯使用增量計分
+6. 成員總分以差額原子更新，不會蓋掉同時寫入的其他差額
+"""
+import random
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Member, Route, Score, rank_members, update_scores, update_route_scores
+from scoring.tests.test_helpers import TestDataFactory
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room, snapshot
+
+
+class TestCaseIncrementalRouteScoring(TestCase):
+    """測試單一路線的增量計分"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def assert_matches_full_recompute(self, room):
+        """增量計分後的結果應與完整重算完全一致"""
+        incremental = snapshot(room)
+        update_scores(room.id)
+        self.assertEqual(incremental, snapshot(room))
+
+    def toggle(self, score):
+        score.is_completed = not score.is_completed
+        score.save()
+
+    def test_random_toggles_match_full_recompute(self):
+        """測試：連續隨機切換完成狀態，每一步都與完整重算一致"""
+        rng = random.Random(2024)
+        for normal, custom in [(4, 1), (7, 2), (9, 2)]:
+            with self.subTest(normal=normal, custom=custom):
+                room = build_room(f"增量房間{normal}", normal, custom, 8, 0.5, seed=normal)
+                update_scores(room.id)
+                scores = list(Score.objects.filter(route__room=room))
+                for _ in range(25):
+                    score = rng.choice(scores)
+                    score.refresh_from_db()
+                    self.toggle(score)
+                    stats = update_route_scores(score.route_id)
+                    self.assertIsNotNone(stats)
+                    self.assert_matches_full_recompute(room)
+
+    def test_query_count_is_independent_of_route_count(self):
+        """測試：增量計分的查詢次數與房間路線數無關"""
+        select_counts = []
+        for index, route_count in enumerate([5, 40]):
+            room = build_room(f"查詢房間{index}", 6, 1, route_count, 0.5, seed=index)
+            update_scores(room.id)
+            score = Score.objects.filter(route__room=room, member__is_custom_calc=False).first()
+            self.toggle(score)
+            with CaptureQueriesContext(connection) as queries:
+                update_route_scores(score.route_id)
+            # 寫入次數取決於不同分數值/差額的數量（少量且與路線數無關）
+            self.assertLessEqual(len(queries.captured_queries), 14)
+            select_counts.append(
+                sum(1 for q in queries.captured_queries if q['sql'].startswith('SELECT'))
+            )
+        self.assertEqual(select_counts[0], select_counts[1], f"讀取查詢次數應固定，實際為 {select_counts}")
+
+    def test_falls_back_when_line_score_changes(self):
+        """測試：一般組成員數改變導致 L 改變時，退回完整重算"""
+        room = build_room("L 改變房間", 3, 0, 4, 0.5, seed=1)
+        update_scores(room.id)
+        TestDataFactory.create_normal_members(room, count=1, names=["新成員"])
+        route = Route.objects.filter(room=room).first()
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            update_route_scores(route.id)
+        full_recompute.assert_called_once_with(room.id)
+        room.refresh_from_db()
+        self.assertEqual(room.standard_line_score, 12)
+
+    def test_falls_back_when_other_routes_are_stale(self):
+        """測試：其他路線有尚未計分的成績時，退回完整重算"""
+        room = build_room("未計分房間", 4, 0, 3, 0.5, seed=5)
+        update_scores(room.id)
+        members = list(Member.objects.filter(room=room))
+        # 直接建立已完成的成績但未觸發計分
+        TestDataFactory.create_route(
+            room, name="未計分路線", members=members, member_completions={members[0].id: True}
+        )
+        route = Route.objects.filter(room=room).first()
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            update_route_scores(route.id)
+        full_recompute.assert_called_once_with(room.id)
+        self.assert_matches_full_recompute(room)
+
+    def test_no_fallback_for_consistent_room(self):
+        """測試：房間分數一致時不會觸發完整重算"""
+        room = build_room("一致房間", 5, 1, 6, 0.5, seed=9)
+        update_scores(room.id)
+        score = Score.objects.filter(route__room=room).first()
+        self.toggle(score)
+
+        with mock.patch('scoring.models.update_scores') as full_recompute:
+            update_route_scores(score.route_id)
+        full_recompute.assert_not_called()
+        self.assert_matches_full_recompute(room)
+
+    def test_missing_route_is_ignored(self):
+        """測試：路線不存在時不拋出錯誤"""
+        self.assertIsNone(update_route_scores(999999))
+
+    def test_concurrent_delta_is_not_lost(self):
+        """測試：計分期間其他交易寫入的總分差額不會被覆蓋"""
+        room = TestDataFactory.create_room("同時計分房間")
+        m1, m2, m3 = TestDataFactory.create_normal_members(room, count=3)
+        route = TestDataFactory.create_route(room, name="路線A", members=[m1, m2, m3],
+                                             member_completions={m1.id: True})
+        update_scores(room.id)
+        score = Score.objects.get(member=m2, route=route)
+        self.toggle(score)
+
+        def rank_with_concurrent_write(totals):
+            # 模擬另一位裁判在同一時間為 m1 加上另一條路線的 7 分
+            Member.objects.filter(id=m1.id).update(total_score=F('total_score') + Decimal('7.00'))
+            return rank_members(totals)
+
+        with mock.patch('scoring.models.rank_members', side_effect=rank_with_concurrent_write):
+            update_route_scores(route.id)
+
+        # L = 6，兩人完成路線A，每人 3 分
+        m1.refresh_from_db()
+        m2.refresh_from_db()
+        self.assertEqual(m1.total_score, Decimal('10.00'))
+        self.assertEqual(m2.total_score, Decimal('3.00'))
+
+    def test_patch_score_uses_incremental_scoring(self):
+        """測試：PATCH /api/scores/{id}/ 使用增量計分且總分正確"""
+        room = TestDataFactory.create_room("API 房間")
+        m1, m2, m3 = TestDataFactory.create_normal_members(room, count=3)
+        route = TestDataFactory.create_route(room, name="路線A", members=[m1, m2, m3],
+                                             member_completions={m1.id: True})
+        update_scores(room.id)
+        score = Score.objects.get(member=m2, route=route)
+
+        with mock.patch('scoring.models.update_scores') as full_recompute:
+            response = self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full_recompute.assert_not_called()
+
+        # L = LCM(1,2,3) = 6，兩人完成，每人 3 分
+        m1.refresh_from_db()
+        m2.refresh_from_db()
+        m3.refresh_from_db()
+        self.assertEqual(m1.total_score, Decimal('3.00'))
+        self.assertEqual(m2.total_score, Decimal('3.00'))
+        self.assertEqual(m3.total_score, Decimal('0.00'))
+
+    def test_route_member_completions_edit_uses_incremental_scoring(self):
+        """測試：編輯路線的成員完成狀態使用增量計分且結果正確"""
+        room = build_room("路線編輯房間", 4, 1, 5, 0.5, seed=11)
+        update_scores(room.id)
+        route = Route.objects.filter(room=room).first()
+        members = list(Member.objects.filter(room=room))
+        completions = {str(member.id): index % 2 == 0 for index, member in enumerate(members)}
+
+        with mock.patch('scoring.models.update_scores') as full_recompute:
+            response = self.client.patch(
+                f'/api/routes/{route.id}/', {'member_completions': completions}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full_recompute.assert_not_called()
+
+        for member in members:
+            score = Score.objects.get(member=member, route=route)
+            self.assertEqual(score.is_completed, completions[str(member.id)])
+        self.assert_matches_full_recompute(room)
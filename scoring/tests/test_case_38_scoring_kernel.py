@@ -0,0 +1,163 @@
+"""
+計分核心（scoring_kernel）測試
+
+測試項目：
+1. 核心計算結果與逐格 Decimal 計算完全一致（隨機矩陣、含客製化組）
+2. S_r 的整數除法捨入與 Decimal ROUND_HALF_EVEN 量化一致
+3. 邊界情況：空矩陣、沒有人完成、全部為客製化組
+4. 沒有 int.bit_count 的 Python（3.8 / 3.9）使用的 popcount 結果相同
+5. 1000 成員 × 1000 路線的效能基準（毫秒等級）
+"""
+import random
+import time
+from decimal import Decimal, ROUND_HALF_EVEN
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from scoring import scoring_kernel
+from scoring.scoring_kernel import (
+    CompletionMatrix, cents_to_decimal, route_value_cents, score_matrix, standard_line_score_for,
+)
+
+
+def reference_score(completions, custom_mask, line_score):
+    """逐格使用 Decimal 計算（作為結果比對的基準）"""
+    L = Decimal(str(line_score))
+    route_count = len(completions[0]) if completions else 0
+    route_scores = []
+    for route_index in range(route_count):
+        completers = sum(
+            1 for member_index, row in enumerate(completions)
+            if row[route_index] and not custom_mask[member_index]
+        )
+        if completers:
+            route_scores.append((L / Decimal(str(completers))).quantize(Decimal('0.01'), rounding=ROUND_HALF_EVEN))
+        else:
+            route_scores.append(Decimal('0.00'))
+
+    totals = []
+    for member_index, row in enumerate(completions):
+        if custom_mask[member_index]:
+            totals.append(sum(row) * L)
+        else:
+            totals.append(sum((route_scores[j] for j, done in enumerate(row) if done), Decimal('0.00')))
+    return route_scores, totals
+
+
+def random_matrix(rng, member_count, route_count, density, custom_ratio):
+    completions = [[rng.random() < density for _ in range(route_count)] for _ in range(member_count)]
+    custom_mask = [rng.random() < custom_ratio for _ in range(member_count)]
+    return completions, custom_mask
+
+
+class TestCaseScoringKernel(SimpleTestCase):
+    """測試計分核心的正確性"""
+
+    def test_matches_reference_on_random_matrices(self):
+        """測試：隨機矩陣的路線分數與成員總分和逐格 Decimal 計算一致"""
+        rng = random.Random(7)
+        for member_count, route_count in [(1, 1), (3, 5), (7, 12), (8, 9), (13, 30), (40, 64)]:
+            with self.subTest(members=member_count, routes=route_count):
+                completions, custom_mask = random_matrix(rng, member_count, route_count, 0.5, 0.2)
+                matrix = CompletionMatrix.from_lists(completions, custom_mask)
+                result = score_matrix(matrix)
+
+                self.assertEqual(result.line_score, standard_line_score_for(matrix.normal_member_count))
+                route_scores, totals = reference_score(completions, custom_mask, result.line_score)
+                self.assertEqual([cents_to_decimal(c) for c in result.route_cents], route_scores)
+                self.assertEqual([cents_to_decimal(c) for c in result.member_cents], totals)
+                self.assertEqual(result.completed_counts, [sum(row) for row in completions])
+
+    def test_route_completion_counts(self):
+        """測試：P_r 只計算一般組完成人數"""
+        completions = [
+            [True, True, False],
+            [True, False, False],
+            [True, True, True],   # 客製化組
+        ]
+        matrix = CompletionMatrix.from_lists(completions, [False, False, True])
+        self.assertEqual(matrix.route_completion_counts(), [2, 1, 0])
+
+    def test_from_cells_matches_from_lists(self):
+        """測試：以完成格子建立的矩陣與二維列表建立的矩陣相同"""
+        completions = [[False, True, True], [True, False, False]]
+        cells = [(0, 1), (0, 2), (1, 0)]
+        self.assertEqual(
+            CompletionMatrix.from_cells([False, True], 3, cells).rows,
+            CompletionMatrix.from_lists(completions, [False, True]).rows,
+        )
+
+    def test_route_value_rounding_matches_decimal(self):
+        """測試：整數除法的捨入與 Decimal ROUND_HALF_EVEN 一致（含 0.005 的情況）"""
+        for line_score in [1, 2, 6, 12, 60, 420, 1000, 7, 9]:
+            for completers in range(1, 1200):
+                expected = (Decimal(line_score) / Decimal(completers)).quantize(
+                    Decimal('0.01'), rounding=ROUND_HALF_EVEN
+                )
+                self.assertEqual(cents_to_decimal(route_value_cents(line_score, completers)), expected)
+        # 1 / 8 = 0.125 → 0.12；3 / 8 = 0.375 → 0.38
+        self.assertEqual(route_value_cents(1, 8), 12)
+        self.assertEqual(route_value_cents(3, 8), 38)
+        self.assertEqual(route_value_cents(1000, 0), 0)
+
+    def test_edge_cases(self):
+        """測試：空矩陣、沒有人完成、全部為客製化組"""
+        empty = score_matrix(CompletionMatrix([], [], 0))
+        self.assertEqual(empty.line_score, 1)
+        self.assertEqual(empty.member_cents, [])
+
+        nobody = score_matrix(CompletionMatrix([0, 0], [False, False], 4))
+        self.assertEqual(nobody.route_cents, [0, 0, 0, 0])
+        self.assertEqual(nobody.member_cents, [0, 0])
+
+        # 沒有一般組成員時 L = 1，客製化組每完成一條路線得 1 分
+        custom_only = score_matrix(CompletionMatrix([0b111, 0b1], [True, True], 3))
+        self.assertEqual(custom_only.line_score, 1)
+        self.assertEqual(custom_only.member_cents, [300, 100])
+
+    def test_explicit_line_score(self):
+        """測試：可指定 L（例如沿用房間已儲存的值）"""
+        matrix = CompletionMatrix.from_lists([[True], [True]], [False, False])
+        self.assertEqual(score_matrix(matrix, line_score=12).route_cents, [600])
+
+    def test_popcount_fallback(self):
+        """測試：沒有 int.bit_count 時的 popcount 結果相同"""
+        rng = random.Random(11)
+        for value in [0, 1, 2 ** 64 - 1, 2 ** 1000] + [rng.getrandbits(300) for _ in range(50)]:
+            self.assertEqual(scoring_kernel._popcount_fallback(value), bin(value).count('1'))
+
+        completions, custom_mask = random_matrix(rng, 13, 30, 0.5, 0.2)
+        matrix = CompletionMatrix.from_lists(completions, custom_mask)
+        expected = score_matrix(matrix)
+        with mock.patch.object(scoring_kernel, '_popcount', scoring_kernel._popcount_fallback):
+            self.assertEqual(score_matrix(matrix), expected)
+
+    def test_rows_and_mask_length_must_match(self):
+        """測試：rows 與 custom_mask 長度不一致時拋出錯誤"""
+        with self.assertRaises(ValueError):
+            CompletionMatrix([0, 1], [False], 1)
+
+
+class TestCaseScoringKernelBenchmark(SimpleTestCase):
+    """1000 成員 × 1000 路線的效能基準"""
+
+    def test_benchmark_1000_by_1000(self):
+        """基準：1000 × 1000 的完成矩陣應在毫秒等級內完成計算"""
+        rng = random.Random(1000)
+        member_count = route_count = 1000
+        rows = [rng.getrandbits(route_count) for _ in range(member_count)]
+        custom_mask = [index % 10 == 0 for index in range(member_count)]
+        matrix = CompletionMatrix(rows, custom_mask, route_count)
+
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            result = score_matrix(matrix)
+            timings.append(time.perf_counter() - started)
+        best_ms = min(timings) * 1000
+
+        self.assertEqual(len(result.member_cents), member_count)
+        self.assertEqual(result.line_score, 1000)
+        # 在一般的 CI 機器上約 5ms，保留寬鬆的上限避免環境差異造成誤判
+        self.assertLess(best_ms, 500)
@@ -0,0 +1,196 @@
+"""
+合併重算佇列測試
+
+測試項目：
+1. 同一時間窗內對同一房間的多次標記只觸發一次重算
+2. flush 立即重算待重算的房間，沒有標記時不重算
+3. coalesce 模式下多次編輯只在讀取時重算一次，讀取結果為最新總分（包含成員、路線、成績列表）
+4. 其他程序的寫入（本程序沒有待重算標記）或背景重算失敗時，讀取前依資料庫中的版本重算
+5. sync 模式（預設）維持立即重算
+"""
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring import recompute
+from scoring.models import Room, Member, Score, touch_room, update_scores
+from scoring.recompute import RecomputeQueue, request_recompute
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseRecomputeQueue(SimpleTestCase):
+    """測試合併重算佇列本身（不涉及資料庫）"""
+
+    def test_burst_is_coalesced_per_room(self):
+        """測試：時間窗內的多次標記每個房間只重算一次"""
+        calls = []
+        done = threading.Event()
+
+        def runner(room_id):
+            calls.append(room_id)
+            if len(calls) == 2:
+                done.set()
+
+        queue = RecomputeQueue(runner, window=0.05, close_connections=False)
+        for _ in range(20):
+            queue.mark_dirty(1)
+        for _ in range(5):
+            queue.mark_dirty(2)
+
+        self.assertTrue(done.wait(timeout=5), "背景執行緒應在時間窗後重算")
+        time.sleep(0.1)
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertFalse(queue.is_pending(1))
+
+    def test_flush_runs_pending_room_immediately(self):
+        """測試：flush 立即重算，沒有待重算標記時不重算"""
+        runner = mock.Mock()
+        queue = RecomputeQueue(runner, window=60, close_connections=False)
+
+        self.assertFalse(queue.flush(1))
+        queue.mark_dirty(1)
+        queue.mark_dirty(1)
+        self.assertEqual(queue.pending_rooms(), [1])
+        self.assertTrue(queue.flush(1))
+        self.assertFalse(queue.flush(1))
+        runner.assert_called_once_with(1)
+
+    def test_runner_errors_do_not_break_queue(self):
+        """測試：重算失敗時記錄錯誤，佇列仍可繼續使用"""
+        runner = mock.Mock(side_effect=[RuntimeError("boom"), None])
+        queue = RecomputeQueue(runner, window=60, close_connections=False)
+        queue.mark_dirty(3)
+        with self.assertLogs('scoring.recompute', level='ERROR'):
+            queue.flush(3)
+        queue.mark_dirty(3)
+        self.assertTrue(queue.flush(3))
+        self.assertEqual(runner.call_count, 2)
+
+
+class TestCaseCoalescedRecomputeAPI(TestCase):
+    """測試 coalesce 模式下 API 的重算行為"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("合併重算房間")
+        self.m1, self.m2, self.m3 = TestDataFactory.create_normal_members(self.room, count=3)
+        self.routes = [
+            TestDataFactory.create_route(self.room, name=f"路線{i}", members=[self.m1, self.m2, self.m3])
+            for i in range(3)
+        ]
+        update_scores(self.room.id)
+
+        # 每個測試使用獨立的佇列，時間窗設長避免背景執行緒在測試中觸發
+        self.runner = mock.Mock(side_effect=update_scores)
+        self.queue = RecomputeQueue(self.runner, window=60, close_connections=False)
+        patcher = mock.patch.object(recompute, '_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def complete(self, member, route):
+        score = Score.objects.get(member=member, route=route)
+        return self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+
+    @override_settings(SCORING_RECOMPUTE_MODE='coalesce')
+    def test_burst_of_edits_triggers_one_recompute_on_read(self):
+        """測試：多次編輯只在讀取排行榜時重算一次，且結果為最新"""
+        with mock.patch('scoring.models.update_route_scores') as incremental:
+            for route in self.routes:
+                self.assertEqual(self.complete(self.m1, route).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.complete(self.m2, self.routes[0]).status_code, status.HTTP_200_OK)
+        incremental.assert_not_called()
+        self.runner.assert_not_called()
+        self.assertTrue(self.queue.is_pending(self.room.id))
+
+        response = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.runner.assert_called_once_with(self.room.id)
+
+        # L = 6：m1 完成三條（3 + 6 + 6 = 15），m2 完成一條與 m1 共享（3）
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data['leaderboard']}
+        self.assertEqual(totals[self.m1.id], Decimal('15.00'))
+        self.assertEqual(totals[self.m2.id], Decimal('3.00'))
+        self.assertEqual(totals[self.m3.id], Decimal('0.00'))
+
+        # 再次讀取不會重算
+        self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        self.runner.assert_called_once()
+
+    @override_settings(SCORING_RECOMPUTE_MODE='coalesce')
+    def test_member_reads_flush_pending_rooms(self):
+        """測試：讀取成員資料前會完成待重算的房間"""
+        self.complete(self.m3, self.routes[1])
+        response = self.client.get(f'/api/members/{self.m3.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.data['total_score'])), Decimal('6.00'))
+        self.runner.assert_called_once_with(self.room.id)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='coalesce')
+    def test_list_reads_flush_pending_rooms(self):
+        """測試：成員、路線、成績列表讀取前完成待重算的房間（?room= 篩選或未篩選）"""
+        self.complete(self.m3, self.routes[1])
+        response = self.client.get('/api/members/', {'room': self.room.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.runner.assert_called_once_with(self.room.id)
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data}
+        self.assertEqual(totals[self.m3.id], Decimal('6.00'))
+
+        self.complete(self.m2, self.routes[2])
+        self.assertTrue(self.queue.is_pending(self.room.id))
+        for url in ['/api/routes/', '/api/scores/']:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertFalse(self.queue.is_pending(self.room.id))
+        self.assertEqual(self.runner.call_count, 2)
+        self.m2.refresh_from_db()
+        self.assertEqual(self.m2.total_score, Decimal('6.00'))
+
+    @override_settings(SCORING_RECOMPUTE_MODE='coalesce')
+    def test_write_from_other_process_is_refreshed_on_read(self):
+        """測試：其他程序寫入（本程序沒有待重算標記）時，讀取前依版本重算"""
+        Score.objects.filter(member=self.m1, route=self.routes[0]).update(is_completed=True)
+        touch_room(self.room.id)
+        self.assertFalse(self.queue.is_pending(self.room.id))
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+            self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        full_recompute.assert_called_once_with(self.room.id)
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data['leaderboard']}
+        self.assertEqual(totals[self.m1.id], Decimal('6.00'))
+
+    @override_settings(SCORING_RECOMPUTE_MODE='coalesce')
+    def test_failed_recompute_is_retried_on_read(self):
+        """測試：背景重算失敗後房間仍落後，下一次讀取時重算"""
+        self.runner.side_effect = OperationalError('database is locked')
+        self.complete(self.m2, self.routes[1])
+        with self.assertLogs('scoring.recompute', level='ERROR'):
+            response = self.client.get(f'/api/members/{self.m2.id}/')
+        self.runner.assert_called_once_with(self.room.id)
+        self.assertEqual(Decimal(str(response.data['total_score'])), Decimal('6.00'))
+        self.assertFalse(Room.objects.get(id=self.room.id).scores_are_stale)
+
+    def test_sync_mode_recomputes_immediately(self):
+        """測試：sync 模式（預設）每次編輯立即重算，不使用佇列"""
+        self.complete(self.m1, self.routes[0])
+        self.m1.refresh_from_db()
+        self.assertEqual(self.m1.total_score, Decimal('6.00'))
+        self.assertFalse(self.queue.is_pending(self.room.id))
+        self.runner.assert_not_called()
+
+    def test_sync_mode_flushes_leftover_pending_room(self):
+        """測試：從 coalesce 切回 sync 時，寫入前先完成待重算的房間"""
+        with override_settings(SCORING_RECOMPUTE_MODE='coalesce'):
+            request_recompute(self.room.id)
+        Score.objects.filter(member=self.m2, route=self.routes[2]).update(is_completed=True)
+        request_recompute(self.room.id, route_id=self.routes[2].id)
+        self.runner.assert_called_once_with(self.room.id)
+        self.assertEqual(Member.objects.get(id=self.m2.id).total_score, Decimal('6.00'))
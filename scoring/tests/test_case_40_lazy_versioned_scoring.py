@@ -0,0 +1,195 @@
+"""
+延遲計分（版本化）測試
+
+測試項目：
+1. 每次寫入都會遞增房間的 data_version，計分後 scores_version 追上 data_version
+2. lazy 模式下寫入不計分，讀取排行榜/房間詳情/PDF 導出時只在版本落後時重算一次
+3. 只重算讀取的物件所屬的房間；房間列表不重算
+4. 成員、路線、成績列表以 ?room= 篩選時只重算該房間，未篩選時重算所有落後的房間
+5. 增量計分在版本落後超過一個版本時退回完整重算
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Score, update_scores, update_route_scores, touch_room
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseLazyVersionedScoring(TestCase):
+    """測試以資料版本驅動的延遲計分"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("延遲計分房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2)
+        self.route = TestDataFactory.create_route(self.room, name="路線A", members=[self.m1, self.m2])
+        update_scores(self.room.id)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def complete(self, member):
+        score = Score.objects.get(member=member, route=self.route)
+        response = self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sync_mode_keeps_versions_in_step(self):
+        """測試：sync 模式下每次寫入後版本一致"""
+        before = Room.objects.get(id=self.room.id).data_version
+        self.complete(self.m1)
+        self.complete(self.m2)
+        room = Room.objects.get(id=self.room.id)
+        self.assertEqual(room.data_version, before + 2)
+        self.assertEqual(room.scores_version, room.data_version)
+        self.assertFalse(room.scores_are_stale)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_writes_only_bump_version(self):
+        """測試：lazy 模式下寫入只遞增版本，不計分"""
+        with mock.patch('scoring.models.update_scores') as full_recompute, \
+                mock.patch('scoring.models.update_route_scores') as incremental:
+            self.complete(self.m1)
+            self.complete(self.m2)
+        full_recompute.assert_not_called()
+        incremental.assert_not_called()
+
+        room = Room.objects.get(id=self.room.id)
+        self.assertTrue(room.scores_are_stale)
+        self.assertEqual(room.data_version - room.scores_version, 2)
+        self.m1.refresh_from_db()
+        self.assertEqual(self.m1.total_score, Decimal('0.00'))
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_leaderboard_recomputes_only_when_stale(self):
+        """測試：排行榜只在版本落後時重算一次"""
+        self.complete(self.m1)
+        self.complete(self.m2)
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        full_recompute.assert_called_once_with(self.room.id)
+
+        # L = 2，兩人都完成，每人 1 分
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data['leaderboard']}
+        self.assertEqual(totals, {self.m1.id: Decimal('1.00'), self.m2.id: Decimal('1.00')})
+        self.assertFalse(Room.objects.get(id=self.room.id).scores_are_stale)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_retrieve_and_export_pdf_refresh_stale_room(self):
+        """測試：房間詳情與 PDF 導出讀取前會重算落後的房間"""
+        self.complete(self.m1)
+        response = self.client.get(f'/api/rooms/{self.room.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        members = {member['id']: Decimal(str(member['total_score'])) for member in response.data['members']}
+        self.assertEqual(members[self.m1.id], Decimal('2.00'))
+
+        self.complete(self.m2)
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            self.client.get(f'/api/rooms/{self.room.id}/export-pdf/')
+        full_recompute.assert_called_once_with(self.room.id)
+        self.assertFalse(Room.objects.get(id=self.room.id).scores_are_stale)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_reads_refresh_only_own_room(self):
+        """測試：讀取成員、路線、成績時只重算所屬的房間；房間列表不重算"""
+        other = TestDataFactory.create_room("另一個房間")
+        other_member, = TestDataFactory.create_normal_members(other, count=1)
+        TestDataFactory.create_route(other, name="路線B", members=[other_member])
+        update_scores(other.id)
+        self.complete(self.m1)
+        other_score = Score.objects.get(member=other_member)
+        self.client.patch(f'/api/scores/{other_score.id}/', {'is_completed': True}, format='json')
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            self.assertEqual(self.client.get('/api/rooms/').status_code, status.HTTP_200_OK)
+            full_recompute.assert_not_called()
+
+            response = self.client.get(f'/api/members/{self.m1.id}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(Decimal(str(response.data['total_score'])), Decimal('2.00'))
+            full_recompute.assert_called_once_with(self.room.id)
+
+            self.client.get(f'/api/scores/{other_score.id}/')
+            self.client.get(f'/api/routes/{self.route.id}/')
+            self.assertEqual(full_recompute.call_count, 2)
+            full_recompute.assert_called_with(other.id)
+
+            self.assertEqual(self.client.get('/api/members/999999/').status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(full_recompute.call_count, 2)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_filtered_list_refreshes_room(self):
+        """測試：寫入後以 ?room= 讀取成員列表，只重算該房間並返回最新總分"""
+        other = TestDataFactory.create_room("另一個房間")
+        other_member, = TestDataFactory.create_normal_members(other, count=1)
+        TestDataFactory.create_route(other, name="路線B", members=[other_member])
+        update_scores(other.id)
+        self.client.patch(
+            f'/api/scores/{Score.objects.get(member=other_member).id}/', {'is_completed': True}, format='json'
+        )
+        self.complete(self.m1)
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.client.get('/api/members/', {'room': self.room.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full_recompute.assert_called_once_with(self.room.id)
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data}
+        self.assertEqual(totals, {self.m1.id: Decimal('2.00'), self.m2.id: Decimal('0.00')})
+        self.assertTrue(Room.objects.get(id=other.id).scores_are_stale)
+
+        response = self.client.get('/api/scores/', {'room': self.room.id})
+        self.assertEqual(len(response.data), Score.objects.filter(route__room=self.room).count())
+        self.assertEqual(self.client.get('/api/routes/', {'room': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_unfiltered_lists_refresh_all_rooms(self):
+        """測試：未指定房間的列表包含所有房間，讀取前重算所有落後的房間"""
+        other = TestDataFactory.create_room("另一個房間")
+        other_member, = TestDataFactory.create_normal_members(other, count=1)
+        TestDataFactory.create_route(other, name="路線B", members=[other_member])
+        update_scores(other.id)
+        self.client.patch(
+            f'/api/scores/{Score.objects.get(member=other_member).id}/', {'is_completed': True}, format='json'
+        )
+        self.complete(self.m1)
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.client.get('/api/members/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual({call.args[0] for call in full_recompute.call_args_list}, {self.room.id, other.id})
+            totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data}
+            self.assertEqual(totals[self.m1.id], Decimal('2.00'))
+            self.assertEqual(totals[other_member.id], Decimal('1.00'))
+
+            # 已是最新的房間不再重算
+            self.client.get('/api/routes/')
+            self.assertEqual(full_recompute.call_count, 2)
+
+    def test_incremental_scoring_falls_back_when_far_behind(self):
+        """測試：版本落後超過一個版本時，增量計分退回完整重算"""
+        Score.objects.filter(member=self.m1, route=self.route).update(is_completed=True)
+        touch_room(self.room.id)
+        touch_room(self.room.id)
+
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            update_route_scores(self.route.id)
+        full_recompute.assert_called_once_with(self.room.id)
+        self.assertFalse(Room.objects.get(id=self.room.id).scores_are_stale)
+
+    def test_incremental_scoring_stamps_version(self):
+        """測試：只落後一個版本時使用增量計分並推進計分版本"""
+        Score.objects.filter(member=self.m1, route=self.route).update(is_completed=True)
+        touch_room(self.room.id)
+
+        with mock.patch('scoring.models.update_scores') as full_recompute:
+            update_route_scores(self.route.id)
+        full_recompute.assert_not_called()
+        self.assertFalse(Room.objects.get(id=self.room.id).scores_are_stale)
+        self.m1.refresh_from_db()
+        self.assertEqual(self.m1.total_score, Decimal('2.00'))
@@ -0,0 +1,101 @@
+"""
+路線完成人數計數測試
+
+測試項目：
+1. 完整重算後路線計數與成績記錄一致（含客製化組）
+2. 增量計分只更新該路線的計數
+3. 刪除成員、切換組別後計數正確
+4. verify_route_counters 命令檢查與修復計數漂移
+"""
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Member, Route, Score, update_scores, update_route_scores, annotate_route_counters
+from scoring.tests.test_helpers import TestDataFactory
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+class TestCaseRouteCompletionCounters(TestCase):
+    """測試計分引擎維護的路線完成人數計數"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def assert_counters_match(self, room):
+        for route in annotate_route_counters(Route.objects.filter(room=room)):
+            self.assertEqual(route.normal_completers, route.expected_normal_completers, route.name)
+            self.assertEqual(route.custom_completers, route.expected_custom_completers, route.name)
+            self.assertEqual(route.score_count, route.expected_score_count, route.name)
+
+    def test_full_recompute_maintains_counters(self):
+        """測試：完整重算後計數與成績記錄一致"""
+        room = build_room("計數房間", 6, 2, 10, 0.5, seed=21)
+        # 額外建立一條沒有成績記錄的路線
+        Route.objects.create(room=room, name="空路線")
+        update_scores(room.id)
+        self.assert_counters_match(room)
+        self.assertEqual(Route.objects.get(room=room, name="空路線").score_count, 0)
+
+    def test_incremental_scoring_maintains_counters(self):
+        """測試：增量計分後計數與成績記錄一致"""
+        room = build_room("增量計數房間", 5, 1, 6, 0.5, seed=22)
+        update_scores(room.id)
+        rng = random.Random(22)
+        scores = list(Score.objects.filter(route__room=room))
+        for _ in range(15):
+            score = rng.choice(scores)
+            score.refresh_from_db()
+            score.is_completed = not score.is_completed
+            score.save()
+            update_route_scores(score.route_id)
+            self.assert_counters_match(room)
+
+    def test_counters_after_member_changes(self):
+        """測試：成員切換組別與刪除成員後計數正確"""
+        room = TestDataFactory.create_room("成員變動房間")
+        m1, m2 = TestDataFactory.create_normal_members(room, count=2)
+        route = TestDataFactory.create_route(room, members=[m1, m2], member_completions={m1.id: True, m2.id: True})
+        update_scores(room.id)
+        route.refresh_from_db()
+        self.assertEqual((route.normal_completers, route.custom_completers, route.completed_count), (2, 0, 2))
+
+        response = self.client.patch(f'/api/members/{m1.id}/', {'is_custom_calc': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        route.refresh_from_db()
+        self.assertEqual((route.normal_completers, route.custom_completers), (1, 1))
+
+        response = self.client.delete(f'/api/members/{m2.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        route.refresh_from_db()
+        self.assertEqual((route.normal_completers, route.custom_completers, route.score_count), (0, 1, 1))
+
+    def test_verify_command_detects_and_fixes_drift(self):
+        """測試：verify_route_counters 找出漂移並以 --fix 修復"""
+        room = build_room("漂移房間", 4, 1, 5, 0.6, seed=23)
+        update_scores(room.id)
+        drifted = Route.objects.filter(room=room).first()
+        Route.objects.filter(id=drifted.id).update(normal_completers=99, score_count=0)
+
+        out = StringIO()
+        call_command('verify_route_counters', '--room', str(room.id), '--verbose', stdout=out)
+        self.assertIn('1 條路線的計數不一致', out.getvalue())
+        self.assertIn(f'路線 {drifted.id}', out.getvalue())
+        drifted.refresh_from_db()
+        self.assertEqual(drifted.normal_completers, 99, "未指定 --fix 時不應修改資料")
+
+        out = StringIO()
+        call_command('verify_route_counters', '--fix', stdout=out)
+        self.assertIn('已修復 1 條路線的計數', out.getvalue())
+        self.assert_counters_match(room)
+
+        out = StringIO()
+        call_command('verify_route_counters', stdout=out)
+        self.assertIn('所有計數一致', out.getvalue())
@@ -0,0 +1,176 @@
+"""
+批量更新成績 API 測試（POST /api/rooms/{id}/scores/batch/）
+
+測試項目：
+1. 一次更新整條路線、整位成員的完成狀態，結果與完整重算一致
+2. 不存在的成績記錄會被建立（upsert）
+3. 整批只觸發一次計分，返回所有總分或名次有變動的成員（包含請求中沒有的同一路線完成者）
+4. 不屬於此房間的成員/路線、空請求返回 400，且不寫入任何資料
+5. 成員、路線與既有成績的查詢按 UPDATE_BATCH_SIZE 分批（SQLite 的參數上限），結果與不分批時相同
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Member, Room, Score, update_scores, update_route_scores
+from scoring.tests.test_helpers import TestDataFactory
+from scoring.tests.test_case_36_bulk_recompute_engine import snapshot
+
+
+class TestCaseBatchScoreAPI(TestCase):
+    """測試批量更新成績 API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("批量房間")
+        self.m1, self.m2, self.m3 = TestDataFactory.create_normal_members(self.room, count=3)
+        self.custom = TestDataFactory.create_custom_members(self.room, count=1)[0]
+        self.members = [self.m1, self.m2, self.m3, self.custom]
+        self.r1 = TestDataFactory.create_route(self.room, name="路線1", members=self.members)
+        self.r2 = TestDataFactory.create_route(self.room, name="路線2", members=self.members)
+        update_scores(self.room.id)
+        self.url = f'/api/rooms/{self.room.id}/scores/batch/'
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def post(self, changes):
+        return self.client.post(self.url, {'changes': changes}, format='json')
+
+    def test_whole_route_in_one_request(self):
+        """測試：一次錄入整條路線，只計分一次且返回最新總分"""
+        changes = [
+            {'member_id': member.id, 'route_id': self.r1.id, 'is_completed': member != self.m3}
+            for member in self.members
+        ]
+        with mock.patch('scoring.models.update_route_scores', wraps=update_route_scores) as incremental, \
+                mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.post(changes)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incremental.assert_called_once_with(self.r1.id)
+        full_recompute.assert_not_called()
+
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(response.data['unchanged'], 1)
+        # L = 6，兩位一般組完成，每人 3 分；客製化組完成得 L
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data['members']}
+        self.assertEqual(totals, {
+            self.m1.id: Decimal('3.00'),
+            self.m2.id: Decimal('3.00'),
+            self.m3.id: Decimal('0.00'),
+            self.custom.id: Decimal('6.00'),
+        })
+
+    def test_whole_member_card_matches_full_recompute(self):
+        """測試：一次錄入整位成員的多條路線，結果與完整重算一致"""
+        changes = [
+            {'member_id': self.m2.id, 'route_id': self.r1.id, 'is_completed': True},
+            {'member_id': self.m2.id, 'route_id': self.r2.id, 'is_completed': True},
+            {'member_id': self.m1.id, 'route_id': self.r2.id, 'is_completed': True},
+        ]
+        with mock.patch('scoring.models.update_scores', wraps=update_scores) as full_recompute:
+            response = self.post(changes)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full_recompute.assert_called_once_with(self.room.id)
+
+        result = snapshot(self.room)
+        update_scores(self.room.id)
+        self.assertEqual(result, snapshot(self.room))
+        # m3 與客製化組總分不變，但名次從並列第 1 變為第 3，也一併返回
+        self.assertEqual(
+            {member['id'] for member in response.data['members']}, {self.m1.id, self.m2.id, self.m3.id, self.custom.id}
+        )
+
+    def test_missing_scores_are_created(self):
+        """測試：成績記錄不存在時建立（upsert），重複的格子以最後一筆為準"""
+        late = TestDataFactory.create_normal_members(self.room, count=1, names=["晚到成員"])[0]
+        self.assertFalse(Score.objects.filter(member=late).exists())
+        response = self.post([
+            {'member_id': late.id, 'route_id': self.r1.id, 'is_completed': False},
+            {'member_id': late.id, 'route_id': self.r1.id, 'is_completed': True},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertTrue(Score.objects.get(member=late, route=self.r1).is_completed)
+        # L = LCM(1..4) = 12，只有晚到成員完成路線1
+        self.assertEqual(Decimal(str(response.data['members'][0]['total_score'])), Decimal('12.00'))
+
+    def test_other_completers_are_returned(self):
+        """測試：切換一格時，同一路線其他完成者的總分改變，也出現在回應中"""
+        self.post([{'member_id': self.m1.id, 'route_id': self.r1.id, 'is_completed': True}])
+        response = self.post([{'member_id': self.m2.id, 'route_id': self.r1.id, 'is_completed': True}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # L = 6：m1 從獨得 6 分變為與 m2 各得 3 分
+        totals = {member['id']: Decimal(str(member['total_score'])) for member in response.data['members']}
+        self.assertEqual(totals[self.m1.id], Decimal('3.00'))
+        self.assertEqual(totals[self.m2.id], Decimal('3.00'))
+        # 回應與資料庫中的最新總分一致
+        for member in Member.objects.filter(id__in=totals):
+            self.assertEqual(member.total_score, totals[member.id])
+
+    def test_no_changes_skip_recompute(self):
+        """測試：所有格子都沒有變動時不觸發計分"""
+        with mock.patch('scoring.recompute.request_recompute') as recompute_call, \
+                mock.patch('scoring.views.request_recompute') as view_recompute:
+            response = self.post([{'member_id': self.m1.id, 'route_id': self.r1.id, 'is_completed': False}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unchanged'], 1)
+        view_recompute.assert_not_called()
+        recompute_call.assert_not_called()
+
+    @mock.patch('scoring.models.UPDATE_BATCH_SIZE', 2)
+    def test_lookups_are_batched(self):
+        """測試：成員、路線與既有成績的查詢分批執行，建立與更新的結果與完整重算一致"""
+        late = TestDataFactory.create_normal_members(self.room, count=1, names=["晚到成員"])[0]
+        changes = [
+            {'member_id': member.id, 'route_id': route.id, 'is_completed': member != self.m3}
+            for member in self.members + [late] for route in (self.r1, self.r2)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(changes)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['updated'], 6)
+        self.assertEqual(response.data['unchanged'], 2)
+        # 5 位成員每批 2 個：既有成績的查詢分為 3 批
+        score_lookups = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "scoring_score"' in q['sql']
+            and '"scoring_score"."member_id" IN' in q['sql']
+        ]
+        self.assertEqual(len(score_lookups), 3)
+
+        result = snapshot(self.room)
+        update_scores(self.room.id)
+        self.assertEqual(result, snapshot(self.room))
+
+        other = TestDataFactory.create_room("其他房間")
+        outsider = TestDataFactory.create_normal_members(other, count=1)[0]
+        response = self.post(changes + [{'member_id': outsider.id, 'route_id': self.r1.id, 'is_completed': True}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_foreign_members_and_routes(self):
+        """測試：其他房間的成員或路線返回 400，且不寫入任何資料"""
+        other = TestDataFactory.create_room("其他房間")
+        outsider = TestDataFactory.create_normal_members(other, count=1)[0]
+        other_route = TestDataFactory.create_route(other, members=[outsider])
+
+        response = self.post([
+            {'member_id': self.m1.id, 'route_id': self.r1.id, 'is_completed': True},
+            {'member_id': outsider.id, 'route_id': other_route.id, 'is_completed': True},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('changes', response.data)
+        self.assertFalse(Score.objects.get(member=self.m1, route=self.r1).is_completed)
+
+    def test_rejects_empty_or_malformed_payload(self):
+        """測試：空列表或格式錯誤返回 400"""
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post([{'member_id': self.m1.id, 'is_completed': True}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,79 @@
+"""
+rescore_rooms 管理命令測試
+
+測試項目：
+1. 重算所有房間，結果與逐一呼叫 update_scores 相同
+2. --room、--stale-only 篩選房間
+3. 輸出進度、吞吐量與每個房間的耗時
+4. 記憶體 SQLite 資料庫自動改為單一程序執行
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from scoring.models import Room, Member, Score, update_scores, touch_room
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room, snapshot
+
+
+class TestCaseRescoreRoomsCommand(TestCase):
+    """測試批量重算房間命令"""
+
+    def setUp(self):
+        self.rooms = [build_room(f"歷史房間{i}", 4 + i, 1, 6, 0.5, seed=i) for i in range(3)]
+        self.expected = []
+        for room in self.rooms:
+            update_scores(room.id)
+            self.expected.append(snapshot(room))
+        # 模擬計分規則變更前的舊資料
+        Score.objects.update(score_attained=Decimal('0.00'))
+        Member.objects.update(total_score=Decimal('0.00'))
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def rescore(self, *args):
+        out = StringIO()
+        call_command('rescore_rooms', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rescores_every_room(self):
+        """測試：重算所有房間，結果與 update_scores 相同，並輸出吞吐量"""
+        output = self.rescore('--verbose')
+        for room, expected in zip(self.rooms, self.expected):
+            self.assertEqual(snapshot(room), expected)
+        self.assertIn('進度: 3/3', output)
+        self.assertIn('3 個房間成功，0 個失敗', output)
+        self.assertIn('房間/s', output)
+        self.assertIn('成績/s', output)
+        self.assertIn(f'房間 {self.rooms[0].id}: ', output)
+
+    def test_room_filter(self):
+        """測試：--room 只重算指定房間"""
+        self.rescore('--room', str(self.rooms[1].id))
+        self.assertEqual(snapshot(self.rooms[1]), self.expected[1])
+        self.assertNotEqual(snapshot(self.rooms[0]), self.expected[0])
+
+    def test_stale_only_filter(self):
+        """測試：--stale-only 只重算版本落後的房間"""
+        touch_room(self.rooms[2].id)
+        output = self.rescore('--stale-only')
+        self.assertIn('開始重算 1 個房間', output)
+        self.assertEqual(snapshot(self.rooms[2]), self.expected[2])
+        self.assertIn('沒有需要重算的房間', self.rescore('--stale-only'))
+
+    def test_in_memory_database_falls_back_to_single_process(self):
+        """測試：記憶體 SQLite 資料庫無法跨程序共用，自動改為單一程序"""
+        out = StringIO()
+        call_command('rescore_rooms', '--workers', '4', stdout=out)
+        self.assertIn('改為單一程序執行', out.getvalue())
+        self.assertIn('1 個 worker', out.getvalue())
+        for room, expected in zip(self.rooms, self.expected):
+            self.assertEqual(snapshot(room), expected)
+
+    def test_invalid_worker_count(self):
+        """測試：worker 數小於 1 時報錯"""
+        with self.assertRaises(CommandError):
+            call_command('rescore_rooms', '--workers', '0', stdout=StringIO())
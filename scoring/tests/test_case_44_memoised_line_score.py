@@ -0,0 +1,75 @@
+"""
+L 與路線分數表的預先計算測試
+
+測試項目：
+1. 預先計算的 L 表與 1 到 n 的最小公倍數一致，8 人以上固定為 1000
+2. 路線分數表與逐一計算的結果一致，且在程序內共用
+3. 重算時一般組人數取自已載入的成員，不再執行額外的 COUNT / EXISTS 查詢
+"""
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from scoring.models import Room, Score, update_scores, update_route_scores
+from scoring.scoring_kernel import (
+    STANDARD_LINE_SCORES, lcm_of_list, route_value_cents, route_value_table, standard_line_score_for,
+)
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+class TestCaseLineScoreTables(SimpleTestCase):
+    """測試預先計算的 L 表與路線分數表"""
+
+    def test_standard_line_score_table(self):
+        """測試：L 表與最小公倍數一致"""
+        self.assertEqual(STANDARD_LINE_SCORES, (1, 1, 2, 6, 12, 60, 60, 420))
+        for member_count in range(1, 8):
+            self.assertEqual(standard_line_score_for(member_count), lcm_of_list(list(range(1, member_count + 1))))
+        for member_count in (8, 9, 50, 1000):
+            self.assertEqual(standard_line_score_for(member_count), 1000)
+        self.assertEqual(standard_line_score_for(0), 1)
+        self.assertEqual(standard_line_score_for(-1), 1)
+
+    def test_route_value_table(self):
+        """測試：路線分數表與逐一計算一致，相同的 (L, 人數) 共用同一張表"""
+        table = route_value_table(420, 7)
+        self.assertEqual(table, tuple(route_value_cents(420, count) for count in range(8)))
+        self.assertEqual(table[0], 0)
+        self.assertEqual(table[7], 6000)
+        self.assertIs(route_value_table(420, 7), table)
+
+
+class TestCaseLineScoreQueries(TestCase):
+    """測試重算不再為一般組人數執行額外查詢"""
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_full_recompute_has_no_member_count_query(self):
+        """測試：完整重算時不執行成員的 COUNT / EXISTS 查詢"""
+        room = build_room("查表房間", 5, 1, 6, 0.5, seed=31)
+        with CaptureQueriesContext(connection) as queries:
+            update_scores(room.id)
+        member_table = Room.members.rel.related_model._meta.db_table
+        for query in queries.captured_queries:
+            if member_table in query['sql'] and query['sql'].startswith('SELECT'):
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('LIMIT 1', query['sql'])
+        room.refresh_from_db()
+        self.assertEqual(room.standard_line_score, 60)
+
+    def test_incremental_scoring_reads_member_count_with_route(self):
+        """測試：增量計分的一般組人數與路線資訊在同一個查詢中取得"""
+        room = build_room("查表增量房間", 4, 1, 4, 0.5, seed=32)
+        update_scores(room.id)
+        score = Score.objects.filter(route__room=room).first()
+        score.is_completed = not score.is_completed
+        score.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            update_route_scores(score.route_id)
+        standalone_counts = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT COUNT(')
+        ]
+        self.assertEqual(standalone_counts, [])
@@ -0,0 +1,120 @@
+"""
+計分效能基準測試
+
+測試項目：
+1. 合成房間依情境建立成員、路線與成績，並完成計分
+2. 基準結果包含每個項目的耗時、查詢數與峰值記憶體，合成資料在結束後回滾
+3. 比較兩份結果時，查詢數增加或耗時超過門檻視為退步
+4. benchmark_scoring 命令輸出表格並寫入 JSON 檔案
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, SimpleTestCase
+
+from scoring.benchmark import Scenario, TARGETS, build_synthetic_room, compare_reports, run_benchmarks
+from scoring.models import Room, Member, Route, Score
+
+
+TINY = Scenario('tiny', 3, 1, 4, 0.5, 7)
+
+
+class TestCaseSyntheticRoom(TestCase):
+    """測試合成房間與基準執行"""
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_build_synthetic_room(self):
+        """測試：合成房間的成員、路線與成績數量符合情境，且分數已計算"""
+        with transaction.atomic():
+            room = build_synthetic_room(Scenario('eight', 8, 2, 5, 1.0, 1))
+            self.assertEqual(Member.objects.filter(room=room, is_custom_calc=False).count(), 8)
+            self.assertEqual(Member.objects.filter(room=room, is_custom_calc=True).count(), 2)
+            self.assertEqual(Route.objects.filter(room=room).count(), 5)
+            self.assertEqual(Score.objects.filter(route__room=room).count(), 50)
+            room.refresh_from_db()
+            self.assertEqual(room.standard_line_score, 1000)
+            # 密度 1.0：所有人完成所有路線，一般組每條路線 1000 / 8 = 125 分
+            member = Member.objects.get(room=room, name='一般0')
+            self.assertEqual(member.total_score, 625)
+
+    def test_run_benchmarks_report(self):
+        """測試：結果包含每個項目的量測值，合成資料回滾"""
+        report = run_benchmarks([TINY], repeat=1)
+        self.assertEqual(report['meta']['repeat'], 1)
+        self.assertIn('database', report['meta'])
+        self.assertEqual(len(report['scenarios']), 1)
+
+        result = report['scenarios'][0]
+        self.assertEqual(result['scenario']['name'], 'tiny')
+        self.assertEqual(result['scores'], 16)
+        self.assertEqual(set(result['results']), set(TARGETS))
+        for target, metrics in result['results'].items():
+            if 'skipped' in metrics:
+                continue
+            self.assertGreaterEqual(metrics['wall_ms_median'], metrics['wall_ms_min'])
+            self.assertGreater(metrics['queries'], 0)
+            self.assertGreaterEqual(metrics['peak_memory_kb'], 0)
+
+        # 可以序列化為 JSON
+        json.dumps(report, ensure_ascii=False)
+        self.assertFalse(Room.objects.exists())
+
+
+class TestCaseCompareReports(SimpleTestCase):
+    """測試基準結果比較"""
+
+    def make_report(self, wall_ms, queries):
+        return {'scenarios': [{
+            'scenario': {'name': 'tiny'},
+            'results': {
+                'leaderboard': {'wall_ms_min': wall_ms, 'wall_ms_median': wall_ms,
+                                'queries': queries, 'peak_memory_kb': 1.0},
+                'export_pdf': {'skipped': 'reportlab 未安裝'},
+            },
+        }]}
+
+    def test_no_regression(self):
+        """測試：耗時在門檻內且查詢數未增加時沒有退步"""
+        self.assertEqual(compare_reports(self.make_report(10, 5), self.make_report(11, 5)), [])
+
+    def test_query_and_time_regressions(self):
+        """測試：查詢數增加與耗時超過門檻都列為退步"""
+        regressions = compare_reports(self.make_report(10, 5), self.make_report(20, 6), threshold=0.2)
+        self.assertEqual({item['metric'] for item in regressions}, {'queries', 'wall_ms_median'})
+
+    def test_unknown_scenario_is_ignored(self):
+        """測試：基準中沒有的情境不比較"""
+        self.assertEqual(compare_reports({'scenarios': []}, self.make_report(20, 6)), [])
+
+
+class TestCaseBenchmarkCommand(TestCase):
+    """測試 benchmark_scoring 命令"""
+
+    def test_command_writes_report(self):
+        """測試：命令輸出表格並寫入 JSON，與自己比較時門檻足夠寬鬆則沒有查詢數退步"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            out = StringIO()
+            call_command('benchmark_scoring', '--scenario', 'quick_7', '--repeat', '1', '--output', path, stdout=out)
+            self.assertIn('quick_7', out.getvalue())
+            self.assertIn('update_scores', out.getvalue())
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+            self.assertEqual(report['scenarios'][0]['scenario']['name'], 'quick_7')
+
+            out = StringIO()
+            call_command('benchmark_scoring', '--scenario', 'quick_7', '--repeat', '1',
+                         '--compare', path, '--threshold', '1000', stdout=out)
+            self.assertIn('沒有退步', out.getvalue())
+
+    def test_unknown_scenario(self):
+        """測試：未知的情境名稱報錯"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_scoring', '--scenario', 'missing', stdout=StringIO())
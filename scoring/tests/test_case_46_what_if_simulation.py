@@ -0,0 +1,188 @@
+"""
+假設完成模擬 API 測試（GET/POST /api/rooms/{id}/simulate/）
+
+測試項目：
+1. 模擬結果與實際寫入相同變更後 update_scores 的總分一致
+2. 返回名次變化（同分同名次）與分數有變化的路線
+3. 模擬只讀取資料庫，不寫入任何資料，也不呼叫 update_scores
+4. GET 形式（?flip=成員:路線[:1|0]）、切換目前狀態、錯誤格式與其他房間的成員返回 400
+5. 100 × 100 的房間以固定次數的查詢完成模擬
+"""
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Member, Score, update_scores
+from scoring.scoring_kernel import competition_ranks
+from scoring.simulation import load_room_snapshot, simulate_completions
+from scoring.tests.test_helpers import TestDataFactory
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+class TestCaseCompetitionRanks(SimpleTestCase):
+    """測試名次計算"""
+
+    def test_ties_share_rank(self):
+        """測試：同分同名次，下一個名次跳過並列人數"""
+        self.assertEqual(competition_ranks([30, 20, 20, 10]), [1, 2, 2, 4])
+        self.assertEqual(competition_ranks([5, 5, 5]), [1, 1, 1])
+        self.assertEqual(competition_ranks([]), [])
+
+
+class TestCaseWhatIfSimulation(TestCase):
+    """測試假設完成模擬 API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("模擬房間")
+        self.m1, self.m2, self.m3 = TestDataFactory.create_normal_members(self.room, count=3)
+        self.custom = TestDataFactory.create_custom_members(self.room, count=1)[0]
+        self.members = [self.m1, self.m2, self.m3, self.custom]
+        self.r1 = TestDataFactory.create_route(self.room, name="路線1", members=self.members)
+        self.r2 = TestDataFactory.create_route(self.room, name="路線2", members=self.members)
+        Score.objects.filter(member=self.m1).update(is_completed=True)
+        Score.objects.filter(member=self.m2, route=self.r1).update(is_completed=True)
+        update_scores(self.room.id)
+        self.url = f'/api/rooms/{self.room.id}/simulate/'
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def post(self, flips):
+        return self.client.post(self.url, {'flips': flips}, format='json')
+
+    def by_member(self, response):
+        return {entry['id']: entry for entry in response.data['leaderboard']}
+
+    def test_matches_real_recompute(self):
+        """測試：模擬的總分與實際寫入後重算的總分一致"""
+        flips = [
+            {'member_id': self.m3.id, 'route_id': self.r2.id, 'is_completed': True},
+            {'member_id': self.custom.id, 'route_id': self.r1.id, 'is_completed': True},
+            {'member_id': self.m1.id, 'route_id': self.r1.id, 'is_completed': False},
+        ]
+        response = self.post(flips)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        simulated = {member_id: Decimal(entry['total_score']) for member_id, entry in self.by_member(response).items()}
+
+        for flip in flips:
+            Score.objects.filter(member_id=flip['member_id'], route_id=flip['route_id']).update(
+                is_completed=flip['is_completed']
+            )
+        update_scores(self.room.id)
+        actual = dict(Member.objects.filter(room=self.room).values_list('id', 'total_score'))
+        self.assertEqual(simulated, actual)
+
+    def test_rank_changes(self):
+        """測試：返回名次變化與分數有變化的路線"""
+        # 目前：m1 完成兩條（6 + 3 = 9 分，L = 6），m2 完成路線1（3 分），m3 0 分
+        # 假設 m3 完成路線2、m1 沒完成路線2：路線2 由 m3 獨得 6 分
+        response = self.post([
+            {'member_id': self.m3.id, 'route_id': self.r2.id, 'is_completed': True},
+            {'member_id': self.m1.id, 'route_id': self.r2.id, 'is_completed': False},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        leaderboard = self.by_member(response)
+        self.assertEqual(leaderboard[self.m3.id]['rank'], 1)
+        # 原本 m3 與客製化組同為 0 分，並列第 3 名
+        self.assertEqual(leaderboard[self.m3.id]['previous_rank'], 3)
+        self.assertEqual(leaderboard[self.m3.id]['rank_change'], 2)
+        self.assertEqual(leaderboard[self.m3.id]['score_change'], '6.00')
+        self.assertEqual(leaderboard[self.m1.id]['total_score'], '3.00')
+        self.assertEqual(leaderboard[self.m1.id]['previous_total_score'], '9.00')
+        # m1 與 m2 同為 3 分，同名次
+        self.assertEqual(leaderboard[self.m1.id]['rank'], leaderboard[self.m2.id]['rank'])
+        # 路線2 的完成人數前後都是 1 人，分數不變
+        self.assertEqual(response.data['routes'], [])
+
+    def test_changed_routes(self):
+        """測試：完成人數有變化的路線列出前後分數"""
+        response = self.post([{'member_id': self.m3.id, 'route_id': self.r1.id, 'is_completed': True}])
+        self.assertEqual(response.data['routes'], [{
+            'route_id': self.r1.id, 'completers': 3, 'previous_completers': 2,
+            'score': '2.00', 'previous_score': '3.00',
+        }])
+
+    def test_no_writes(self):
+        """測試：模擬不寫入資料庫，也不呼叫 update_scores"""
+        self.room.refresh_from_db()
+        data_version = self.room.data_version
+        before = list(Score.objects.filter(route__room=self.room).values_list('id', 'is_completed', 'score_attained'))
+        with mock.patch('scoring.models.update_scores') as full_recompute, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.post([{'member_id': self.m3.id, 'route_id': self.r1.id, 'is_completed': True}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full_recompute.assert_not_called()
+        for query in queries.captured_queries:
+            self.assertTrue(query['sql'].startswith('SELECT'), query['sql'])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.data_version, data_version)
+        self.assertEqual(
+            list(Score.objects.filter(route__room=self.room).values_list('id', 'is_completed', 'score_attained')),
+            before
+        )
+
+    def test_get_with_toggle(self):
+        """測試：GET 形式，省略完成狀態時切換目前狀態，同一格重複出現以最後一筆為準"""
+        response = self.client.get(self.url, {'flip': [f'{self.m1.id}:{self.r2.id}']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['flips'], [
+            {'member_id': self.m1.id, 'route_id': self.r2.id, 'is_completed': False},
+        ])
+        self.assertEqual(self.by_member(response)[self.m1.id]['total_score'], '3.00')
+
+        # 切換兩次等於沒有變化
+        response = self.client.get(self.url, {'flip': [f'{self.m3.id}:{self.r1.id}'] * 2})
+        self.assertEqual(response.data['flips'][0]['is_completed'], False)
+        self.assertTrue(all(entry['rank_change'] == 0 for entry in response.data['leaderboard']))
+
+        response = self.client.get(self.url, {'flip': f'{self.m3.id}:{self.r1.id}:1'})
+        self.assertEqual(response.data['flips'][0]['is_completed'], True)
+
+        # 沒有假設時返回目前的排行榜
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.by_member(response)[self.m1.id]['total_score'], '9.00')
+
+    def test_invalid_requests(self):
+        """測試：格式錯誤、其他房間的成員返回 400，不存在的房間返回 404"""
+        self.assertEqual(self.client.get(self.url, {'flip': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = TestDataFactory.create_room("其他房間")
+        outsider = TestDataFactory.create_normal_members(other, count=1)[0]
+        response = self.post([{'member_id': outsider.id, 'route_id': self.r1.id, 'is_completed': True}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('flips', response.data)
+
+        self.assertEqual(self.client.get('/api/rooms/999999/simulate/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestCaseSimulationScale(TestCase):
+    """測試大房間的模擬效能"""
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_large_room_constant_queries(self):
+        """測試：100 × 100 房間的模擬以固定次數的查詢完成，記憶體計算部分遠低於 50ms"""
+        room = build_room("模擬大房間", 95, 5, 100, 0.5, seed=46)
+        update_scores(room.id)
+        members = list(Member.objects.filter(room=room).values_list('id', flat=True)[:10])
+        route = room.routes.first()
+        flips = [{'member_id': member_id, 'route_id': route.id, 'is_completed': None} for member_id in members]
+
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = load_room_snapshot(room.id)
+        self.assertLessEqual(len(queries.captured_queries), 4)
+
+        started = time.perf_counter()
+        result = simulate_completions(snapshot, flips)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(result['leaderboard']), 100)
+        self.assertLess(elapsed, 0.05)
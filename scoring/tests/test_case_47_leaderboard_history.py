@@ -0,0 +1,196 @@
+"""
+排行榜歷史測試
+
+測試項目：
+1. 第一次重算寫入完整檢查點，之後只記錄總分或名次有變動的成員，沒有變動時不寫入
+2. 每累積 N 筆差異寫入一次檢查點，查詢任一時間點以單一查詢完成
+3. 任一時間點重建的排名與當時的總分一致（完整重算與增量計分都會記錄）
+4. 刪除的成員從之後的排名中移除
+5. 歷史排行榜與成員名次變化 API，錯誤的時間格式返回 400
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.history import member_rank_series, rank_standings, standings_as_of
+from scoring.models import Room, Member, Score, LeaderboardSnapshot, update_scores, update_route_scores
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseLeaderboardHistory(TestCase):
+    """測試排行榜歷史的記錄與重建"""
+
+    def setUp(self):
+        self.room = TestDataFactory.create_room("歷史房間")
+        self.m1, self.m2, self.m3 = TestDataFactory.create_normal_members(self.room, count=3)
+        self.members = [self.m1, self.m2, self.m3]
+        self.r1 = TestDataFactory.create_route(self.room, name="路線1", members=self.members)
+        self.r2 = TestDataFactory.create_route(self.room, name="路線2", members=self.members)
+        self.base = timezone.now() - timedelta(days=1)
+        self.step = 0
+        self.expected = []
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def history(self):
+        return list(LeaderboardSnapshot.objects.filter(room=self.room).order_by('id'))
+
+    def current_standings(self):
+        totals = {
+            member_id: int(total * 100)
+            for member_id, total in Member.objects.filter(room=self.room).values_list('id', 'total_score')
+        }
+        return rank_standings(totals)
+
+    def complete(self, member, route, is_completed=True, incremental=False):
+        """改變一格完成狀態並重算，將新的歷史記錄標記為下一個時間點"""
+        Score.objects.filter(member=member, route=route).update(is_completed=is_completed)
+        if incremental:
+            update_route_scores(route.id)
+        else:
+            update_scores(self.room.id)
+        self.step += 1
+        moment = self.base + timedelta(minutes=self.step)
+        LeaderboardSnapshot.objects.filter(room=self.room, created_at__gt=self.base + timedelta(hours=2)).update(
+            created_at=moment
+        )
+        self.expected.append((moment, self.current_standings()))
+
+    def test_checkpoint_then_deltas(self):
+        """測試：第一次寫入檢查點，之後只記錄變動的成員，沒有變動時不寫入"""
+        update_scores(self.room.id)
+        history = self.history()
+        self.assertEqual(len(history), 1)
+        self.assertTrue(history[0].is_checkpoint)
+        self.assertEqual(len(history[0].standings), 3)
+
+        update_scores(self.room.id)
+        self.assertEqual(len(self.history()), 1)
+
+        # m1 完成路線1：m1 的總分與名次改變，m2、m3 的名次由並列第 1 變為並列第 2
+        Score.objects.filter(member=self.m1, route=self.r1).update(is_completed=True)
+        update_scores(self.room.id)
+        delta = self.history()[-1]
+        self.assertFalse(delta.is_checkpoint)
+        self.assertEqual(delta.standings, {
+            str(self.m1.id): [600, 1], str(self.m2.id): [0, 2], str(self.m3.id): [0, 2],
+        })
+
+        # m2 完成路線2：m2 與 m1 並列第 1，m3 掉到第 3；總分與名次都不變的 m1 不記錄
+        Score.objects.filter(member=self.m2, route=self.r2).update(is_completed=True)
+        update_scores(self.room.id)
+        self.assertEqual(self.history()[-1].standings, {str(self.m2.id): [600, 1], str(self.m3.id): [0, 3]})
+
+    @override_settings(SCORING_HISTORY_CHECKPOINT_INTERVAL=2)
+    def test_periodic_checkpoints_and_reconstruction(self):
+        """測試：每 N 筆差異寫入檢查點，任一時間點的重建結果與當時的總分一致"""
+        update_scores(self.room.id)
+        LeaderboardSnapshot.objects.update(created_at=self.base)
+        self.expected.append((self.base, self.current_standings()))
+
+        self.complete(self.m1, self.r1)
+        self.complete(self.m2, self.r1, incremental=True)
+        self.complete(self.m3, self.r2)
+        self.complete(self.m1, self.r1, False, incremental=True)
+        self.complete(self.m2, self.r2)
+
+        kinds = [snapshot.is_checkpoint for snapshot in self.history()]
+        self.assertEqual(kinds, [True, False, False, True, False, False])
+
+        for moment, expected in self.expected:
+            with CaptureQueriesContext(connection) as queries:
+                standings, record = standings_as_of(self.room.id, moment + timedelta(seconds=30))
+            self.assertEqual(len(queries.captured_queries), 1)
+            self.assertEqual(standings, expected)
+            self.assertEqual(record['created_at'], moment)
+
+        # 早於第一筆記錄的時間點沒有排名
+        self.assertEqual(standings_as_of(self.room.id, self.base - timedelta(minutes=1)), ({}, None))
+
+    def test_incremental_scoring_matches_full_recompute(self):
+        """測試：增量計分記錄的排名與完整重算的結果相同"""
+        update_scores(self.room.id)
+        self.complete(self.m1, self.r1, incremental=True)
+        self.complete(self.m2, self.r1, incremental=True)
+        standings, _ = standings_as_of(self.room.id, timezone.now())
+        self.assertEqual(standings, self.current_standings())
+
+    def test_deleted_member_is_removed(self):
+        """測試：刪除的成員從之後的排名中移除"""
+        Score.objects.filter(member=self.m3, route=self.r1).update(is_completed=True)
+        update_scores(self.room.id)
+        deleted_id = self.m3.id
+        self.m3.delete()
+        update_scores(self.room.id)
+        self.assertIsNone(self.history()[-1].standings[str(deleted_id)])
+        standings, _ = standings_as_of(self.room.id, timezone.now())
+        self.assertEqual(set(standings), {self.m1.id, self.m2.id})
+
+    def test_member_rank_series(self):
+        """測試：成員名次變化只包含有變動的時間點"""
+        update_scores(self.room.id)
+        LeaderboardSnapshot.objects.update(created_at=self.base)
+        self.complete(self.m1, self.r1)       # m2 掉到第 2 名
+        self.complete(self.m1, self.r2)       # m2 不變（仍為 0 分第 2 名），不產生新的時間點
+        self.complete(self.m2, self.r2)       # m2 得到路線2 的一半分數，仍為第 2 名
+
+        series = member_rank_series(self.room.id, self.m2.id)
+        self.assertEqual([(point['rank'], point['total']) for point in series], [(1, 0), (2, 0), (2, 300)])
+        self.assertEqual(series[0]['timestamp'], self.base)
+
+        since = member_rank_series(self.room.id, self.m2.id, since=self.base + timedelta(minutes=2))
+        self.assertEqual([(point['rank'], point['total']) for point in since], [(2, 0), (2, 300)])
+        self.assertEqual(since[0]['timestamp'], self.base + timedelta(minutes=2))
+
+
+class TestCaseLeaderboardHistoryAPI(TestCase):
+    """測試排行榜歷史 API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("歷史 API 房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2, names=["甲", "乙"])
+        self.route = TestDataFactory.create_route(self.room, members=[self.m1, self.m2])
+        update_scores(self.room.id)
+        self.before = timezone.now()
+        LeaderboardSnapshot.objects.update(created_at=self.before - timedelta(minutes=1))
+        Score.objects.filter(member=self.m2).update(is_completed=True)
+        update_scores(self.room.id)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_leaderboard_as_of(self):
+        """測試：指定時間點與目前的歷史排行榜"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/history/', {'at': self.before.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(entry['name'], entry['rank'], entry['total_score']) for entry in response.data['leaderboard']],
+            [("乙", 1, '0.00'), ("甲", 1, '0.00')]
+        )
+
+        response = self.client.get(f'/api/rooms/{self.room.id}/history/')
+        self.assertEqual(
+            [(entry['name'], entry['rank'], entry['total_score']) for entry in response.data['leaderboard']],
+            [("乙", 1, '2.00'), ("甲", 2, '0.00')]
+        )
+
+    def test_member_rank_history(self):
+        """測試：成員名次變化 API"""
+        response = self.client.get(f'/api/members/{self.m1.id}/rank-history/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([point['rank'] for point in response.data['series']], [1, 2])
+        self.assertEqual(response.data['member_name'], "甲")
+
+    def test_invalid_timestamp(self):
+        """測試：錯誤的時間格式返回 400"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/history/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/api/members/{self.m1.id}/rank-history/', {'since': '2024-13-40'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
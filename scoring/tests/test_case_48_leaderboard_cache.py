@@ -0,0 +1,172 @@
+"""
+排行榜快取測試
+
+測試項目：
+1. 第二次讀取排行榜命中快取，只查詢房間版本，不載入成員
+2. 透過 API 修改成績後返回新的排行榜（data_version 改變）
+3. 不經過 API 直接修改 Member / Route / Score 時由訊號使快取失效
+4. 分數尚未重算到最新版本時不寫入快取
+5. 同時未命中時只有一個請求重建，其他請求等待重建結果
+6. 刪除成績記錄後重新計分
+7. 修改時立即失效、提交後再失效一次；重複使用的房間 ID 不會讀到舊的快取
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.cache import get_or_build, get_room_generation
+from scoring.models import Room, Member, Score, touch_room, update_scores
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseLeaderboardCache(TestCase):
+    """測試排行榜 API 的快取與失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("快取房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2, names=["甲", "乙"])
+        self.route = TestDataFactory.create_route(self.room, members=[self.m1, self.m2])
+        update_scores(self.room.id)
+        self.url = f'/api/rooms/{self.room.id}/leaderboard/'
+
+    def tearDown(self):
+        Room.objects.all().delete()
+        cache.clear()
+
+    def get_leaderboard(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def member_queries(self, queries):
+        member_table = Member._meta.db_table
+        return [q['sql'] for q in queries.captured_queries if f'FROM "{member_table}"' in q['sql']]
+
+    def test_second_read_hits_cache(self):
+        """測試：第二次讀取不查詢成員"""
+        first = self.get_leaderboard()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get_leaderboard()
+        self.assertEqual(first, second)
+        self.assertEqual(self.member_queries(queries), [])
+
+    def test_api_write_returns_new_leaderboard(self):
+        """測試：透過 API 修改成績後返回新的總分"""
+        self.get_leaderboard()
+        score = Score.objects.get(member=self.m1, route=self.route)
+        response = self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        leaderboard = self.get_leaderboard()['leaderboard']
+        self.assertEqual(leaderboard[0]['name'], "甲")
+        self.assertEqual(Decimal(str(leaderboard[0]['total_score'])), Decimal('2.00'))
+
+    def test_direct_model_changes_invalidate(self):
+        """測試：直接修改模型（例如 Django Admin）時由訊號使快取失效"""
+        self.get_leaderboard()
+        self.m2.name = "乙（改名）"
+        self.m2.save()
+        names = {entry['name'] for entry in self.get_leaderboard()['leaderboard']}
+        self.assertIn("乙（改名）", names)
+
+        score = Score.objects.get(member=self.m1, route=self.route)
+        score.is_completed = True
+        score.save()
+        update_scores(self.room.id)
+        totals = {entry['name']: Decimal(str(entry['total_score'])) for entry in self.get_leaderboard()['leaderboard']}
+        self.assertEqual(totals["甲"], Decimal('2.00'))
+
+    def test_invalidates_again_after_commit(self):
+        """測試：修改時立即失效，交易提交後再失效一次"""
+        generation = get_room_generation(self.room.id)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.m1.name = "甲（改名）"
+            self.m1.save()
+            self.assertEqual(get_room_generation(self.room.id), generation + 1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_room_generation(self.room.id), generation + 2)
+
+    def test_reused_room_id_does_not_hit_old_cache(self):
+        """測試：刪除房間後相同 ID 的新房間不會讀到舊的快取"""
+        self.get_leaderboard()
+        room_id = self.room.id
+        generation = get_room_generation(room_id)
+        self.room.delete()
+        # 模擬刪除時未能遞增世代的情況（例如其他程序的 locmem 快取）
+        cache.set(f'scoring:room-generation:{room_id}', generation)
+        Room.objects.create(id=room_id, name="新房間")
+        response = self.client.get(f'/api/rooms/{room_id}/leaderboard/')
+        self.assertEqual(response.data['room_info']['name'], "新房間")
+        self.assertEqual(response.data['leaderboard'], [])
+
+    def test_stale_scores_are_not_cached(self):
+        """測試：計分版本落後時不寫入快取"""
+        touch_room(self.room.id)
+        self.get_leaderboard()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_leaderboard()
+        self.assertNotEqual(self.member_queries(queries), [])
+
+    def test_deleting_score_recomputes(self):
+        """測試：刪除成績記錄後重新計分"""
+        score = Score.objects.get(member=self.m1, route=self.route)
+        score.is_completed = True
+        score.save()
+        update_scores(self.room.id)
+        response = self.client.delete(f'/api/scores/{score.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.m1.refresh_from_db()
+        self.assertEqual(self.m1.total_score, Decimal('0.00'))
+        totals = {entry['name']: Decimal(str(entry['total_score'])) for entry in self.get_leaderboard()['leaderboard']}
+        self.assertEqual(totals["甲"], Decimal('0.00'))
+
+
+class TestCaseRebuildCoalescing(SimpleTestCase):
+    """測試同時未命中時的重建合併"""
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        """測試：多個執行緒同時未命中，只有一個執行重建"""
+        calls = []
+
+        def builder():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'value': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_build('test:coalesce', builder, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 8)
+
+    def test_waits_for_other_worker(self):
+        """測試：其他 worker 持有重建鎖時等待其結果，不自行重建"""
+        cache.add('test:wait:lock', 1)
+        timer = threading.Timer(0.05, lambda: cache.set('test:wait', 'built elsewhere'))
+        timer.start()
+        try:
+            value = get_or_build('test:wait', lambda: self.fail('不應自行重建'), 60)
+        finally:
+            timer.join()
+        self.assertEqual(value, 'built elsewhere')
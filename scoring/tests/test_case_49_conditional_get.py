@@ -0,0 +1,135 @@
+"""
+HTTP 條件式 GET 測試（房間詳情與排行榜 API）
+
+測試項目：
+1. 回應帶有由房間版本產生的強 ETag、Last-Modified 與 Cache-Control: no-cache
+2. If-None-Match 相符時返回 304，且不查詢路線、成績與成員（在序列化之前結束）
+3. 透過 API、Django Admin 修改，或直接修改資料後重算而分數改變時 ETag 改變，返回 200 與新的內容
+4. ETag 只取決於資料庫中的狀態（多個 worker 程序返回相同的 ETag）
+5. 計分版本落後資料版本時不提供 ETag
+6. 不同主機名稱（照片網址不同）的 ETag 不同
+"""
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.admin import RouteAdmin
+from scoring.cache import invalidate_room
+from scoring.models import Room, Member, Route, Score, touch_room, update_scores
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseConditionalGet(TestCase):
+    """測試房間詳情與排行榜的 ETag / 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("條件式房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2)
+        self.route = TestDataFactory.create_route(self.room, members=[self.m1, self.m2])
+        update_scores(self.room.id)
+        self.urls = [f'/api/rooms/{self.room.id}/', f'/api/rooms/{self.room.id}/leaderboard/']
+
+    def tearDown(self):
+        Room.objects.all().delete()
+        cache.clear()
+
+    def test_validators_present(self):
+        """測試：回應帶有 ETag、Last-Modified 與 Cache-Control"""
+        etags = set()
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['ETag'].startswith('"'))
+            self.assertFalse(response['ETag'].startswith('W/'))
+            self.assertIn('Last-Modified', response)
+            self.assertEqual(response['Cache-Control'], 'no-cache')
+            etags.add(response['ETag'])
+        self.assertEqual(len(etags), 2, "房間詳情與排行榜的 ETag 應不同")
+
+    def test_not_modified_skips_serialization(self):
+        """測試：If-None-Match 相符時返回 304，不載入路線、成績與成員"""
+        skipped_tables = [Route._meta.db_table, Score._meta.db_table, Member._meta.db_table]
+        for url in self.urls:
+            etag = self.client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], etag)
+            for query in queries.captured_queries:
+                for table in skipped_tables:
+                    self.assertNotIn(f'FROM "{table}"', query['sql'])
+
+            # If-None-Match 可以列出多個 ETag
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", {etag}')
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_api_write_changes_etag(self):
+        """測試：透過 API 修改成績後 ETag 改變"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        score = Score.objects.get(member=self.m1, route=self.route)
+        self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_admin_change_changes_etag(self):
+        """測試：在 Django Admin 修改模型後 ETag 改變"""
+        etag = self.client.get(self.urls[0])['ETag']
+        self.route.grade = "V9"
+        RouteAdmin(Route, admin.site).save_model(None, self.route, None, True)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['routes'][0]['grade'], "V9")
+
+    def test_rescore_after_direct_change_changes_etag(self):
+        """測試：直接修改成績後以 update_scores 重算，分數改變時 ETag 改變"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Score.objects.filter(member=self.m1, route=self.route).update(is_completed=True)
+        update_scores(self.room.id)
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+        # 沒有改變任何分數的重算不改變 ETag
+        etag = self.client.get(self.urls[0])['ETag']
+        update_scores(self.room.id)
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_independent_of_process_cache(self):
+        """測試：ETag 只取決於資料庫中的狀態，與各程序快取中的世代無關"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        invalidate_room(self.room.id)
+        cache.clear()
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_etag_while_scores_are_stale(self):
+        """測試：計分版本落後資料版本時不提供 ETag，也不返回 304"""
+        etag = self.client.get(self.urls[1])['ETag']
+        touch_room(self.room.id)
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+
+    def test_etag_depends_on_host(self):
+        """測試：不同主機名稱的 ETag 不同（房間詳情中的照片網址包含主機名稱）"""
+        with self.settings(ALLOWED_HOSTS=['testserver', 'example.com']):
+            first = self.client.get(self.urls[0])['ETag']
+            second = self.client.get(self.urls[0], HTTP_HOST='example.com')['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_missing_room(self):
+        """測試：不存在的房間返回 404"""
+        self.assertEqual(self.client.get('/api/rooms/999999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/rooms/999999/leaderboard/').status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,78 @@
+"""
+成員完成路線數的查詢數回歸測試
+
+測試項目：
+1. 排行榜、房間詳情、成員列表的查詢數與成員數無關（小房間與大房間相同）
+2. 註解的完成路線數與逐一查詢的結果一致（包含沒有成績的成員）
+3. 未註解的成員仍可讀取完成路線數（退回單獨查詢）
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Member, annotate_completed_routes
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseMemberCountQueries(TestCase):
+    """測試 completed_routes_count 不會造成每位成員一次查詢"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.small = build_room("小房間", 3, 1, 4, 0.5, seed=1)
+        self.large = build_room("大房間", 30, 6, 12, 0.5, seed=2)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+        cache.clear()
+
+    def count_queries(self, url):
+        # 每次量測前清除排行榜快取，量測的是實際建立回應的查詢
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries.captured_queries), response.json()
+
+    def test_constant_queries(self):
+        """測試：小房間與大房間的查詢數相同"""
+        for path in ('/api/rooms/{}/', '/api/rooms/{}/leaderboard/'):
+            small_queries, _ = self.count_queries(path.format(self.small.id))
+            large_queries, _ = self.count_queries(path.format(self.large.id))
+            self.assertEqual(small_queries, large_queries, f"{path} 的查詢數不應隨成員數增加")
+            self.assertLessEqual(large_queries, 8)
+
+        list_queries, data = self.count_queries('/api/members/')
+        self.assertEqual(len(data), 40)
+        self.assertLessEqual(list_queries, 2)
+
+    def test_annotated_counts_match(self):
+        """測試：API 返回的完成路線數與逐一查詢一致"""
+        TestDataFactory.create_normal_members(self.large, count=1, names=["沒有成績"])
+        expected = {
+            member.id: member.scores.filter(is_completed=True).count()
+            for member in Member.objects.filter(room=self.large)
+        }
+
+        _, leaderboard = self.count_queries(f'/api/rooms/{self.large.id}/leaderboard/')
+        _, detail = self.count_queries(f'/api/rooms/{self.large.id}/')
+        for members in (leaderboard['leaderboard'], detail['members']):
+            self.assertEqual(
+                {member['id']: member['completed_routes_count'] for member in members},
+                expected
+            )
+        self.assertIn(0, expected.values())
+
+    def test_unannotated_fallback(self):
+        """測試：未註解的成員仍以單獨查詢取得完成路線數"""
+        member = Member.objects.filter(room=self.small).first()
+        annotated = annotate_completed_routes(Member.objects.filter(pk=member.pk)).get()
+        with self.assertNumQueries(1):
+            fallback = member.completed_routes_count
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.completed_routes_count, fallback)
@@ -0,0 +1,200 @@
+"""
+房間事件串流（SSE）測試
+
+測試項目：
+1. 新連線先收到 ready 事件（帶有目前的版本與事件 ID），沒有變動時不推送其他事件
+2. 重算後推送 leaderboard（有變動成員的總分與名次）與 room 事件，事件 ID 隨之前進
+3. 以 Last-Event-ID 重新連線時補送錯過的排行榜變動；格式錯誤的 ID 視為新連線
+4. lazy 模式下由串流觸發重算
+5. 房間刪除後推送 deleted 事件並結束
+6. API：text/event-stream 回應標頭、不存在的房間返回 404 error 事件
+7. 每個程序的串流數達到上限時返回 503 與 Retry-After；串流結束或連線關閉時歸還名額
+"""
+import json
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.events import BUSY_RETRY_AFTER, format_event, parse_event_id, room_events, stream_slots
+from scoring.models import Room, Score, update_scores
+from scoring.recompute import request_recompute
+from scoring.tests.test_helpers import TestDataFactory
+
+
+def parse_stream(chunks):
+    """把 SSE 文字解析為 [(事件名稱, 事件 ID, 內容)]，略過 retry 與註解行"""
+    events = []
+    for block in ''.join(chunks).split('\n\n'):
+        fields = {}
+        for line in block.split('\n'):
+            if not line or line.startswith(':'):
+                continue
+            name, _, value = line.partition(': ')
+            fields[name] = value
+        if 'event' in fields:
+            events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+    return events
+
+
+class FakeClock:
+    """可控制的時鐘：每次 sleep 前進指定秒數，並在第 N 次輪詢前執行對應的動作"""
+
+    def __init__(self, actions=None):
+        self.now = 0.0
+        self.actions = list(actions or [])
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.actions:
+            self.actions.pop(0)()
+
+
+class TestCaseRoomEventStream(TestCase):
+    """測試房間事件串流"""
+
+    def setUp(self):
+        self.room = TestDataFactory.create_room("串流房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2)
+        self.route = TestDataFactory.create_route(
+            self.room, member_completions={self.m1.id: True, self.m2.id: False}
+        )
+        update_scores(self.room.id)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def stream(self, actions=None, polls=0, last_event_id=None):
+        fake = FakeClock(actions)
+        return parse_stream(room_events(
+            self.room.id, last_event_id=last_event_id,
+            poll_interval=1.0, duration=float(polls), sleep=fake.sleep, clock=fake.clock,
+        ))
+
+    def complete_route_for_m2(self):
+        Score.objects.filter(member=self.m2, route=self.route).update(is_completed=True)
+        request_recompute(self.room.id)
+
+    def test_ready_event(self):
+        """測試：新連線只收到 ready 事件"""
+        events = self.stream(polls=2)
+        self.assertEqual([event for event, _, _ in events], ['ready'])
+        _, event_id, data = events[0]
+        self.room.refresh_from_db()
+        self.assertEqual(data['scores_version'], self.room.scores_version)
+        self.assertEqual(parse_event_id(event_id)[0], self.room.scores_version)
+
+    def test_recompute_pushes_events(self):
+        """測試：重算後推送 leaderboard 與 room 事件"""
+        events = self.stream(actions=[self.complete_route_for_m2], polls=2)
+        self.assertEqual([event for event, _, _ in events], ['ready', 'leaderboard', 'room'])
+
+        _, _, leaderboard = events[1]
+        # 兩人都完成同一條路線：L=2，各得 1 分，同列第 1 名
+        self.assertEqual(leaderboard['standings'], {
+            str(self.m1.id): {'total_score': '1.00', 'rank': 1},
+            str(self.m2.id): {'total_score': '1.00', 'rank': 1},
+        })
+
+        self.room.refresh_from_db()
+        _, room_event_id, room_data = events[2]
+        self.assertEqual(room_data['scores_version'], self.room.scores_version)
+        self.assertEqual(parse_event_id(room_event_id)[0], self.room.scores_version)
+        self.assertGreater(parse_event_id(room_event_id)[1], parse_event_id(events[0][1])[1])
+
+    def test_reconnect_replays_missed_changes(self):
+        """測試：以 Last-Event-ID 重新連線時補送錯過的變動"""
+        ready_id = self.stream()[0][1]
+        self.complete_route_for_m2()
+
+        events = self.stream(last_event_id=ready_id)
+        self.assertEqual([event for event, _, _ in events], ['leaderboard', 'room'])
+
+        # 已是最新的 ID 重新連線時不推送任何事件
+        self.assertEqual(self.stream(last_event_id=events[-1][1]), [])
+        # 格式錯誤的 ID 視為新連線
+        self.assertEqual([event for event, _, _ in self.stream(last_event_id='abc')], ['ready'])
+
+    @override_settings(SCORING_RECOMPUTE_MODE='lazy')
+    def test_lazy_mode_recomputes(self):
+        """測試：lazy 模式下由串流觸發重算"""
+        events = self.stream(actions=[self.complete_route_for_m2], polls=2)
+        self.assertEqual([event for event, _, _ in events], ['ready', 'leaderboard', 'room'])
+        self.room.refresh_from_db()
+        self.assertFalse(self.room.scores_are_stale)
+
+    def test_room_deleted(self):
+        """測試：房間刪除後推送 deleted 事件並結束"""
+        events = self.stream(actions=[self.room.delete], polls=5)
+        self.assertEqual([event for event, _, _ in events], ['ready', 'deleted'])
+
+    def test_format_event(self):
+        """測試：事件格式"""
+        self.assertEqual(
+            format_event('room', {'名稱': 1}, event_id='3:4', retry=1000),
+            'retry: 1000\nid: 3:4\nevent: room\ndata: {"名稱":1}\n\n'
+        )
+        self.assertIsNone(parse_event_id('1:-2'))
+        self.assertEqual(parse_event_id('5:7'), (5, 7))
+
+
+@override_settings(SCORING_EVENTS_STREAM_DURATION=0)
+class TestCaseRoomEventStreamAPI(TestCase):
+    """測試事件串流 API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("串流 API 房間")
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_stream_response(self):
+        """測試：返回 text/event-stream 串流"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        events = parse_stream(chunk.decode() for chunk in response.streaming_content)
+        self.assertEqual(events[0][0], 'ready')
+
+    def test_missing_room(self):
+        """測試：不存在的房間返回 404 error 事件"""
+        response = self.client.get('/api/rooms/999999/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(parse_stream([response.content.decode()])[0][0], 'error')
+
+    @override_settings(SCORING_EVENTS_MAX_STREAMS=1)
+    def test_stream_limit(self):
+        """測試：串流數達到上限時返回 503，名額在串流結束或連線關閉時歸還"""
+        url = f'/api/rooms/{self.room.id}/events/'
+        self.assertEqual(stream_slots.active, 0)
+        first = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(stream_slots.active, 1)
+
+        busy = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(busy.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(busy['Retry-After'], str(BUSY_RETRY_AFTER))
+        self.assertEqual(parse_stream([busy.content.decode()])[0][0], 'error')
+
+        # 串流結束後歸還名額
+        list(first.streaming_content)
+        self.assertEqual(stream_slots.active, 0)
+
+        # 尚未讀取就關閉連線也會歸還名額
+        second = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(stream_slots.active, 1)
+        second.close()
+        self.assertEqual(stream_slots.active, 0)
+
+    @override_settings(SCORING_EVENTS_MAX_STREAMS=0)
+    def test_streams_disabled(self):
+        """測試：上限為 0 時所有串流請求都返回 503"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
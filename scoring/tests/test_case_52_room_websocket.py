@@ -0,0 +1,430 @@
+"""
+房間 WebSocket（ASGI）測試
+
+測試項目：
+1. 連線到存在的房間收到 ready（含版本與能否寫入）；不存在的房間或錯誤路徑以 4404 關閉
+2. 裁判以一則訊息送出多筆成績：回覆 ack（帶 request_id 與受影響成員的總分），
+   所有連線立即收到 leaderboard 與 room 廣播
+3. 其他程序（HTTP API）寫入的變動在下一次輪詢時推送給觀眾
+4. 權限：生產環境設定下未登入用戶只能觀看；跨站 Origin 不能寫入
+5. 錯誤訊息：無效 JSON、未知類型、驗證失敗；ping 回覆 pong
+6. 房間刪除時推送 deleted 並以 4410 關閉；跟不上的連線清空佇列並要求斷線
+   第一個連線等待輪詢啟動期間，其他連線加入又離開不會出錯，所有連線離開後不會留下輪詢工作
+7. ASGI 入口把 WebSocket 與事件串流交給 scoring.websocket，其他請求交給 Django
+8. ASGI 事件串流（SSE）：共用頻道層、不受串流名額限制；重新連線補送錯過的事件且不重複推送；
+   不存在的房間返回 404，房間刪除時推送 deleted 並結束回應，沒有事件時送出 keepalive
+9. loadtest_realtime 命令輸出 WebSocket 與 HTTP 輪詢的比較，合成資料在結束後回滾
+"""
+import asyncio
+import json
+import os
+import tempfile
+from functools import partial
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from scoring.models import Room, Score, update_scores
+from scoring.recompute import request_recompute
+from scoring import websocket
+from scoring.tests.test_helpers import TestDataFactory
+from scoring.websocket import (
+    CLOSE_NOT_FOUND, CLOSE_ROOM_DELETED, CLOSE_TOO_SLOW, RoomChannelLayer, RoomConnection, room_event_stream,
+    room_websocket,
+)
+
+PRODUCTION_PERMISSIONS = {
+    'DEFAULT_PERMISSION_CLASSES': ['scoring.permissions.IsMemberOrReadOnly'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
+}
+
+
+class TestCaseRoomWebSocket(TestCase):
+    """測試房間 WebSocket"""
+
+    def setUp(self):
+        self.room = TestDataFactory.create_room("WebSocket 房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2)
+        self.route = TestDataFactory.create_route(
+            self.room, member_completions={self.m1.id: True, self.m2.id: False}
+        )
+        update_scores(self.room.id)
+        self.layer = RoomChannelLayer(poll_interval=0.05)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    async def connect(self, path=None, headers=None):
+        communicator = ApplicationCommunicator(partial(room_websocket, layer=self.layer), {
+            'type': 'websocket',
+            'path': path or f'/ws/rooms/{self.room.id}/',
+            'headers': headers or [],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator
+
+    async def receive_json(self, communicator):
+        message = await communicator.receive_output(timeout=2)
+        self.assertEqual(message['type'], 'websocket.send', message)
+        return json.loads(message['text'])
+
+    async def receive_until(self, communicator, message_type):
+        """略過其他訊息，直到收到指定類型的訊息"""
+        while True:
+            message = await self.receive_json(communicator)
+            if message['type'] == message_type:
+                return message
+
+    async def open(self, **kwargs):
+        communicator = await self.connect(**kwargs)
+        self.assertEqual((await communicator.receive_output(timeout=2))['type'], 'websocket.accept')
+        ready = await self.receive_json(communicator)
+        self.assertEqual(ready['type'], 'ready')
+        return communicator, ready
+
+    async def disconnect(self, *communicators):
+        for communicator in communicators:
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=2)
+
+    async def test_ready_and_missing_room(self):
+        """測試：ready 訊息；不存在的房間以 4404 關閉"""
+        communicator, ready = await self.open()
+        self.assertEqual(ready['data']['room_id'], self.room.id)
+        self.assertTrue(ready['data']['can_edit'])
+        self.assertIn(self.room.id, self.layer.groups)
+        await self.disconnect(communicator)
+        self.assertEqual(self.layer.groups, {})
+
+        for path in ('/ws/rooms/999999/', '/ws/rooms/abc/'):
+            communicator = await self.connect(path=path)
+            message = await communicator.receive_output(timeout=2)
+            self.assertEqual(message, {'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+
+    async def test_judge_batch_broadcasts(self):
+        """測試：裁判送出成績後回覆 ack，所有連線立即收到廣播"""
+        judge, _ = await self.open()
+        spectator, _ = await self.open()
+        self.assertEqual(len(self.layer.groups[self.room.id].connections), 2)
+
+        await judge.send_input({'type': 'websocket.receive', 'text': json.dumps({
+            'type': 'scores', 'request_id': 'r1',
+            'changes': [{'member_id': self.m2.id, 'route_id': self.route.id, 'is_completed': True}],
+        })})
+        ack = await self.receive_until(judge, 'ack')
+        self.assertEqual(ack['request_id'], 'r1')
+        self.assertEqual(ack['updated'], 1)
+        # 同一路線的另一位完成者 m1 的總分也改變（2 → 1），一併返回
+        self.assertEqual(ack['members'], {str(self.m1.id): '1.00', str(self.m2.id): '1.00'})
+
+        for communicator in (judge, spectator):
+            leaderboard = await self.receive_until(communicator, 'leaderboard')
+            self.assertEqual(leaderboard['data']['standings'][str(self.m1.id)], {'total_score': '1.00', 'rank': 1})
+            room = await self.receive_until(communicator, 'room')
+            # 事件 ID 為「計分版本:歷史記錄ID」，room 事件的歷史記錄位置與最後一個 leaderboard 事件相同
+            self.assertEqual(room['id'].split(':')[1], leaderboard['id'].split(':')[1])
+        await self.disconnect(judge, spectator)
+
+    async def test_external_change_is_polled(self):
+        """測試：其他程序寫入的變動在下一次輪詢時推送"""
+        spectator, _ = await self.open()
+
+        def complete_elsewhere():
+            Score.objects.filter(member=self.m2, route=self.route).update(is_completed=True)
+            request_recompute(self.room.id)
+
+        await sync_to_async(complete_elsewhere)()
+        room = await self.receive_until(spectator, 'room')
+        self.assertEqual(room['data']['room_id'], self.room.id)
+        await self.disconnect(spectator)
+
+    @override_settings(REST_FRAMEWORK=PRODUCTION_PERMISSIONS)
+    async def test_spectator_cannot_write(self):
+        """測試：未登入用戶只能觀看"""
+        spectator, ready = await self.open()
+        self.assertFalse(ready['data']['can_edit'])
+        await spectator.send_input({'type': 'websocket.receive', 'text': json.dumps({
+            'type': 'scores', 'changes': [{'member_id': self.m2.id, 'route_id': self.route.id, 'is_completed': True}],
+        })})
+        error = await self.receive_json(spectator)
+        self.assertEqual(error, {'type': 'error', 'error': 'permission_denied'})
+        completed = await sync_to_async(Score.objects.filter(member=self.m2, is_completed=True).exists)()
+        self.assertFalse(completed)
+        await self.disconnect(spectator)
+
+    async def test_cross_origin_cannot_write(self):
+        """測試：Origin 與 Host 不同時不能寫入"""
+        communicator, ready = await self.open(headers=[
+            (b'host', b'scores.example.com'), (b'origin', b'https://evil.example.net'),
+        ])
+        self.assertFalse(ready['data']['can_edit'])
+        await self.disconnect(communicator)
+
+        communicator, ready = await self.open(headers=[
+            (b'host', b'scores.example.com'), (b'origin', b'https://scores.example.com'),
+        ])
+        self.assertTrue(ready['data']['can_edit'])
+        await self.disconnect(communicator)
+
+    async def test_invalid_messages(self):
+        """測試：錯誤訊息的回覆"""
+        communicator, _ = await self.open()
+        cases = [
+            ('not json', 'invalid_json'),
+            (json.dumps([1, 2]), 'invalid_json'),
+            (json.dumps({'type': 'unknown'}), 'unknown_type'),
+            (json.dumps({'type': 'scores', 'changes': [{'member_id': 999999, 'route_id': self.route.id,
+                                                        'is_completed': True}]}), 'invalid'),
+        ]
+        for text, error in cases:
+            await communicator.send_input({'type': 'websocket.receive', 'text': text})
+            self.assertEqual((await self.receive_json(communicator))['error'], error)
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'ping', 'request_id': 7})})
+        self.assertEqual(await self.receive_json(communicator), {'type': 'pong', 'request_id': 7})
+        await self.disconnect(communicator)
+
+    async def test_room_deleted(self):
+        """測試：房間刪除時推送 deleted 並關閉連線"""
+        spectator, _ = await self.open()
+        await sync_to_async(Room.objects.filter(pk=self.room.pk).delete)()
+        deleted = await self.receive_json(spectator)
+        self.assertEqual(deleted['type'], 'deleted')
+        self.assertEqual(
+            await spectator.receive_output(timeout=2),
+            {'type': 'websocket.close', 'code': CLOSE_ROOM_DELETED}
+        )
+        self.assertEqual(self.layer.groups, {})
+        await self.disconnect(spectator)
+
+    async def test_join_and_leave_while_group_starts(self):
+        """測試：第一個連線等待輪詢啟動期間，其他連線加入又離開；所有連線離開後不啟動輪詢"""
+        release = asyncio.Event()
+
+        def slow_sync_to_async(func):
+            async def call(*args, **kwargs):
+                await release.wait()
+                return await sync_to_async(func)(*args, **kwargs)
+            return call
+
+        first, second = RoomConnection(), RoomConnection()
+        with mock.patch.object(websocket, 'sync_to_async', slow_sync_to_async):
+            adding = asyncio.create_task(self.layer.group_add(self.room.id, first))
+            await asyncio.sleep(0)
+            await self.layer.group_add(self.room.id, second)
+            await self.layer.group_discard(self.room.id, second)
+            self.assertIn(self.room.id, self.layer.groups)
+            release.set()
+            await adding
+
+            group = self.layer.groups[self.room.id]
+            self.assertEqual(group.connections, {first})
+            self.assertIsNotNone(group.task)
+            await self.layer.group_discard(self.room.id, first)
+            self.assertEqual(self.layer.groups, {})
+
+            # 唯一的連線在等待期間離開：群組被移除，也不啟動輪詢
+            release.clear()
+            adding = asyncio.create_task(self.layer.group_add(self.room.id, first))
+            await asyncio.sleep(0)
+            group = self.layer.groups[self.room.id]
+            await self.layer.group_discard(self.room.id, first)
+            release.set()
+            await adding
+        self.assertEqual(self.layer.groups, {})
+        self.assertIsNone(group.task)
+
+    def test_slow_connection_is_closed(self):
+        """測試：佇列已滿時清空並只留下關閉訊號"""
+        connection = RoomConnection(queue_size=2)
+        for index in range(3):
+            connection.push(f'message {index}')
+        self.assertEqual(connection.queue.qsize(), 1)
+        self.assertEqual(connection.queue.get_nowait(), (CLOSE_TOO_SLOW,))
+
+
+class TestCaseAsgiApplication(TestCase):
+    """測試 ASGI 入口的分派"""
+
+    async def test_routes_by_scope_type(self):
+        from climbing_system.asgi import application
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'websocket', 'path': '/ws/rooms/999999/', 'headers': [],
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(timeout=2), {'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': '/api/rooms/999999/events/', 'headers': [],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(timeout=2)
+        self.assertEqual(start['status'], 404)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), start['headers'])
+        await communicator.wait(timeout=2)
+
+        communicator = ApplicationCommunicator(application, {'type': 'lifespan'})
+        await communicator.send_input({'type': 'lifespan.startup'})
+        self.assertEqual(await communicator.receive_output(timeout=2), {'type': 'lifespan.startup.complete'})
+        await communicator.send_input({'type': 'lifespan.shutdown'})
+        self.assertEqual(await communicator.receive_output(timeout=2), {'type': 'lifespan.shutdown.complete'})
+
+
+def parse_events(text):
+    """把一段 SSE 文字解析為 [{'event', 'id', 'data'}]（略過註解行與只有 retry 的區塊）"""
+    events = []
+    for block in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append({'event': fields['event'], 'id': fields.get('id'), 'data': json.loads(fields['data'])})
+    return events
+
+
+class TestCaseAsgiEventStream(TestCase):
+    """測試 ASGI 的房間事件串流"""
+
+    def setUp(self):
+        self.room = TestDataFactory.create_room("事件串流房間")
+        self.m1, self.m2 = TestDataFactory.create_normal_members(self.room, count=2)
+        self.route = TestDataFactory.create_route(
+            self.room, member_completions={self.m1.id: True, self.m2.id: False}
+        )
+        update_scores(self.room.id)
+        self.layer = RoomChannelLayer(poll_interval=0.05)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    async def open(self, path=None, last_event_id=None):
+        headers = [(b'last-event-id', last_event_id.encode())] if last_event_id else []
+        communicator = ApplicationCommunicator(partial(room_event_stream, layer=self.layer), {
+            'type': 'http', 'method': 'GET',
+            'path': path or f'/api/rooms/{self.room.id}/events/',
+            'headers': headers,
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(timeout=2)
+        self.assertEqual(start['type'], 'http.response.start')
+        return communicator, start
+
+    async def receive_chunk(self, communicator):
+        message = await communicator.receive_output(timeout=2)
+        self.assertEqual(message['type'], 'http.response.body')
+        return message['body'].decode('utf-8'), message.get('more_body', False)
+
+    async def receive_event(self, communicator, name):
+        """略過 keepalive 與其他事件，直到收到指定名稱的事件"""
+        while True:
+            text, _ = await self.receive_chunk(communicator)
+            for event in parse_events(text):
+                if event['event'] == name:
+                    return event
+
+    async def disconnect(self, *communicators):
+        for communicator in communicators:
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait(timeout=2)
+
+    def change_elsewhere(self, is_completed):
+        Score.objects.filter(member=self.m2, route=self.route).update(is_completed=is_completed)
+        request_recompute(self.room.id)
+
+    @override_settings(SCORING_EVENTS_MAX_STREAMS=0)
+    async def test_streams_share_channel_layer(self):
+        """測試：多個串流共用一個輪詢群組，不受 WSGI 串流名額限制，變動推送給所有串流"""
+        streams = []
+        for _ in range(3):
+            communicator, start = await self.open()
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'x-accel-buffering', b'no'), start['headers'])
+            text, more_body = await self.receive_chunk(communicator)
+            self.assertTrue(more_body)
+            self.assertTrue(text.startswith('retry: '))
+            self.assertEqual(parse_events(text)[0]['event'], 'ready')
+            streams.append(communicator)
+        self.assertEqual(len(self.layer.groups[self.room.id].connections), 3)
+
+        await sync_to_async(self.change_elsewhere)(True)
+        for communicator in streams:
+            leaderboard = await self.receive_event(communicator, 'leaderboard')
+            self.assertEqual(leaderboard['data']['standings'][str(self.m1.id)], {'total_score': '1.00', 'rank': 1})
+            await self.receive_event(communicator, 'room')
+        await self.disconnect(*streams)
+        self.assertEqual(self.layer.groups, {})
+
+    async def test_resume_replays_missed_events_once(self):
+        """測試：帶 Last-Event-ID 重新連線時補送錯過的事件，頻道層之後廣播的相同事件不重複推送"""
+        self.layer = RoomChannelLayer(poll_interval=60)
+        first, _ = await self.open()
+        ready = parse_events((await self.receive_chunk(first))[0])[0]
+        await self.disconnect(first)
+
+        # 另一位觀眾讓群組停在舊的位置，直到 notify 才輪詢
+        spectator, _ = await self.open()
+        await self.receive_chunk(spectator)
+        await sync_to_async(self.change_elsewhere)(True)
+
+        resumed, start = await self.open(last_event_id=ready['id'])
+        self.assertEqual(start['status'], 200)
+        text, _ = await self.receive_chunk(resumed)
+        self.assertEqual([event['event'] for event in parse_events(text)], ['leaderboard', 'room'])
+        replayed = parse_events(text)[-1]['id']
+
+        self.layer.notify(self.room.id)
+        await self.receive_event(spectator, 'room')
+        await sync_to_async(self.change_elsewhere)(False)
+        self.layer.notify(self.room.id)
+
+        leaderboard = await self.receive_event(resumed, 'leaderboard')
+        self.assertGreater(int(leaderboard['id'].split(':')[1]), int(replayed.split(':')[1]))
+        self.assertEqual(leaderboard['data']['standings'][str(self.m1.id)], {'total_score': '2.00', 'rank': 1})
+        await self.disconnect(spectator, resumed)
+
+    async def test_missing_room_deleted_room_and_keepalive(self):
+        """測試：不存在的房間返回 404；沒有事件時送出 keepalive；房間刪除時推送 deleted 並結束回應"""
+        communicator, start = await self.open(path='/api/rooms/999999/events/')
+        self.assertEqual(start['status'], 404)
+        text, more_body = await self.receive_chunk(communicator)
+        self.assertFalse(more_body)
+        self.assertEqual(parse_events(text)[0]['event'], 'error')
+        await communicator.wait(timeout=2)
+        self.assertEqual(self.layer.groups, {})
+
+        with mock.patch.object(websocket, 'KEEPALIVE_INTERVAL', 0.05):
+            communicator, _ = await self.open()
+            await self.receive_chunk(communicator)
+            self.assertEqual(await self.receive_chunk(communicator), (': keepalive\n\n', True))
+
+            await sync_to_async(Room.objects.filter(pk=self.room.pk).delete)()
+            deleted = await self.receive_event(communicator, 'deleted')
+            self.assertEqual(deleted['data'], {'room_id': self.room.id})
+            self.assertEqual(await self.receive_chunk(communicator), ('', False))
+        await self.disconnect(communicator)
+        self.assertEqual(self.layer.groups, {})
+
+
+class TestCaseRealtimeLoadTest(TestCase):
+    """測試 loadtest_realtime 命令"""
+
+    def test_command_report(self):
+        """測試：輸出比較結果並寫入 JSON，合成資料已回滾"""
+        rooms_before = Room.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'realtime.json')
+            out = StringIO()
+            call_command('loadtest_realtime', '--spectators', '2', '5', '--updates', '2', '--output', path, stdout=out)
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+
+        self.assertIn('HTTP 輪詢', out.getvalue())
+        self.assertEqual([item['spectators'] for item in report['websocket']], [2, 5])
+        for item in report['websocket']:
+            self.assertGreater(item['fanout_ms_median'], 0)
+            self.assertGreater(item['capacity']['websocket'], 0)
+        self.assertEqual(report['http_polling']['not_modified_queries'], 1)
+        self.assertEqual(Room.objects.count(), rooms_before)
@@ -0,0 +1,119 @@
+"""
+成員名次測試（由計分引擎計算並寫入 Member.rank / Member.dense_rank）
+
+測試項目：
+1. 競賽名次（1, 2, 2, 4）與密集名次（1, 2, 2, 3）的計算
+2. 完整重算寫入名次，同分同名次；總分不變時不寫回
+3. 增量計分後的名次（包含其他成員被擠下的名次）與完整重算一致
+4. 排行榜與成員 API 返回名次，排行榜按名次排序而不按總分排序
+5. 遷移以現有總分初始化名次
+"""
+import random
+from importlib import import_module
+
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from scoring.models import Member, Room, Score, update_route_scores, update_scores
+from scoring.scoring_kernel import competition_ranks, dense_ranks
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+from scoring.tests.test_helpers import TestDataFactory
+
+
+def member_ranks(room):
+    return {
+        member_id: (rank, dense_rank)
+        for member_id, rank, dense_rank in Member.objects.filter(room=room).values_list('id', 'rank', 'dense_rank')
+    }
+
+
+class TestCaseMemberRanks(TestCase):
+    """測試計分引擎維護的成員名次"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("名次房間")
+        self.m1, self.m2, self.m3, self.m4 = TestDataFactory.create_normal_members(self.room, count=4)
+        # m1 完成兩條，m2、m3 各完成一條同一路線，m4 沒有完成
+        self.route1 = TestDataFactory.create_route(self.room, name="路線1", member_completions={
+            self.m1.id: True, self.m2.id: True, self.m3.id: True, self.m4.id: False,
+        })
+        self.route2 = TestDataFactory.create_route(self.room, name="路線2", member_completions={
+            self.m1.id: True, self.m2.id: False, self.m3.id: False, self.m4.id: False,
+        })
+        update_scores(self.room.id)
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_rank_functions(self):
+        """測試：同分同名次，競賽名次跳過並列人數，密集名次不跳過"""
+        totals = [500, 300, 300, 100, 100, 0]
+        self.assertEqual(competition_ranks(totals), [1, 2, 2, 4, 4, 6])
+        self.assertEqual(dense_ranks(totals), [1, 2, 2, 3, 3, 4])
+        self.assertEqual(dense_ranks([]), [])
+
+    def test_full_recompute_writes_ranks(self):
+        """測試：完整重算寫入名次；名次不變時不寫回成員"""
+        self.assertEqual(member_ranks(self.room), {
+            self.m1.id: (1, 1), self.m2.id: (2, 2), self.m3.id: (2, 2), self.m4.id: (4, 3),
+        })
+
+        Member.objects.filter(room=self.room).update(rank=None, dense_rank=None)
+        stats = update_scores(self.room.id)
+        self.assertEqual(stats['members_updated'], 4)
+        self.assertEqual(member_ranks(self.room)[self.m4.id], (4, 3))
+        self.assertEqual(update_scores(self.room.id)['members_updated'], 0)
+
+    def test_incremental_ranks_match_full_recompute(self):
+        """測試：增量計分更新所有受影響成員的名次，結果與完整重算一致"""
+        score = Score.objects.get(member=self.m4, route=self.route2)
+        score.is_completed = True
+        score.save()
+        update_route_scores(self.route2.id)
+        # m4 獨得路線2的一半分數後超過 m2、m3
+        self.assertEqual(member_ranks(self.room)[self.m4.id], (2, 2))
+        self.assertEqual(member_ranks(self.room)[self.m2.id], (3, 3))
+
+        rng = random.Random(7)
+        room = build_room("隨機名次房間", 7, 2, 6, 0.5, seed=3)
+        update_scores(room.id)
+        scores = list(Score.objects.filter(route__room=room))
+        for _ in range(15):
+            score = rng.choice(scores)
+            score.refresh_from_db()
+            score.is_completed = not score.is_completed
+            score.save()
+            update_route_scores(score.route_id)
+            incremental = member_ranks(room)
+            update_scores(room.id)
+            self.assertEqual(incremental, member_ranks(room))
+
+    def test_api_returns_ranks(self):
+        """測試：排行榜按名次排序並返回名次，不需以總分排序成員"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        leaderboard = response.data['leaderboard']
+        self.assertEqual(
+            [(member['id'], member['rank'], member['dense_rank']) for member in leaderboard],
+            [(self.m1.id, 1, 1), (self.m2.id, 2, 2), (self.m3.id, 2, 2), (self.m4.id, 4, 3)],
+        )
+        member_table = Member._meta.db_table
+        member_queries = [q['sql'] for q in queries.captured_queries if f'FROM "{member_table}"' in q['sql']]
+        self.assertTrue(any('ORDER BY' in sql and '"rank"' in sql.split('ORDER BY')[-1] for sql in member_queries))
+        self.assertFalse(any('"total_score" DESC' in sql for sql in member_queries))
+
+        response = self.client.get(f'/api/members/{self.m4.id}/')
+        self.assertEqual((response.data['rank'], response.data['dense_rank']), (4, 3))
+
+    def test_migration_populates_ranks(self):
+        """測試：遷移以現有總分初始化名次"""
+        Member.objects.filter(room=self.room).update(rank=None, dense_rank=None)
+        migration = import_module('scoring.migrations.0007_member_rank')
+        migration.populate_member_ranks(apps, None)
+        self.assertEqual(member_ranks(self.room), {
+            self.m1.id: (1, 1), self.m2.id: (2, 2), self.m3.id: (2, 2), self.m4.id: (4, 3),
+        })
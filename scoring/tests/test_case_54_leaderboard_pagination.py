@@ -0,0 +1,112 @@
+"""
+排行榜分頁測試（limit / around / cursor）
+
+測試項目：
+1. 未提供分頁參數時返回完整排行榜（格式不變）
+2. limit 只返回前 N 名，回應含總人數與下一頁游標
+3. 以 cursor 逐頁讀取的結果與完整排行榜相同（包含同名次的成員跨頁）
+4. around 以指定成員為中心，接近榜首或榜尾時往另一側補足
+5. 無效的參數返回 400；分頁的查詢數與成員數無關
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from scoring.leaderboard import decode_cursor, encode_cursor
+from scoring.models import Member, Room, update_scores
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseLeaderboardPagination(TestCase):
+    """測試排行榜分頁"""
+
+    def setUp(self):
+        self.client = APIClient()
+        # 20 位成員、少數路線，保證有同名次的成員
+        self.room = build_room("分頁房間", 18, 2, 3, 0.5, seed=5)
+        update_scores(self.room.id)
+        self.url = f'/api/rooms/{self.room.id}/leaderboard/'
+        self.full = [member['id'] for member in self.client.get(self.url).data['leaderboard']]
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_full_leaderboard_unchanged(self):
+        """測試：沒有分頁參數時返回所有成員，不含分頁欄位"""
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['leaderboard']), 20)
+        self.assertNotIn('next', response.data)
+        ranks = [member['rank'] for member in response.data['leaderboard']]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertGreater(len(ranks), len(set(ranks)), "測試資料應包含同名次的成員")
+
+    def test_limit_returns_top_members(self):
+        """測試：limit 只返回前 N 名"""
+        response = self.client.get(self.url, {'limit': 5})
+        self.assertEqual([member['id'] for member in response.data['leaderboard']], self.full[:5])
+        self.assertEqual(response.data['count'], 20)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['room_info']['id'], self.room.id)
+
+        response = self.client.get(self.url, {'limit': 20})
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_walks_whole_leaderboard(self):
+        """測試：以游標逐頁讀取與完整排行榜相同"""
+        collected = []
+        params = {'limit': 3}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            collected += [member['id'] for member in response.data['leaderboard']]
+            if response.data['next'] is None:
+                break
+            params = {'limit': 3, 'cursor': response.data['next']}
+        self.assertEqual(collected, self.full)
+
+    def test_around_member(self):
+        """測試：around 以指定成員為中心，接近兩端時補足"""
+        middle = self.full[10]
+        response = self.client.get(self.url, {'around': middle, 'limit': 5})
+        self.assertEqual([member['id'] for member in response.data['leaderboard']], self.full[8:13])
+        next_page = self.client.get(self.url, {'cursor': response.data['next'], 'limit': 2})
+        self.assertEqual([member['id'] for member in next_page.data['leaderboard']], self.full[13:15])
+
+        response = self.client.get(self.url, {'around': self.full[0], 'limit': 5})
+        self.assertEqual([member['id'] for member in response.data['leaderboard']], self.full[:5])
+
+        response = self.client.get(self.url, {'around': self.full[-1], 'limit': 5})
+        self.assertEqual([member['id'] for member in response.data['leaderboard']], self.full[-5:])
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_params(self):
+        """測試：無效的參數返回 400"""
+        other_room = TestDataFactory.create_room("其他房間")
+        other_member = TestDataFactory.create_normal_members(other_room, count=1)[0]
+        for params in [
+            {'limit': 0}, {'limit': 'abc'}, {'limit': 100000}, {'cursor': 'not-a-cursor'},
+            {'around': other_member.id}, {'around': self.full[0], 'cursor': encode_cursor(Member(rank=1, name='x'))},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_cursor_round_trip(self):
+        """測試：游標編碼與解析"""
+        self.assertEqual(decode_cursor(encode_cursor(Member(rank=3, name='王小明'))), (3, '王小明'))
+        for value in ['', 'W10', encode_cursor(Member(rank=0, name='a'))]:
+            self.assertIsNone(decode_cursor(value))
+
+    def test_page_queries_are_constant(self):
+        """測試：分頁的查詢數與房間成員數無關"""
+        counts = []
+        for index, members in enumerate([10, 60]):
+            room = build_room(f"查詢房間{index}", members, 0, 3, 0.5, seed=index)
+            update_scores(room.id)
+            url = f'/api/rooms/{room.id}/leaderboard/'
+            cursor = self.client.get(url, {'limit': 5}).data['next']
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, {'limit': 5, 'cursor': cursor})
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
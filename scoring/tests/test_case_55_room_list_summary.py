@@ -0,0 +1,98 @@
+"""
+房間列表摘要測試
+
+測試項目：
+1. GET /api/rooms/ 返回摘要（成員數、路線數、最近更新時間），不含成員與路線的完整資料
+2. 按最近活動排序：房間有變動後排到最前面
+3. 游標分頁：本體仍為陣列，下一頁網址在 Link 標頭；逐頁讀取涵蓋所有房間
+4. 列表的查詢數與房間、成員、路線數量無關
+5. 房間詳情與創建房間仍返回完整資料
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, touch_room
+from scoring.pagination import RoomListPagination
+from scoring.tests.test_helpers import TestDataFactory
+
+
+class TestCaseRoomListSummary(TestCase):
+    """測試房間列表摘要與分頁"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("摘要房間")
+        TestDataFactory.create_normal_members(self.room, count=3)
+        TestDataFactory.create_route(self.room, name="路線1")
+        TestDataFactory.create_route(self.room, name="路線2")
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def room_ids(self, response):
+        return [room['id'] for room in response.data]
+
+    def test_summary_fields(self):
+        """測試：列表只返回摘要"""
+        empty = TestDataFactory.create_room("空房間")
+        response = self.client.get('/api/rooms/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        summaries = {room['id']: room for room in response.data}
+        self.assertEqual(
+            set(summaries[self.room.id]),
+            {'id', 'name', 'standard_line_score', 'member_count', 'route_count', 'created_at', 'updated_at'},
+        )
+        self.assertEqual((summaries[self.room.id]['member_count'], summaries[self.room.id]['route_count']), (3, 2))
+        self.assertEqual((summaries[empty.id]['member_count'], summaries[empty.id]['route_count']), (0, 0))
+
+    def test_ordered_by_recent_activity(self):
+        """測試：最近有變動的房間排在最前面"""
+        newer = TestDataFactory.create_room("新房間")
+        self.assertEqual(self.room_ids(self.client.get('/api/rooms/'))[0], newer.id)
+        touch_room(self.room.id)
+        self.assertEqual(self.room_ids(self.client.get('/api/rooms/'))[0], self.room.id)
+
+    def test_cursor_pagination(self):
+        """測試：逐頁讀取涵蓋所有房間，不重複"""
+        for index in range(6):
+            TestDataFactory.create_room(f"分頁房間{index}")
+        expected = list(Room.objects.order_by('-updated_at', '-id').values_list('id', flat=True))
+
+        response = self.client.get('/api/rooms/', {'page_size': 3})
+        collected = self.room_ids(response)
+        while 'Link' in response and 'rel="next"' in response['Link']:
+            next_url = response['Link'].split('>; rel="next"')[0].lstrip('<')
+            response = self.client.get(next_url)
+            collected += self.room_ids(response)
+        self.assertEqual(collected, expected)
+        self.assertIn('rel="prev"', response['Link'])
+        self.assertEqual(len(self.room_ids(self.client.get('/api/rooms/'))), min(len(expected), RoomListPagination.page_size))
+
+    def test_constant_queries(self):
+        """測試：列表的查詢數與資料量無關"""
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/rooms/')
+            return len(queries.captured_queries)
+
+        before = count_queries()
+        for index in range(5):
+            room = TestDataFactory.create_room(f"更多房間{index}")
+            TestDataFactory.create_normal_members(room, count=4)
+            TestDataFactory.create_route(room, name="路線")
+        self.assertEqual(count_queries(), before)
+        self.assertLessEqual(before, 2)
+
+    def test_detail_and_create_keep_full_payload(self):
+        """測試：房間詳情與創建仍返回成員與路線"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/')
+        self.assertEqual(len(response.data['members']), 3)
+        self.assertEqual(len(response.data['routes']), 2)
+
+        response = self.client.post('/api/rooms/', {'name': '新建房間'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['members'], [])
@@ -0,0 +1,181 @@
+"""
+房間詳情增量同步測試（GET /api/rooms/{id}/?since=<version>）
+
+測試項目：
+1. 房間詳情包含 version；沒有變動時增量回應為空
+2. 切換一筆成績只返回該成績與總分或名次有變動的成員
+3. 修改路線、批量更新成績都會出現在增量回應中
+4. 刪除成員、路線與成績以 deleted_* 返回
+5. 將增量套用到舊的完整資料後與最新的完整資料相同
+6. 無效的 since 返回 400；刪除房間不受變動記錄影響
+7. 只保留最近 N 個版本的變動記錄；since 早於已清除的版本時返回完整資料
+"""
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, RoomChange, Score
+from scoring.tests.test_helpers import TestDataFactory
+
+
+def apply_delta(state, delta):
+    """以與前端相同的規則把增量套用到完整資料"""
+    deleted_members = set(delta['deleted_members'])
+    members = {member['id']: member for member in state['members'] if member['id'] not in deleted_members}
+    members.update((member['id'], member) for member in delta['members'])
+
+    routes = {route['id']: route for route in state['routes'] if route['id'] not in set(delta['deleted_routes'])}
+    routes.update((route['id'], route) for route in delta['routes'])
+    merged_routes = []
+    for route in routes.values():
+        scores = {
+            score['id']: score for score in route['scores']
+            if score['member_id'] not in deleted_members and score['id'] not in set(delta['deleted_scores'])
+        }
+        for score in delta['scores']:
+            if score['route_id'] == route['id']:
+                scores[score['id']] = {key: value for key, value in score.items() if key != 'route_id'}
+        merged_routes.append({**route, 'scores': sorted(scores.values(), key=lambda score: score['id'])})
+    return {
+        'members': sorted(members.values(), key=lambda member: member['id']),
+        'routes': sorted(merged_routes, key=lambda route: route['id']),
+        'version': delta['version'],
+    }
+
+
+def normalize(detail):
+    """只保留可比較的部分（按 ID 排序）"""
+    return {
+        'members': sorted(detail['members'], key=lambda member: member['id']),
+        'routes': sorted(
+            [{**route, 'scores': sorted(route['scores'], key=lambda score: score['id'])} for route in detail['routes']],
+            key=lambda route: route['id'],
+        ),
+        'version': detail['version'],
+    }
+
+
+class TestCaseRoomDeltaSync(TestCase):
+    """測試房間詳情的增量同步"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = TestDataFactory.create_room("增量房間")
+        self.members = TestDataFactory.create_normal_members(self.room, count=4)
+        for index in range(3):
+            self.client.post(f'/api/rooms/{self.room.id}/routes/', {
+                'name': f'路線{index + 1}', 'grade': 'V3',
+                'member_completions': {str(self.members[0].id): True},
+            }, format='json')
+        self.url = f'/api/rooms/{self.room.id}/'
+        self.full = self.client.get(self.url).data
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def delta(self):
+        response = self.client.get(self.url, {'since': self.full['version']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_version_and_empty_delta(self):
+        """測試：詳情包含 version，沒有變動時增量為空"""
+        self.assertGreater(self.full['version'], 0)
+        delta = self.delta()
+        self.assertEqual(delta['version'], self.full['version'])
+        for key in ['members', 'routes', 'scores', 'deleted_members', 'deleted_routes', 'deleted_scores']:
+            self.assertEqual(len(delta[key]), 0, key)
+
+    def test_score_toggle(self):
+        """測試：切換一筆成績只返回該成績與總分或名次變動的成員"""
+        score = Score.objects.get(member=self.members[1], route__name='路線1')
+        response = self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        delta = self.delta()
+        self.assertGreater(delta['version'], self.full['version'])
+        self.assertEqual(delta['routes'], [])
+        self.assertIn(score.id, [item['id'] for item in delta['scores']])
+        self.assertTrue(next(item for item in delta['scores'] if item['id'] == score.id)['is_completed'])
+        # 只返回總分或名次有變動的成員
+        before = {member['id']: member for member in self.full['members']}
+        self.assertIn(self.members[1].id, [member['id'] for member in delta['members']])
+        for member in delta['members']:
+            old = before[member['id']]
+            self.assertNotEqual((old['total_score'], old['rank']), (member['total_score'], member['rank']))
+        self.assertLess(len(delta['scores']), sum(len(route['scores']) for route in self.full['routes']))
+        self.assertEqual(normalize(apply_delta(self.full, delta)), normalize(self.client.get(self.url).data))
+
+    def test_route_update_and_batch(self):
+        """測試：修改路線與批量更新成績"""
+        route_id = self.full['routes'][1]['id']
+        self.client.patch(f'/api/routes/{route_id}/', {
+            'name': '改名路線', 'grade': 'V5',
+            'member_completions': {str(member.id): True for member in self.members},
+        }, format='json')
+        other_route = self.full['routes'][2]['id']
+        response = self.client.post(f'{self.url}scores/batch/', {'changes': [
+            {'member_id': self.members[3].id, 'route_id': other_route, 'is_completed': True},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        delta = self.delta()
+        self.assertIn(route_id, [route['id'] for route in delta['routes']])
+        self.assertEqual(next(route for route in delta['routes'] if route['id'] == route_id)['name'], '改名路線')
+        # 整條返回的路線的成績不重複列出
+        self.assertNotIn(route_id, {score['route_id'] for score in delta['scores']})
+        self.assertIn(other_route, {score['route_id'] for score in delta['scores']})
+        self.assertEqual(normalize(apply_delta(self.full, delta)), normalize(self.client.get(self.url).data))
+
+    def test_deletions(self):
+        """測試：刪除成員、路線與成績"""
+        removed_member = self.members[2]
+        removed_route = self.full['routes'][0]['id']
+        removed_score = Score.objects.get(member=self.members[3], route__name='路線3')
+        self.assertEqual(self.client.delete(f'/api/members/{removed_member.id}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(f'/api/routes/{removed_route}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(f'/api/scores/{removed_score.id}/').status_code, status.HTTP_204_NO_CONTENT)
+
+        delta = self.delta()
+        self.assertEqual(delta['deleted_members'], [removed_member.id])
+        self.assertEqual(delta['deleted_routes'], [removed_route])
+        self.assertIn(removed_score.id, delta['deleted_scores'])
+        self.assertEqual(normalize(apply_delta(self.full, delta)), normalize(self.client.get(self.url).data))
+
+    def test_invalid_since(self):
+        """測試：無效的 since 返回 400，比目前版本新的 since 返回完整資料"""
+        for value in ['abc', '-1', '1.5']:
+            with self.subTest(since=value):
+                self.assertEqual(self.client.get(self.url, {'since': value}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'since': self.full['version'] + 100})
+        self.assertNotIn('since', response.data)
+        self.assertEqual(len(response.data['members']), 4)
+
+    def test_room_delete(self):
+        """測試：刪除房間時不記錄成員與路線的刪除"""
+        self.assertEqual(self.client.delete(self.url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(RoomChange.objects.filter(room_id=self.room.id).exists())
+
+    @override_settings(SCORING_CHANGE_LOG_RETENTION=2)
+    def test_retention_falls_back_to_full_payload(self):
+        """測試：舊的變動記錄被清除，since 早於保留範圍時返回完整資料"""
+        score = Score.objects.get(member=self.members[1], route__name='路線1')
+        for index in range(6):
+            response = self.client.patch(f'/api/scores/{score.id}/', {'is_completed': index % 2 == 0}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        room = Room.objects.get(id=self.room.id)
+        self.assertGreater(room.change_log_floor, self.full['version'])
+        self.assertFalse(RoomChange.objects.filter(room=room, version__lte=room.change_log_floor).exists())
+        self.assertLessEqual(room.scores_version - room.change_log_floor, 4)
+
+        # 早於保留範圍的 since：返回完整資料
+        response = self.client.get(self.url, {'since': self.full['version']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('since', response.data)
+        latest = self.client.get(self.url).data
+        self.assertEqual(normalize(response.data), normalize(latest))
+
+        # 保留範圍內的 since：仍返回增量
+        response = self.client.get(self.url, {'since': room.change_log_floor})
+        self.assertEqual(response.data['since'], room.change_log_floor)
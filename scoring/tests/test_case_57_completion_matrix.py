@@ -0,0 +1,114 @@
+"""
+精簡完成矩陣測試（GET /api/rooms/{id}/matrix/）
+
+測試項目：
+1. 成員按名次、路線按建立時間各列出一次，解碼後的完成狀態與房間詳情的成績相同
+2. 由路線分數與 L 還原每筆成績的分數，與資料庫中的 score_attained 相同
+3. 位元集合打包與還原（CompletionMatrix.to_bytes / from_bytes）
+4. 大房間的回應比房間詳情小一個數量級，查詢數與房間大小無關
+5. 支援 If-None-Match 條件式 GET；房間不存在時返回 404
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from scoring.models import Room, Score, update_scores
+from scoring.scoring_kernel import CompletionMatrix
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+def decode(data):
+    """以文件中的方式解碼：返回 {(成員ID, 路線ID): 是否完成}"""
+    completions = data['completions']
+    packed = base64.b64decode(completions['data'])
+    row_bytes = completions['row_bytes']
+    return {
+        (member['id'], route['id']): bool(packed[i * row_bytes + (j >> 3)] & (1 << (j & 7)))
+        for i, member in enumerate(data['members'])
+        for j, route in enumerate(data['routes'])
+    }
+
+
+class TestCaseCompletionMatrix(TestCase):
+    """測試精簡完成矩陣"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.room = build_room("矩陣房間", 5, 2, 11, 0.5, seed=3)
+        update_scores(self.room.id)
+        self.url = f'/api/rooms/{self.room.id}/matrix/'
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def test_matches_room_detail(self):
+        """測試：解碼後的完成狀態與房間詳情相同"""
+        data = self.client.get(self.url).data
+        detail = self.client.get(f'/api/rooms/{self.room.id}/').data
+
+        self.assertEqual([route['id'] for route in data['routes']], [route['id'] for route in detail['routes']])
+        leaderboard = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/').data['leaderboard']
+        self.assertEqual([member['id'] for member in data['members']], [member['id'] for member in leaderboard])
+        self.assertEqual(data['completions']['row_bytes'], 2)
+        self.assertEqual(data['version'], detail['version'])
+
+        expected = {
+            (score['member_id'], route['id']): score['is_completed']
+            for route in detail['routes'] for score in route['scores']
+        }
+        self.assertEqual(decode(data), expected)
+
+    def test_scores_can_be_rebuilt(self):
+        """測試：由路線分數與 L 還原每筆成績的分數"""
+        data = self.client.get(self.url).data
+        line_score = Decimal(data['standard_line_score'])
+        routes = {route['id']: Decimal(route['score']) for route in data['routes']}
+        custom = {member['id']: member['is_custom_calc'] for member in data['members']}
+
+        for (member_id, route_id), completed in decode(data).items():
+            expected = (line_score if custom[member_id] else routes[route_id]) if completed else Decimal('0')
+            with self.subTest(member_id=member_id, route_id=route_id):
+                self.assertEqual(
+                    Score.objects.get(member_id=member_id, route_id=route_id).score_attained, expected
+                )
+
+    def test_bitset_round_trip(self):
+        """測試：位元集合打包與還原"""
+        matrix = CompletionMatrix.from_lists(
+            [[True] * 9, [False] * 9, [j % 2 == 0 for j in range(9)]], [False, True, False]
+        )
+        packed = matrix.to_bytes()
+        self.assertEqual(packed, bytes([0xff, 0x01, 0x00, 0x00, 0x55, 0x01]))
+        self.assertEqual(CompletionMatrix.from_bytes(packed, [False, True, False], 9).rows, matrix.rows)
+        with self.assertRaises(ValueError):
+            CompletionMatrix.from_bytes(packed[:-1], [False, True, False], 9)
+        self.assertEqual(CompletionMatrix([], [], 0).to_bytes(), b'')
+
+    def test_payload_size_and_queries(self):
+        """測試：大房間的回應比房間詳情小一個數量級，查詢數與房間大小無關"""
+        counts = []
+        for index, (members, routes) in enumerate([(5, 5), (40, 80)]):
+            room = build_room(f"大房間{index}", members, 0, routes, 0.5, seed=index)
+            update_scores(room.id)
+            with CaptureQueriesContext(connection) as queries:
+                compact = self.client.get(f'/api/rooms/{room.id}/matrix/')
+            counts.append(len(queries.captured_queries))
+        full = self.client.get(f'/api/rooms/{room.id}/')
+        self.assertEqual(counts[0], counts[1])
+        self.assertLess(len(compact.content) * 10, len(full.content))
+        self.assertEqual(len(json.loads(compact.content)['members']), 40)
+
+    def test_conditional_get(self):
+        """測試：ETag 相符時返回 304；房間不存在時返回 404"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertNotEqual(response['ETag'], self.client.get(f'/api/rooms/{self.room.id}/')['ETag'])
+        self.assertEqual(self.client.get('/api/rooms/999999/matrix/').status_code, status.HTTP_404_NOT_FOUND)
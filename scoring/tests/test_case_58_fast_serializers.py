@@ -0,0 +1,119 @@
+"""
+房間詳情與排行榜的快速序列化測試
+
+測試項目：
+1. room_detail_data 的 JSON 輸出與 RoomSerializer 逐位元組相同（照片、舊版網址、客製化組、尚未計分的成員、空房間）
+2. leaderboard_data 的 JSON 輸出與 LeaderboardSerializer 逐位元組相同
+3. 房間詳情 API 使用快速路徑，查詢數與成員數、路線數無關
+4. RoomSerializer 每條路線只序列化一次
+5. 增量同步與完成矩陣的 created_at 格式與房間詳情相同
+6. serializer_savings 由基準結果計算每個請求節省的 CPU 時間
+"""
+from unittest import mock
+
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from scoring.benchmark import serializer_savings
+from scoring.fast_serializers import leaderboard_data, room_detail_data
+from scoring.models import Member, Room, Route, annotate_completed_routes, order_by_rank, update_scores
+from scoring.serializers import LeaderboardSerializer, RoomSerializer, RouteSerializer
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+from scoring.tests.test_helpers import TestDataFactory
+
+
+def room_versions(room):
+    return Room.objects.values('id', 'name', 'standard_line_score', 'created_at', 'scores_version').get(id=room.id)
+
+
+class TestCaseFastSerializers(TestCase):
+    """測試快速序列化與序列化器的輸出一致"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.request = APIRequestFactory().get('/')
+        self.room = build_room("快速房間", 6, 2, 7, 0.5, seed=8)
+        update_scores(self.room.id)
+        routes = list(Route.objects.filter(room=self.room))
+        Route.objects.filter(id=routes[0].id).update(photo='route_photos/wall.jpg')
+        Route.objects.filter(id=routes[1].id).update(photo_url='https://example.com/legacy.jpg')
+        # 尚未計分的成員（名次為 null）
+        TestDataFactory.create_normal_members(self.room, count=1, names=["新成員"])
+
+    def tearDown(self):
+        Room.objects.all().delete()
+
+    def serializer_bytes(self, room, request=None):
+        instance = Room.objects.prefetch_related(
+            'routes__scores__member',
+            Prefetch('members', queryset=annotate_completed_routes(Member.objects.order_by(*Member._meta.ordering))),
+        ).get(id=room.id)
+        context = {'request': request} if request else {}
+        return JSONRenderer().render(RoomSerializer(instance, context=context).data)
+
+    def test_room_detail_identical(self):
+        """測試：房間詳情與 RoomSerializer 逐位元組相同"""
+        empty = TestDataFactory.create_room("空房間")
+        for room in [self.room, empty]:
+            for request in [self.request, None]:
+                with self.subTest(room=room.name, request=request is not None):
+                    self.assertEqual(
+                        JSONRenderer().render(room_detail_data(room_versions(room), request)),
+                        self.serializer_bytes(room, request),
+                    )
+
+    def test_leaderboard_identical(self):
+        """測試：排行榜與 LeaderboardSerializer 逐位元組相同"""
+        room_info = {'name': self.room.name, 'standard_line_score': 420, 'id': self.room.id}
+        members = order_by_rank(annotate_completed_routes(Member.objects.filter(room_id=self.room.id)))
+        self.assertEqual(
+            JSONRenderer().render(leaderboard_data(room_info, self.room.id)),
+            JSONRenderer().render(LeaderboardSerializer({'room_info': room_info, 'leaderboard': members}).data),
+        )
+
+    def test_api_uses_fast_path(self):
+        """測試：房間詳情 API 的輸出相同，查詢數與房間大小無關"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/')
+        self.assertEqual(response.content, self.serializer_bytes(self.room, response.wsgi_request))
+
+        counts = []
+        for index, (members, routes) in enumerate([(3, 2), (20, 30)]):
+            room = build_room(f"查詢房間{index}", members, 1, routes, 0.5, seed=index)
+            update_scores(room.id)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f'/api/rooms/{room.id}/')
+            counts.append(len(queries.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_routes_serialized_once(self):
+        """測試：RoomSerializer 每條路線只序列化一次"""
+        instance = Room.objects.prefetch_related('routes__scores__member', 'members').get(id=self.room.id)
+        with mock.patch.object(
+            RouteSerializer, 'to_representation', autospec=True, side_effect=RouteSerializer.to_representation
+        ) as to_representation:
+            RoomSerializer(instance).data
+        self.assertEqual(to_representation.call_count, 7)
+
+    def test_created_at_format_consistent(self):
+        """測試：增量同步與完成矩陣的 created_at 與房間詳情相同"""
+        detail = self.client.get(f'/api/rooms/{self.room.id}/').data
+        delta = self.client.get(f'/api/rooms/{self.room.id}/', {'since': detail['version']}).data
+        matrix = self.client.get(f'/api/rooms/{self.room.id}/matrix/').data
+        self.assertEqual(delta['created_at'], detail['created_at'])
+        self.assertEqual(matrix['created_at'], detail['created_at'])
+
+    def test_serializer_savings(self):
+        """測試：由基準結果計算節省的 CPU 時間"""
+        results = {
+            'serialize_room': {'cpu_ms_median': 30.0},
+            'serialize_room_fast': {'cpu_ms_median': 6.0},
+            'serialize_leaderboard': {'skipped': '測試'},
+            'serialize_leaderboard_fast': {'cpu_ms_median': 1.0},
+        }
+        self.assertEqual(serializer_savings(results), {
+            'room_detail': {'serializer_cpu_ms': 30.0, 'fast_cpu_ms': 6.0, 'saved_cpu_ms': 24.0, 'speedup': 5.0},
+        })
@@ -0,0 +1,136 @@
+"""
+預先渲染回應快取測試（房間詳情與排行榜）
+
+測試項目：
+1. 同一版本的第二次讀取命中快取，只讀取房間版本，不查詢成員、路線與成績
+2. Accept-Encoding: gzip 時返回壓縮版本（Content-Encoding、Vary），解壓縮後與未壓縮的回應相同
+3. 資料變動後讀到新的內容，舊版本的項目被移除
+4. 總大小超過上限時淘汰最久未使用的項目；上限為 0 時停用
+5. 命中 / 未命中 / 淘汰次數
+6. 安裝 Brotli 時支援 br 編碼
+"""
+import gzip
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from scoring import payload_cache as payload_cache_module
+from scoring.models import Room, Score, update_scores
+from scoring.payload_cache import BROTLI_AVAILABLE, PayloadCache, payload_cache
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+class TestCasePayloadCache(TestCase):
+    """測試房間詳情與排行榜的回應位元組快取"""
+
+    def setUp(self):
+        payload_cache.clear()
+        self.client = APIClient()
+        self.room = build_room("快取房間", 6, 1, 8, 0.5, seed=4)
+        update_scores(self.room.id)
+        self.detail_url = f'/api/rooms/{self.room.id}/'
+        self.leaderboard_url = f'/api/rooms/{self.room.id}/leaderboard/'
+
+    def tearDown(self):
+        payload_cache.clear()
+        Room.objects.all().delete()
+
+    def test_hit_skips_queries(self):
+        """測試：第二次讀取命中快取，只讀取房間版本"""
+        for url in [self.detail_url, self.leaderboard_url]:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as miss_queries:
+                    first = self.client.get(url)
+                with CaptureQueriesContext(connection) as hit_queries:
+                    second = self.client.get(url)
+                self.assertEqual(first['X-Payload-Cache'], 'MISS')
+                self.assertEqual(second['X-Payload-Cache'], 'HIT')
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second.data, first.data)
+                self.assertEqual(len(hit_queries.captured_queries), 1)
+                self.assertLess(len(hit_queries.captured_queries), len(miss_queries.captured_queries))
+
+    def test_gzip_variant(self):
+        """測試：gzip 版本與未壓縮的回應相同"""
+        plain = self.client.get(self.detail_url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        compressed = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(int(compressed['Content-Length']), len(compressed.content))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertLess(len(compressed.content), len(plain.content))
+        # 已渲染的 JSON 被沿用，第二次要求 gzip 時命中
+        self.assertEqual(
+            self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip')['X-Payload-Cache'], 'HIT'
+        )
+        self.assertEqual(compressed['ETag'], plain['ETag'])
+
+    def test_write_changes_content(self):
+        """測試：資料變動後讀到新內容，舊版本的項目被移除"""
+        before = self.client.get(self.detail_url)
+        score = Score.objects.filter(route__room=self.room, is_completed=False).first()
+        self.client.patch(f'/api/scores/{score.id}/', {'is_completed': True}, format='json')
+
+        after = self.client.get(self.detail_url)
+        self.assertEqual(after['X-Payload-Cache'], 'MISS')
+        self.assertNotEqual(after.content, before.content)
+        self.assertEqual(payload_cache.stats()['entries'], 1)
+
+    def test_lru_eviction_and_disable(self):
+        """測試：超過上限時淘汰最久未使用的項目；上限為 0 時停用"""
+        size = len(self.client.get(self.detail_url).content)
+        other = build_room("另一個房間", 6, 1, 8, 0.5, seed=5)
+        update_scores(other.id)
+        payload_cache.clear()
+
+        with override_settings(SCORING_PAYLOAD_CACHE_MAX_BYTES=int(size * 1.5)):
+            self.client.get(self.detail_url)
+            self.client.get(f'/api/rooms/{other.id}/')
+            stats = payload_cache.stats()
+            self.assertEqual((stats['entries'], stats['evictions']), (1, 1))
+            self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+            self.assertEqual(self.client.get(self.detail_url)['X-Payload-Cache'], 'MISS')
+
+        payload_cache.clear()
+        with override_settings(SCORING_PAYLOAD_CACHE_MAX_BYTES=0):
+            self.client.get(self.detail_url)
+            self.assertEqual(self.client.get(self.detail_url)['X-Payload-Cache'], 'MISS')
+            self.assertEqual(payload_cache.stats()['entries'], 0)
+
+    def test_counters(self):
+        """測試：命中與未命中次數"""
+        self.client.get(self.leaderboard_url)
+        self.client.get(self.leaderboard_url)
+        self.client.get(self.leaderboard_url)
+        stats = payload_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_group_keeps_latest_version(self):
+        """測試：同一房間同一端點只保留最新版本"""
+        cache = PayloadCache()
+        cache.put(('room', 1), ('"v1"', 'application/json'), 'identity', b'a' * 10, b'a' * 10)
+        cache.put(('room', 1), ('"v2"', 'application/json'), 'identity', b'b' * 20, b'b' * 20)
+        cache.put(('room', 2), ('"v1"', 'application/json'), 'identity', b'c' * 30, b'c' * 30)
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.stats()['bytes'], 50)
+
+    @skipUnless(BROTLI_AVAILABLE, '未安裝 Brotli')
+    def test_brotli_variant(self):
+        """測試：安裝 Brotli 時優先返回 br 編碼"""
+        import brotli
+        plain = self.client.get(self.detail_url)
+        response = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_gzip_when_brotli_missing(self):
+        """測試：未安裝 Brotli 時 br 請求退回 gzip"""
+        with mock.patch.object(payload_cache_module, 'BROTLI_AVAILABLE', False):
+            response = self.client.get(self.detail_url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
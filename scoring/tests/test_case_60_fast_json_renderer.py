@@ -0,0 +1,138 @@
+"""
+快速 JSON 渲染器（FastJSONRenderer）測試
+
+測試項目：
+1. 房間詳情與排行榜回應資料的輸出與 JSONRenderer 逐位元組相同
+2. Decimal、datetime（微秒、UTC 'Z'）、date、time、延遲翻譯字串、整數鍵、U+2028 / U+2029 的輸出相同
+3. 要求縮排、orjson 無法編碼的值（超過 64 位元的整數）時改用 JSONRenderer；無法序列化的物件拋出相同的錯誤
+4. 安裝 orjson 時不經過 JSONRenderer；未安裝時與 JSONRenderer 相同
+5. API 預設使用 FastJSONRenderer，回應內容不變
+6. renderer_comparison 記錄兩種渲染的 CPU 時間與輸出是否相同
+"""
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from scoring import renderers as renderers_module
+from scoring.benchmark import renderer_comparison
+from scoring.fast_serializers import leaderboard_data, room_detail_data
+from scoring.models import Room, update_scores
+from scoring.payload_cache import payload_cache
+from scoring.renderers import ORJSON_AVAILABLE, FastJSONRenderer
+from scoring.tests.test_case_36_bulk_recompute_engine import build_room
+
+
+def room_versions(room):
+    return Room.objects.values('id', 'name', 'standard_line_score', 'created_at', 'scores_version').get(id=room.id)
+
+
+class TestCaseFastJSONRenderer(TestCase):
+    """測試 FastJSONRenderer 與 JSONRenderer 的輸出一致"""
+
+    def setUp(self):
+        payload_cache.clear()
+        self.client = APIClient()
+        self.room = build_room("渲染房間", 6, 2, 7, 0.5, seed=6)
+        update_scores(self.room.id)
+
+    def tearDown(self):
+        payload_cache.clear()
+        Room.objects.all().delete()
+
+    def assertSameBytes(self, data, accepted_media_type=None, renderer_context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type, renderer_context),
+            JSONRenderer().render(data, accepted_media_type, renderer_context),
+        )
+
+    def test_room_payloads_identical(self):
+        """測試：房間詳情與排行榜的輸出相同"""
+        room_info = {'name': self.room.name, 'standard_line_score': 420, 'id': self.room.id}
+        self.assertSameBytes(room_detail_data(room_versions(self.room)))
+        self.assertSameBytes(leaderboard_data(room_info, self.room.id))
+
+    def test_value_types_identical(self):
+        """測試：orjson 不直接支援的型別由 DRF 的 JSONEncoder 轉換"""
+        aware = timezone.make_aware(datetime.datetime(2026, 3, 1, 9, 30, 15, 123456), datetime.timezone.utc)
+        data = {
+            'decimal': Decimal('12.50'),
+            'decimals': [Decimal('0.1'), Decimal('1E+2'), Decimal('-3.333')],
+            'utc': aware,
+            'local': timezone.localtime(aware),
+            'naive': datetime.datetime(2026, 3, 1, 9, 30),
+            'date': datetime.date(2026, 3, 1),
+            'time': datetime.time(9, 30, 0, 500),
+            'duration': datetime.timedelta(minutes=90),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('房間'),
+            'separators': '路線 名稱 ',
+            'control': '\x00\t\n"\\/',
+            'int_keys': {1: 'a', 2: 'b'},
+            'tuple': (1, 2),
+            'float': 1.5,
+            'empty': {},
+        }
+        self.assertSameBytes(data)
+        self.assertSameBytes([data, data])
+
+    def test_fallbacks(self):
+        """測試：要求縮排或 orjson 無法編碼時改用 JSONRenderer"""
+        data = {'name': '房間', 'score': Decimal('1.00')}
+        self.assertSameBytes(data, 'application/json; indent=4')
+        self.assertSameBytes(data, 'application/json', {'indent': 2})
+        self.assertIn(b'\n', FastJSONRenderer().render(data, 'application/json; indent=4'))
+        self.assertSameBytes({'big': 2 ** 70})
+        self.assertSameBytes(None)
+
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'object': object()})
+
+    @skipUnless(ORJSON_AVAILABLE, '未安裝 orjson')
+    def test_orjson_path(self):
+        """測試：安裝 orjson 時不經過 JSONRenderer"""
+        data = room_detail_data(room_versions(self.room))
+        expected = JSONRenderer().render(data)
+        with mock.patch.object(JSONRenderer, 'render', side_effect=AssertionError('不應改用 JSONRenderer')):
+            self.assertEqual(FastJSONRenderer().render(data, 'application/json'), expected)
+
+    def test_without_orjson(self):
+        """測試：未安裝 orjson 時與 JSONRenderer 相同"""
+        data = room_detail_data(room_versions(self.room))
+        with mock.patch.object(renderers_module, 'ORJSON_AVAILABLE', False):
+            self.assertSameBytes(data)
+            response = self.client.get(f'/api/rooms/{self.room.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_api_uses_fast_renderer(self):
+        """測試：API 預設使用 FastJSONRenderer，回應內容與 JSONRenderer 相同"""
+        response = self.client.get(f'/api/rooms/{self.room.id}/')
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(room_detail_data(room_versions(self.room))))
+
+        response = self.client.get(f'/api/rooms/{self.room.id}/leaderboard/')
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        self.assertEqual(self.client.get('/api/rooms/999999/').status_code, 404)
+
+    @skipUnless(ORJSON_AVAILABLE, '未安裝 orjson')
+    def test_renderer_comparison(self):
+        """測試：基準記錄兩種渲染的 CPU 時間與輸出是否相同"""
+        comparison = renderer_comparison({'room_detail': room_detail_data(room_versions(self.room))}, repeat=1)
+        self.assertEqual(
+            set(comparison['room_detail']), {'bytes', 'json_cpu_ms', 'fast_cpu_ms', 'speedup', 'identical'}
+        )
+        self.assertTrue(comparison['room_detail']['identical'])
+
+    def test_renderer_comparison_without_orjson(self):
+        """測試：未安裝 orjson 時略過渲染對照"""
+        with mock.patch.object(renderers_module, 'ORJSON_AVAILABLE', False):
+            self.assertIn('skipped', renderer_comparison({'room_detail': {}}, repeat=1))
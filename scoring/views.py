@@ -1,16 +1,41 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
-from django.shortcuts import get_object_or_404, render
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny, SAFE_METHODS
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from django.utils.html import escape
 from django.conf import settings
 from django.views.decorators.csrf import ensure_csrf_cookie
 import logging
-from .models import Room, Member, Route, Score, update_scores
+from .models import (
+    Room, Member, Route, RoomChange, Score, annotate_completed_routes, annotate_room_summary, order_by_rank,
+    record_changes,
+)
+from .recompute import request_recompute, ensure_all_scores_fresh, ensure_scores_fresh, recompute_after_batch
+from .simulation import load_room_snapshot, simulate_completions
+from .history import member_rank_series, standings_as_of
+from .cache import get_cached_leaderboard, room_etag
+from .leaderboard import leaderboard_page
+from .delta import build_room_delta, can_build_delta
+from .matrix import build_room_matrix
+from .fast_serializers import leaderboard_data, room_detail_data
+from .payload_cache import prerendered_response
+from .pagination import RoomListPagination
+from .events import BUSY_RETRY_AFTER, SlotStream, room_events, stream_slots
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .scoring_kernel import cents_to_decimal
 from .serializers import (
     RoomSerializer, MemberSerializer, RouteSerializer,
-    RouteCreateSerializer, RouteUpdateSerializer, LeaderboardSerializer, ScoreUpdateSerializer
+    RouteCreateSerializer, RouteUpdateSerializer, ScoreUpdateSerializer,
+    ScoreBatchSerializer, SimulationSerializer, LeaderboardQuerySerializer, RoomSummarySerializer
 )
 from .permissions import IsAuthenticatedOrReadOnlyForCreate
 from .utils import get_log_file_path, get_logs_directory, get_platform_info, is_mobile_device
@@ -75,35 +100,178 @@ def get_dynamic_permissions(viewset_instance):
     return permissions_list
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+def parse_timestamp_param(request, name):
+    """
+    解析查詢參數中的 ISO 8601 時間（未指定時區時視為目前時區）
+
+    返回:
+        tuple: (datetime 或 None, 錯誤訊息 Response 或 None)
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return None, None
+    try:
+        timestamp = parse_datetime(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        return None, Response(
+            {name: [f'時間格式錯誤: {value}（應為 ISO 8601，例如 2024-01-01T12:00:00）']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp, None
+
+
+class FreshScoresMixin:
+    """
+    讀取請求（GET/HEAD/OPTIONS）在執行前確保分數為最新
+    coalesce 重算模式下，房間可能仍有待重算的標記，讀取前先完成重算；
+    lazy 模式下讀取是唯一觸發重算的時機
+
+    列表可用 ?room=<id> 只列出單一房間的資料，只需確保該房間為最新；
+    未指定房間的列表包含所有房間，讀取前重算所有待重算或落後的房間
+    """
+
+    # 不讀取資料庫中分數的 action（例如由快照自行計分的模擬），不需要先重算
+    fresh_scores_exempt_actions = ()
+    # 物件所屬房間的欄位（例如 'room_id'、'member__room_id'），用於單一物件的讀取請求與列表的 ?room= 篩選
+    fresh_scores_room_field = None
+
+    def get_room_filter(self):
+        """解析列表的 ?room= 查詢參數，未提供時返回 None"""
+        value = self.request.query_params.get('room')
+        if self.action != 'list' or self.fresh_scores_room_field is None or value is None:
+            return None
+        if not value.isdigit():
+            raise ValidationError({'room': [f'房間 ID 格式錯誤: {value}']})
+        return int(value)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        room_id = self.get_room_filter()
+        if room_id is not None:
+            queryset = queryset.filter(**{self.fresh_scores_room_field: room_id})
+        return queryset
+
+    def get_fresh_scores_room_id(self):
+        """
+        返回需要確保最新的房間 ID（單一物件的讀取請求為該物件所屬的房間，列表為 ?room= 指定的房間）
+
+        找不到物件時返回 None，不重算
+        """
+        if self.action == 'list':
+            return self.get_room_filter()
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is None or self.fresh_scores_room_field is None:
+            return None
+        try:
+            return self.queryset.model.objects.filter(**{self.lookup_field: lookup}).values_list(
+                self.fresh_scores_room_field, flat=True
+            ).first()
+        except (TypeError, ValueError):
+            return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS or getattr(self, 'action', None) in self.fresh_scores_exempt_actions:
+            return
+        room_id = self.get_fresh_scores_room_id()
+        if room_id is None and self.action == 'list':
+            ensure_all_scores_fresh()
+        else:
+            ensure_scores_fresh(room_id)
+
+
+class RoomViewSet(FreshScoresMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
+    # 房間列表只有摘要（成員數、路線數），不包含分數
+    fresh_scores_exempt_actions = ('list', 'simulate', 'events')
+    # 只有列表（摘要）分頁；完整的成員、路線與成績在進入房間時以房間詳情取得
+    pagination_class = RoomListPagination
     # 使用 settings.py 中的默認權限設置（開發環境為 AllowAny）
     
     def get_permissions(self):
         """獲取權限類（動態讀取設置，支持 @override_settings）"""
         return get_dynamic_permissions(self)
     
+    def get_fresh_scores_room_id(self):
+        """房間詳情、排行榜、PDF 導出只需確保該房間的分數為最新"""
+        return self.kwargs.get('pk')
+    
     def get_queryset(self):
-        """確保查詢時預加載相關數據"""
+        """確保查詢時預加載相關數據（成員帶有完成路線數註解，序列化時不需逐一查詢）"""
+        if self.action == 'list':
+            # 房間列表只需要摘要，成員數與路線數以子查詢取得
+            return annotate_room_summary(Room.objects.all())
+        # 含聚合的查詢不套用 Meta.ordering，成員順序需明確指定（與 scoring.fast_serializers 相同）
         return Room.objects.prefetch_related(
             'routes__scores__member',
-            'members'
+            Prefetch('members', queryset=annotate_completed_routes(Member.objects.order_by(*Member._meta.ordering)))
         ).all()
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return RoomSummarySerializer
+        return super().get_serializer_class()
+
+    # 條件式 GET 需要的房間版本欄位
+    VERSION_FIELDS = (
+        'id', 'name', 'standard_line_score', 'created_at', 'updated_at', 'data_version', 'scores_version',
+        'change_log_floor',
+    )
+
+    def get_room_versions(self):
+        """只讀取房間的版本資訊（不預取路線與成績）"""
+        return get_object_or_404(Room.objects.values(*self.VERSION_FIELDS), pk=self.kwargs.get('pk'))
+
+    def not_modified_response(self, request, etag, room):
+        """If-None-Match 與目前的 ETag 相符時返回 304，在任何序列化工作之前結束請求"""
+        if etag is None:
+            return None
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            self.add_validators(response, etag, room)
+        return response
+
+    def add_validators(self, response, etag, room):
+        """加上 ETag / Last-Modified，並要求瀏覽器每次使用前向伺服器重新驗證"""
+        if etag is not None:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(room['updated_at'].timestamp())
+        response['Cache-Control'] = 'no-cache'
+        return response
+
     def retrieve(self, request, *args, **kwargs):
-        """獲取房間詳情，確保數據最新"""
-        instance = self.get_object()
-        
-        # 強制清除可能的緩存，重新查詢並預取相關數據
-        instance.refresh_from_db()
-        instance = Room.objects.prefetch_related(
-            'routes__scores__member',
-            'members'
-        ).get(pk=instance.pk)
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        """
+        獲取房間詳情，確保數據最新（支援 If-None-Match 條件式 GET）
+
+        查詢參數：
+            since: 用戶端已有的 version，只返回之後變動的成員、路線與成績（見 scoring.delta）
+        """
+        room = self.get_room_versions()
+        etag = room_etag(room, 'room', request)
+        not_modified = self.not_modified_response(request, etag, room)
+        if not_modified is not None:
+            return not_modified
+
+        since = request.query_params.get('since')
+        if since is not None:
+            if not since.isdigit():
+                return Response({'since': [f'版本格式錯誤: {since}']}, status=status.HTTP_400_BAD_REQUEST)
+            # 版本比房間目前的版本新（例如資料庫已重建）、或之後的變動記錄已被清除時返回完整資料
+            if can_build_delta(room, int(since)):
+                delta = build_room_delta(room, int(since), self.get_serializer_context())
+                return self.add_validators(Response(delta), etag, room)
+
+        # 以 .values() 直接組成與 RoomSerializer 相同的輸出（見 scoring.fast_serializers），查詢數與成員數無關；
+        # 同一版本的回應位元組（含壓縮版本）保存在程序內的快取中（見 scoring.payload_cache）
+        response = prerendered_response(
+            request, ('room', room['id']), etag, lambda: room_detail_data(room, request), self.get_renderer_context()
+        )
+        return self.add_validators(response, etag, room)
 
     def create(self, request, *args, **kwargs):
         """創建房間"""
@@ -121,7 +289,7 @@ class RoomViewSet(viewsets.ModelViewSet):
             room = serializer.save()
             # 創建房間後自動計算standard_line_score
             # 注意：如果房間剛創建還沒有成員，會使用默認值12
-            update_scores(room.id)
+            request_recompute(room.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -142,31 +310,71 @@ class RoomViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             # 更新後自動重新計算分數（會自動更新standard_line_score）
-            update_scores(room.id)
+            request_recompute(room.id)
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'], url_path='leaderboard')
     def leaderboard(self, request, pk=None):
-        """獲取排行榜"""
-        room = self.get_object()
-        
-        # 按總分降序排序
-        members = room.members.all().order_by('-total_score', 'name')
-        
+        """
+        獲取排行榜（以房間的資料版本為鍵快取，見 scoring.cache；支援 If-None-Match 條件式 GET）
+
+        查詢參數（見 scoring.leaderboard，提供任一參數時只返回一頁，回應另含 count 與 next）：
+            limit: 返回的成員數（預設 20）
+            around: 以此成員為中心
+            cursor: 上一頁回應的 next
+        """
+        # 只讀取版本資訊，版本未變或命中快取時不需要載入成員
+        room = self.get_room_versions()
+        etag = room_etag(room, 'leaderboard', request)
+        not_modified = self.not_modified_response(request, etag, room)
+        if not_modified is not None:
+            return not_modified
+
         room_info = {
-            'name': room.name,
-            'standard_line_score': room.standard_line_score,
-            'id': room.id
+            'name': room['name'],
+            'standard_line_score': room['standard_line_score'],
+            'id': room['id']
         }
-        
-        serializer = LeaderboardSerializer({
-            'room_info': room_info,
-            'leaderboard': members
-        })
-        
-        return Response(serializer.data)
+
+        if any(param in request.query_params for param in ('limit', 'around', 'cursor')):
+            params = LeaderboardQuerySerializer(data=request.query_params, context={'room_id': room['id']})
+            if not params.is_valid():
+                return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+            members, next_cursor = leaderboard_page(room['id'], **params.validated_data)
+            return self.add_validators(Response({
+                'room_info': room_info,
+                'leaderboard': MemberSerializer(members, many=True).data,
+                'count': Member.objects.filter(room_id=room['id']).count(),
+                'next': next_cursor,
+            }), etag, room)
+
+        def build():
+            # 按計分引擎寫入的名次排序，輸出與 LeaderboardSerializer 相同（見 scoring.fast_serializers）
+            return leaderboard_data(room_info, room['id'])
+
+        # 程序內的回應位元組快取未命中時，才讀取跨程序共用的排行榜快取
+        response = prerendered_response(
+            request, ('leaderboard', room['id']), etag, lambda: get_cached_leaderboard(room, build),
+            self.get_renderer_context(),
+        )
+        return self.add_validators(response, etag, room)
+
+    @action(detail=True, methods=['get'], url_path='matrix')
+    def matrix(self, request, pk=None):
+        """
+        精簡完成矩陣：成員與路線各列出一次，完成狀態打包成 base64 位元集合
+        （格式與解碼方式見 scoring.matrix；支援 If-None-Match 條件式 GET）
+        """
+        room = self.get_room_versions()
+        etag = room_etag(room, 'matrix', request)
+        not_modified = self.not_modified_response(request, etag, room)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(
+            Response(build_room_matrix(room, self.get_serializer_context())), etag, room
+        )
 
     @action(detail=True, methods=['get'], url_path='export-pdf')
     def export_pdf(self, request, pk=None):
@@ -329,8 +537,8 @@ class RoomViewSet(viewsets.ModelViewSet):
             story.append(Paragraph(info_text, normal_style))
             story.append(Spacer(1, 0.3*inch))
             
-            # 獲取成員數據（按總分降序）
-            members = room.members.all().order_by('-total_score', 'name')
+            # 獲取成員數據（按名次排序）
+            members = order_by_rank(annotate_completed_routes(room.members.all()))
             
             # 先收集所有成員完成的所有路線的等級（用於確定需要哪些等級欄位）
             all_completed_grades = set()
@@ -369,23 +577,7 @@ class RoomViewSet(viewsets.ModelViewSet):
             table_headers = ['排名', '成員', '總分', '完成總條數'] + sorted_all_grades + ['是否客製化組']
             leaderboard_data = [table_headers]
         
-            current_rank = 1
-            previous_score = None
-        
-            for index, member in enumerate(members, start=1):
-                current_score = float(member.total_score)
-                
-                # 第一個成員始終是第1名
-                if index == 1:
-                    current_rank = 1
-                else:
-                    # 如果分數與前一個不同，更新排名為當前索引
-                    if previous_score is not None and current_score != previous_score:
-                        current_rank = index
-                    # 如果分數相同，保持當前排名（不更新 current_rank）
-                
-                previous_score = current_score
-                
+            for member in members:
                 custom_text = '是' if member.is_custom_calc else '否'
                 completed_count = member.completed_routes_count
                 
@@ -399,9 +591,9 @@ class RoomViewSet(viewsets.ModelViewSet):
                 
                 # 構建行數據：排名、成員、總分、完成總條數、各等級數量、是否客製化組
                 row_data = [
-                    str(current_rank),
+                    str(member.rank),
                     member.name,
-                    f"{current_score:.2f}",
+                    f"{member.total_score:.2f}",
                     str(completed_count)
                 ]
                 
@@ -585,10 +777,8 @@ class RoomViewSet(viewsets.ModelViewSet):
             
             # 構建表格數據行
             for route in routes:
-                # 計算完成人數
-                completed_count = route.scores.filter(is_completed=True).count()
-                total_count = route.scores.count()
-                completion_text = f"{completed_count}/{total_count}"
+                # 完成人數直接讀取計分引擎維護的計數，不需逐條路線查詢
+                completion_text = f"{route.completed_count}/{route.score_count}"
                 
                 # 獲取該路線的所有成績記錄
                 route_scores = {score.member_id: score.is_completed for score in route.scores.all()}
@@ -763,10 +953,136 @@ class RoomViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'], url_path='scores/batch')
+    def batch_scores(self, request, pk=None):
+        """
+        批量更新成績狀態，所有變動在同一個交易中寫入，只觸發一次計分
+
+        請求格式：
+            {"changes": [{"member_id": 1, "route_id": 2, "is_completed": true}, ...]}
+
+        返回所有總分或名次有變動的成員（包含同一路線的其他完成者），前端不需要重新讀取房間
+        """
+        room = self.get_object()
+        serializer = ScoreBatchSerializer(data=request.data, context={'room': room})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = serializer.save()
+        changed_members = recompute_after_batch(room.id, result)
+
+        members = order_by_rank(annotate_completed_routes(changed_members))
+        return Response({
+            'created': result['created'],
+            'updated': result['updated'],
+            'unchanged': result['unchanged'],
+            'members': MemberSerializer(members, many=True).data,
+        })
+
+
+    @action(detail=True, methods=['get', 'post'], url_path='simulate')
+    def simulate(self, request, pk=None):
+        """
+        假設完成模擬：返回套用假設變更後的排行榜與名次變化，不寫入資料庫
+
+        請求格式：
+            POST {"flips": [{"member_id": 1, "route_id": 2, "is_completed": true}, ...]}
+            GET ?flip=1:2:1&flip=3:4（成員ID:路線ID[:1 或 0]，省略完成狀態時切換目前狀態）
+
+        訪客只能讀取，可使用 GET 形式
+        """
+        # 只載入計分需要的欄位，不經過 get_object() 預取整個房間
+        snapshot = load_room_snapshot(int(pk)) if str(pk).isdigit() else None
+        if snapshot is None:
+            raise Http404
+
+        if request.method == 'GET':
+            flips = []
+            for value in request.query_params.getlist('flip'):
+                parts = value.split(':')
+                if len(parts) not in (2, 3) or not all(part.lstrip('-').isdigit() for part in parts):
+                    return Response(
+                        {'flip': [f'格式錯誤: {value}（應為 成員ID:路線ID[:1 或 0]）']},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                flip = {'member_id': int(parts[0]), 'route_id': int(parts[1])}
+                if len(parts) == 3:
+                    flip['is_completed'] = parts[2] != '0'
+                flips.append(flip)
+            data = {'flips': flips}
+        else:
+            data = request.data
+
+        serializer = SimulationSerializer(data=data, context={'snapshot': snapshot})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ScoreViewSet(viewsets.ModelViewSet):
+        return Response(simulate_completions(snapshot, serializer.validated_data.get('flips', [])))
+
+    @action(detail=True, methods=['get'], url_path='history')
+    def history(self, request, pk=None):
+        """
+        獲取指定時間點的排行榜（由排行榜歷史重建）
+
+        查詢參數：
+            at: ISO 8601 時間，未提供時為目前時間
+        """
+        room = get_object_or_404(Room.objects.only('id', 'name'), pk=pk)
+        at, error = parse_timestamp_param(request, 'at')
+        if error:
+            return error
+        at = at or timezone.now()
+
+        standings, record = standings_as_of(room.id, at)
+        names = dict(Member.objects.filter(id__in=standings.keys()).values_list('id', 'name'))
+        leaderboard = [
+            {
+                'id': member_id,
+                'name': names.get(member_id),
+                'rank': rank,
+                'total_score': str(cents_to_decimal(total)),
+            }
+            for member_id, (total, rank) in standings.items()
+        ]
+        leaderboard.sort(key=lambda entry: (entry['rank'], entry['name'] or ''))
+
+        return Response({
+            'room_id': room.id,
+            'at': at,
+            'recorded_at': record['created_at'] if record else None,
+            'scores_version': record['scores_version'] if record else None,
+            'leaderboard': leaderboard,
+        })
+
+    @action(detail=True, methods=['get'], url_path='events',
+            renderer_classes=[EventStreamRenderer, FastJSONRenderer])
+    def events(self, request, pk=None):
+        """
+        房間事件串流（Server-Sent Events，見 scoring.events）
+
+        推送 ready / leaderboard / room / deleted 事件；重新連線時依 Last-Event-ID 補送之後的排行榜變動。
+        本程序的串流名額已滿時返回 503 與 Retry-After（頁面改為輪詢）
+        """
+        room = get_object_or_404(Room.objects.only('id'), pk=pk)
+        if not stream_slots.acquire():
+            return Response(
+                {'detail': '即時更新連線數已達上限，請稍後再試'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(BUSY_RETRY_AFTER)},
+            )
+        response = StreamingHttpResponse(
+            SlotStream(room_events(room.id, last_event_id=request.headers.get('Last-Event-ID')), stream_slots),
+            content_type='text/event-stream; charset=utf-8',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 關閉 nginx 的回應緩衝，事件才會立即送達瀏覽器
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class ScoreViewSet(FreshScoresMixin, viewsets.ModelViewSet):
     queryset = Score.objects.all()
     serializer_class = ScoreUpdateSerializer
+    fresh_scores_room_field = 'member__room_id'
     # 使用 settings.py 中的默認權限設置（開發環境為 AllowAny）
     
     def get_permissions(self):
@@ -781,16 +1097,25 @@ class ScoreViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             
-            # 觸發計分更新
-            update_scores(score.member.room.id)
+            # 觸發計分更新（只重算該路線，L 改變時自動退回完整重算）
+            request_recompute(score.route.room_id, route_id=score.route_id)
             
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_destroy(self, instance):
+        """刪除成績記錄後重新計分（成員總分包含該成績的分數）"""
+        room_id = instance.route.room_id
+        # 成績不連接 post_delete 訊號（見 scoring.signals），直接記錄刪除
+        record_changes(room_id, {RoomChange.KIND_SCORE: [instance.pk]})
+        instance.delete()
+        request_recompute(room_id)
+
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(FreshScoresMixin, viewsets.ModelViewSet):
     queryset = Route.objects.all()
+    fresh_scores_room_field = 'room_id'
     # 使用 settings.py 中的默認權限設置（開發環境為 AllowAny）
     
     def get_permissions(self):
@@ -1033,7 +1358,7 @@ class RouteViewSet(viewsets.ModelViewSet):
         route.delete()
         
         # 觸發計分更新
-        update_scores(room_id)
+        request_recompute(room_id)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
     
@@ -1074,9 +1399,10 @@ class RouteViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MemberViewSet(viewsets.ModelViewSet):
-    queryset = Member.objects.all()
+class MemberViewSet(FreshScoresMixin, viewsets.ModelViewSet):
+    queryset = annotate_completed_routes(Member.objects.all())
     serializer_class = MemberSerializer
+    fresh_scores_room_field = 'room_id'
     # 使用 settings.py 中的默認權限設置（開發環境為 AllowAny）
     
     def get_permissions(self):
@@ -1107,7 +1433,7 @@ class MemberViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             # 更新後自動重新計算分數（會自動更新standard_line_score）
-            update_scores(member.room.id)
+            request_recompute(member.room_id)
             return Response(serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -1130,7 +1456,7 @@ class MemberViewSet(viewsets.ModelViewSet):
             member.delete()
             
             # 觸發計分更新（會自動更新standard_line_score）
-            update_scores(room_id)
+            request_recompute(room_id)
             
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
@@ -1161,6 +1487,36 @@ class MemberViewSet(viewsets.ModelViewSet):
         })
 
 
+    @action(detail=True, methods=['get'], url_path='rank-history')
+    def rank_history(self, request, pk=None):
+        """
+        獲取成員的名次與總分隨時間的變化
+
+        查詢參數：
+            since, until: ISO 8601 時間，限制返回的時間範圍
+        """
+        member = get_object_or_404(Member.objects.only('id', 'name', 'room_id'), pk=pk)
+        since, error = parse_timestamp_param(request, 'since')
+        if error:
+            return error
+        until, error = parse_timestamp_param(request, 'until')
+        if error:
+            return error
+
+        series = member_rank_series(member.room_id, member.id, since=since, until=until)
+        return Response({
+            'member_id': member.id,
+            'member_name': member.name,
+            'series': [
+                {
+                    'timestamp': point['timestamp'],
+                    'rank': point['rank'],
+                    'total_score': str(cents_to_decimal(point['total'])) if point['total'] is not None else None,
+                }
+                for point in series
+            ],
+        })
+
 @ensure_csrf_cookie
 def index_view(request):
     """首頁視圖 - 未登錄顯示登錄界面，已登錄顯示房間列表"""
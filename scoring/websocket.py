@@ -0,0 +1,473 @@
+"""
+房間 WebSocket（ASGI 部署模式）
+
+ws://<host>/ws/rooms/{id}/ 每個房間一個頻道：
+- 伺服器推送：ready（連線時）、leaderboard、room、deleted，內容與 SSE 事件相同（見 scoring.events），
+  格式為 {"type": 事件名稱, "id": 事件 ID, "data": 內容}
+- 裁判送出：{"type": "scores", "request_id": ..., "changes": [{"member_id", "route_id", "is_completed"}, ...]}，
+  與 POST /api/rooms/{id}/scores/batch/ 相同的驗證與寫入，回覆 ack 或 error；{"type": "ping"} 回覆 pong
+
+頻道層在程序內：每個程序每個房間只有一個輪詢工作（RoomEventCursor），
+查詢一次資料庫後把同一則已編碼的訊息分送給所有連線，因此資料庫負載與觀眾人數無關。
+其他程序（例如 WSGI 的 API）寫入的變動在下一次輪詢時推送；本程序收到的成績則立即推送。
+
+同一個頻道層也提供 GET /api/rooms/{id}/events/ 的 SSE 串流（room_event_stream）：
+事件與 WSGI 的 RoomViewSet.events 相同，但串流不佔用請求執行緒，也不需要定期結束重連，
+因此沒有串流名額限制；nginx 把這個路徑轉發到 ASGI 服務，WSGI 的視圖只是沒有 ASGI 服務時的後備。
+
+啟動方式（與 gunicorn 的 WSGI API 並行）：uvicorn climbing_system.asgi:application --port 8001
+"""
+import asyncio
+import json
+import logging
+import re
+from collections import namedtuple
+from http import cookies
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+
+from .events import (
+    KEEPALIVE_INTERVAL, RECONNECT_DELAY_MS, RoomEventCursor, event_position, format_event, get_poll_interval,
+)
+
+logger = logging.getLogger(__name__)
+
+ROOM_PATH = re.compile(r'^/ws/rooms/(?P<room_id>\d+)/$')
+EVENTS_PATH = re.compile(r'^/api/rooms/(?P<room_id>\d+)/events/$')
+
+# 每個連線最多暫存的待送訊息數；用戶端跟不上時斷線，避免單一連線佔用無限記憶體
+SEND_QUEUE_SIZE = 100
+
+# 關閉代碼（4000-4999 為應用程式自訂）
+CLOSE_NOT_FOUND = 4404
+CLOSE_ROOM_DELETED = 4410
+CLOSE_TOO_SLOW = 4429
+
+
+def encode_message(message):
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+
+
+class RoomConnection:
+    """一個 WebSocket 連線的待送佇列（佇列中的字串為已編碼的訊息，(關閉代碼,) 為關閉訊號）"""
+
+    # group_send 以此分組：同一則訊息在同一種格式只編碼一次
+    message_format = 'json'
+
+    @staticmethod
+    def encode(message):
+        return encode_message(message)
+
+    def __init__(self, can_edit=False, queue_size=SEND_QUEUE_SIZE):
+        self.can_edit = can_edit
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, text, message):
+        """加入一則頻道訊息（text 為 message 依 message_format 編碼的結果）"""
+        self.push(text)
+
+    def push(self, text):
+        """加入一則已編碼的訊息；佇列已滿時捨棄未送出的訊息並要求斷線"""
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._discard_pending()
+            self.queue.put_nowait((CLOSE_TOO_SLOW,))
+
+    def close(self, code):
+        """要求在送出已排入的訊息後關閉連線"""
+        if self.queue.full():
+            self._discard_pending()
+        self.queue.put_nowait((code,))
+
+    def _discard_pending(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+# SSE 串流佇列中的一個事件：位置（見 events.event_position）與已格式化的 SSE 文字
+StreamEvent = namedtuple('StreamEvent', 'position text')
+
+
+class EventStreamConnection(RoomConnection):
+    """
+    一個 SSE 串流的待送佇列（佇列中的 StreamEvent 為已格式化的事件，(關閉代碼,) 為關閉訊號）
+
+    串流開始時先以自己的 RoomEventCursor 送出 ready 或補送 Last-Event-ID 之後的事件，
+    頻道層廣播的事件中位置不晚於 resume_position 的已經送過，送出前略過
+    """
+    message_format = 'sse'
+
+    @staticmethod
+    def encode(message):
+        return format_event(message['type'], message['data'], event_id=message['id'])
+
+    def __init__(self, queue_size=SEND_QUEUE_SIZE):
+        super().__init__(queue_size=queue_size)
+        self.resume_position = None
+
+    def deliver(self, text, message):
+        self.push(StreamEvent(event_position(message['id']), text))
+
+    def already_sent(self, event):
+        return (
+            event.position is not None and self.resume_position is not None
+            and event.position <= self.resume_position
+        )
+
+
+class RoomGroup:
+    """一個房間在本程序中的所有連線與其輪詢工作"""
+
+    def __init__(self, room_id):
+        self.room_id = room_id
+        self.connections = set()
+        self.cursor = RoomEventCursor(room_id)
+        self.wake = asyncio.Event()
+        self.task = None
+
+
+class RoomChannelLayer:
+    """
+    程序內的頻道層
+
+    第一個連線加入房間時開始輪詢，最後一個連線離開時停止；
+    notify() 讓本程序的寫入立即推送，不必等到下一次輪詢
+    """
+
+    def __init__(self, poll_interval=None):
+        self.groups = {}
+        self._poll_interval = poll_interval
+
+    @property
+    def poll_interval(self):
+        return get_poll_interval() if self._poll_interval is None else self._poll_interval
+
+    async def group_add(self, room_id, connection):
+        group = self.groups.get(room_id)
+        if group is not None:
+            group.connections.add(connection)
+            return
+
+        # 先登記群組與連線：等待 cursor.start 期間加入的連線共用同一個群組，
+        # 加入後又離開的連線也不會讓群組變成空的而被移除
+        group = self.groups[room_id] = RoomGroup(room_id)
+        group.connections.add(connection)
+        try:
+            await sync_to_async(group.cursor.start)()
+        except BaseException:
+            if self.groups.get(room_id) is group:
+                del self.groups[room_id]
+            raise
+        # 等待期間所有連線都已離開（群組已移除）時不啟動輪詢
+        if self.groups.get(room_id) is group:
+            group.task = asyncio.create_task(self._watch(group))
+
+    async def group_discard(self, room_id, connection):
+        group = self.groups.get(room_id)
+        if group is None or connection not in group.connections:
+            return
+        group.connections.discard(connection)
+        if not group.connections:
+            del self.groups[room_id]
+            # 第一個連線仍在等待 cursor.start 時尚未啟動輪詢
+            if group.task is not None:
+                group.task.cancel()
+
+    def notify(self, room_id):
+        group = self.groups.get(room_id)
+        if group is not None:
+            group.wake.set()
+
+    def group_send(self, room_id, message):
+        """
+        把一則訊息分送給房間的所有連線（每種格式只編碼一次）
+
+        返回:
+            int: 收到訊息的連線數
+        """
+        group = self.groups.get(room_id)
+        if group is None:
+            return 0
+        encoded = {}
+        for connection in group.connections:
+            message_format = connection.message_format
+            if message_format not in encoded:
+                encoded[message_format] = connection.encode(message)
+            connection.deliver(encoded[message_format], message)
+        return len(group.connections)
+
+    async def _watch(self, group):
+        while True:
+            try:
+                await asyncio.wait_for(group.wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            group.wake.clear()
+
+            try:
+                events = await sync_to_async(group.cursor.poll)()
+            except Exception:
+                logger.exception(f"[RoomChannelLayer] 房間 {group.room_id} 輪詢失敗")
+                continue
+
+            for event, data, event_id in events:
+                self.group_send(group.room_id, {'type': event, 'id': event_id, 'data': data})
+            if group.cursor.closed:
+                for connection in group.connections:
+                    connection.close(CLOSE_ROOM_DELETED)
+                if self.groups.get(group.room_id) is group:
+                    del self.groups[group.room_id]
+                return
+
+
+_channel_layer = None
+
+
+def get_channel_layer():
+    """本程序共用的頻道層"""
+    global _channel_layer
+    if _channel_layer is None:
+        _channel_layer = RoomChannelLayer()
+    return _channel_layer
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers') or []:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def scope_user(scope):
+    """由 Cookie 中的 session 取得登入的用戶（與 SessionAuthentication 使用同一個 session）"""
+    jar = cookies.SimpleCookie()
+    try:
+        jar.load(_header(scope, b'cookie') or '')
+    except cookies.CookieError:
+        return AnonymousUser()
+    morsel = jar.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return AnonymousUser()
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    return get_user(SimpleNamespace(session=session))
+
+
+def is_same_origin(scope):
+    """瀏覽器送出的 Origin 必須與 Host 相同（或列於 CSRF_TRUSTED_ORIGINS），防止跨站 WebSocket 寫入"""
+    origin = _header(scope, b'origin')
+    if origin is None:
+        return True
+    return urlsplit(origin).netloc == _header(scope, b'host') or origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', [])
+
+
+def can_edit_scores(user):
+    """以 API 的權限類判斷用戶能否寫入（訪客與未登入用戶在生產環境只能觀看）"""
+    from rest_framework.settings import api_settings
+
+    request = SimpleNamespace(method='POST', user=user)
+    return all(permission().has_permission(request, None) for permission in api_settings.DEFAULT_PERMISSION_CLASSES)
+
+
+def _connect(room_id, scope):
+    """連線時的同步檢查：房間存在時返回 (ready 事件, 能否寫入)，否則返回 None"""
+    cursor = RoomEventCursor(room_id)
+    events = cursor.start()
+    if cursor.closed:
+        return None
+    return events[0], is_same_origin(scope) and can_edit_scores(scope_user(scope))
+
+
+def apply_score_changes(room_id, payload):
+    """
+    套用裁判送出的成績變動（與批量成績 API 相同的驗證、寫入與重算）
+
+    返回:
+        dict: ack（建立、更新、未變動的筆數與總分或名次有變動的成員的總分）或 error
+    """
+    from .models import Room
+    from .recompute import recompute_after_batch
+    from .serializers import ScoreBatchSerializer
+
+    room = Room.objects.filter(pk=room_id).first()
+    if room is None:
+        return {'type': 'error', 'error': 'room_not_found'}
+    serializer = ScoreBatchSerializer(data={'changes': payload.get('changes')}, context={'room': room})
+    if not serializer.is_valid():
+        return {'type': 'error', 'error': 'invalid', 'detail': serializer.errors}
+
+    result = serializer.save()
+    members = recompute_after_batch(room_id, result).values_list('id', 'total_score')
+    return {
+        'type': 'ack',
+        'created': result['created'],
+        'updated': result['updated'],
+        'unchanged': result['unchanged'],
+        'members': {str(member_id): str(total) for member_id, total in members},
+    }
+
+
+async def _handle_text(room_id, connection, layer, text):
+    try:
+        payload = json.loads(text)
+    except (TypeError, ValueError):
+        return {'type': 'error', 'error': 'invalid_json'}
+    if not isinstance(payload, dict):
+        return {'type': 'error', 'error': 'invalid_json'}
+
+    message_type = payload.get('type')
+    if message_type == 'ping':
+        reply = {'type': 'pong'}
+    elif message_type == 'scores':
+        if not connection.can_edit:
+            reply = {'type': 'error', 'error': 'permission_denied'}
+        else:
+            reply = await sync_to_async(apply_score_changes)(room_id, payload)
+            if reply['type'] == 'ack' and (reply['created'] or reply['updated']):
+                layer.notify(room_id)
+    else:
+        reply = {'type': 'error', 'error': 'unknown_type'}
+
+    if 'request_id' in payload:
+        reply['request_id'] = payload['request_id']
+    return reply
+
+
+async def _sender(connection, send):
+    while True:
+        item = await connection.queue.get()
+        if isinstance(item, tuple):
+            await send({'type': 'websocket.close', 'code': item[0]})
+            return
+        await send({'type': 'websocket.send', 'text': item})
+
+
+async def room_websocket(scope, receive, send, layer=None):
+    """ASGI WebSocket 應用程式：/ws/rooms/{id}/"""
+    layer = layer or get_channel_layer()
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = ROOM_PATH.match(scope.get('path', ''))
+    state = await sync_to_async(_connect)(int(match['room_id']), scope) if match else None
+    if state is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    room_id = int(match['room_id'])
+    (event, data, event_id), can_edit = state
+    await send({'type': 'websocket.accept'})
+    connection = RoomConnection(can_edit=can_edit)
+    connection.push(encode_message({'type': event, 'id': event_id, 'data': {**data, 'can_edit': can_edit}}))
+    await layer.group_add(room_id, connection)
+    sender = asyncio.create_task(_sender(connection, send))
+
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive':
+                reply = await _handle_text(room_id, connection, layer, message.get('text') or message.get('bytes'))
+                connection.push(encode_message(reply))
+    finally:
+        await layer.group_discard(room_id, connection)
+        sender.cancel()
+
+
+EVENT_STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    # 關閉 nginx 的回應緩衝，事件才會立即送達瀏覽器
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def _open_stream(room_id, last_event_id):
+    """
+    SSE 串流開始時的同步查詢（加入頻道群組之後呼叫，之後的變動都會由頻道層廣播）
+
+    返回:
+        tuple: (先送出的 SSE 文字, 已送到的位置, 房間是否已刪除)；房間不存在時返回 None
+    """
+    cursor = RoomEventCursor(room_id, last_event_id)
+    events = cursor.start()
+    if cursor.closed:
+        return None
+    if events:
+        event, data, event_id = events[0]
+        text = format_event(event, data, event_id=event_id, retry=RECONNECT_DELAY_MS)
+    else:
+        # 重新連線：補送 Last-Event-ID 之後錯過的事件
+        text = f'retry: {RECONNECT_DELAY_MS}\n\n' + ''.join(
+            format_event(event, data, event_id=event_id) for event, data, event_id in cursor.poll()
+        )
+    return text, event_position(cursor.event_id), cursor.closed
+
+
+async def _stream_sender(connection, send):
+    while True:
+        try:
+            item = await asyncio.wait_for(connection.queue.get(), KEEPALIVE_INTERVAL)
+        except asyncio.TimeoutError:
+            await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+            continue
+        if not isinstance(item, StreamEvent):
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+        if not connection.already_sent(item):
+            await send({'type': 'http.response.body', 'body': item.text.encode('utf-8'), 'more_body': True})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def room_event_stream(scope, receive, send, layer=None):
+    """
+    ASGI HTTP 應用程式：GET /api/rooms/{id}/events/ 的房間事件串流（Server-Sent Events）
+
+    推送的事件與 RoomViewSet.events 相同；串流一直保持到用戶端斷線、房間刪除或用戶端跟不上為止，
+    之後 EventSource 帶著 Last-Event-ID 重新連線並補送錯過的事件
+    """
+    layer = layer or get_channel_layer()
+    match = EVENTS_PATH.match(scope.get('path', ''))
+    room_id = int(match['room_id']) if match else None
+    connection = EventStreamConnection()
+    if room_id is not None:
+        # 先加入群組再查詢起始位置：查詢之後的變動一定會廣播，查詢已涵蓋的事件由 already_sent 略過
+        await layer.group_add(room_id, connection)
+    try:
+        opened = await sync_to_async(_open_stream)(room_id, _header(scope, b'last-event-id')) if match else None
+        if opened is None:
+            await send({'type': 'http.response.start', 'status': 404, 'headers': EVENT_STREAM_HEADERS})
+            await send({
+                'type': 'http.response.body',
+                'body': format_event('error', {'detail': '房間不存在'}).encode('utf-8'),
+            })
+            return
+
+        text, connection.resume_position, closed = opened
+        await send({'type': 'http.response.start', 'status': 200, 'headers': EVENT_STREAM_HEADERS})
+        await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': not closed})
+        if closed:
+            return
+
+        sender = asyncio.create_task(_stream_sender(connection, send))
+        disconnect = asyncio.create_task(_wait_disconnect(receive))
+        _, pending = await asyncio.wait({sender, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        # 用戶端斷線後送出失敗屬於正常情況
+        await asyncio.gather(sender, disconnect, return_exceptions=True)
+    finally:
+        if room_id is not None:
+            await layer.group_discard(room_id, connection)